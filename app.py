@@ -2,10 +2,20 @@
 import os
 import json
 import yaml
+import time
+import asyncio
 import argparse
 from datetime import datetime
 from dotenv import load_dotenv
 from openai import OpenAI
+from src.faq_index import FaqIndex
+from src.response_cache import ResponseCache, make_cache_key
+from src.log_writer import LogWriter
+from src.order_store import MAX_BULK_ORDERS, extract_order_ids, format_order_status, format_order_statuses, open_order_store
+from src.hot_reload import FileWatcher
+from src.streaming import StreamTimer
+from src.memory import ConversationMemory, SUMMARY_PROMPT, summary_request
+from src.metrics import METRICS, span
 
 # Загрузка переменных окружения
 load_dotenv()
@@ -15,9 +25,12 @@ FAQ_FILE = "data/faq.json"
 ORDERS_FILE = "data/orders.json"
 LOGS_DIR = "logs"
 PROMPTS_FILE = "prompts.yaml"
+TEMPERATURE = 0.7
+MAX_TOKENS = 300
+ERROR_REPLY = "Извините, произошла ошибка при обработке вашего запроса. Пожалуйста, попробуйте позже."
 
 class EcomBot:
-    def __init__(self):
+    def __init__(self, log_file=None):
         # Инициализация OpenAI клиента
         self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
         self.model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
@@ -29,34 +42,52 @@ class EcomBot:
         # Загрузка FAQ
         with open(FAQ_FILE, "r", encoding="utf-8") as f:
             self.faq_data = json.load(f)
+        self.faq_index = FaqIndex(self.faq_data)
         
-        # Загрузка заказов
-        with open(ORDERS_FILE, "r", encoding="utf-8") as f:
-            self.orders_data = json.load(f)
+        # Хранилище заказов (SQLite, если задан ORDERS_DB, иначе JSON-файл)
+        self.orders_data = open_order_store(ORDERS_FILE)
         
-        # История диалога
-        self.conversation_history = []
+        # Кэш ответов LLM (размер, TTL и путь к файлу задаются через RESPONSE_CACHE_*)
+        self.response_cache = ResponseCache.from_env()
+        
+        # История диалога в пределах бюджета токенов (HISTORY_*), старые реплики сворачиваются в резюме
+        self.conversation_history = self.create_memory()
         
         # Создание уникального лог-файла для этой сессии
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        self.log_file = f"{LOGS_DIR}/session_{timestamp}.jsonl"
+        self.log_file = log_file or f"{LOGS_DIR}/session_{timestamp}.jsonl"
+        self.log_writer = LogWriter(self.log_file)
+        
+        # Перезагрузка FAQ, заказов и промптов при изменении файлов (HOT_RELOAD_INTERVAL, 0 - выключено)
+        self.watcher = FileWatcher(float(os.getenv("HOT_RELOAD_INTERVAL", "2")))
+        self.watcher.watch(FAQ_FILE, self.reload_faq)
+        self.watcher.watch(ORDERS_FILE, self.reload_orders)
+        self.watcher.watch(PROMPTS_FILE, self.reload_prompts)
+        self.watcher.add_listener(self.log_reload)
+        self.watcher.start()
+    
+    def read_prompts(self):
+        """Чтение промптов из YAML файла с учетом версий из переменных окружения"""
+        with open(PROMPTS_FILE, "r", encoding="utf-8") as f:
+            config = yaml.safe_load(f)
+        
+        prompts = config.get("prompts", {})
+        
+        # Обработка версионированных промптов
+        for prompt_name, prompt_data in prompts.items():
+            # Проверяем, есть ли переменная окружения для версии промпта
+            env_version = os.getenv(f"PROMPT_{prompt_name.upper()}_VERSION")
+            if env_version and env_version in prompt_data.get("versions", {}):
+                # Используем версию из переменной окружения
+                prompts[prompt_name]["current"] = env_version
+            # Если переменная не задана, используем версию по умолчанию из YAML
+        
+        return prompts
     
     def load_prompts(self):
         """Загрузка промптов из YAML файла с поддержкой версионирования"""
         try:
-            with open(PROMPTS_FILE, "r", encoding="utf-8") as f:
-                config = yaml.safe_load(f)
-            
-            prompts = config.get("prompts", {})
-            
-            # Обработка версионированных промптов
-            for prompt_name, prompt_data in prompts.items():
-                # Проверяем, есть ли переменная окружения для версии промпта
-                env_version = os.getenv(f"PROMPT_{prompt_name.upper()}_VERSION")
-                if env_version and env_version in prompt_data.get("versions", {}):
-                    # Используем версию из переменной окружения
-                    prompts[prompt_name]["current"] = env_version
-                # Если переменная не задана, используем версию по умолчанию из YAML
+            prompts = self.read_prompts()
             
             print(f"Загружены промпты из {PROMPTS_FILE}")
             for name, data in prompts.items():
@@ -75,49 +106,114 @@ class EcomBot:
                 }
             }
     
-    def get_prompt(self, prompt_name):
-        """Получение промпта по имени и текущей версии"""
-        if prompt_name in self.prompts:
-            prompt_data = self.prompts[prompt_name]
+    def reload_faq(self):
+        """Пересборка FAQ и индекса; подмена одним присваиванием"""
+        with open(FAQ_FILE, "r", encoding="utf-8") as f:
+            faq_data = json.load(f)
+        self.faq_data, self.faq_index = faq_data, FaqIndex(faq_data)
+    
+    def reload_orders(self):
+        """Перечитывание хранилища заказов; база SQLite от orders.json не зависит и не переоткрывается"""
+        old = self.orders_data
+        if not old.uses_json_file:
+            return
+        self.orders_data = open_order_store(ORDERS_FILE)
+        old.close()
+    
+    def reload_prompts(self):
+        """Перечитывание промптов; при ошибке остаются прежние"""
+        self.prompts = self.read_prompts()
+    
+    def log_reload(self, event):
+        """Запись события перезагрузки в лог сессии"""
+        self.log_writer.write({"timestamp": datetime.now().isoformat(), **event})
+    
+    def get_prompt(self, prompt_name, prompts=None):
+        """Получение промпта по имени и текущей версии (prompts - снимок self.prompts)"""
+        prompts = self.prompts if prompts is None else prompts
+        if prompt_name in prompts:
+            prompt_data = prompts[prompt_name]
             current_version = prompt_data["current"]
             return prompt_data["versions"].get(current_version, "")
         return ""
     
+    def get_prompt_version(self, prompt_name, prompts=None):
+        """Текущая версия промпта (участвует в ключе кэша ответов)"""
+        prompts = self.prompts if prompts is None else prompts
+        if prompt_name in prompts:
+            return prompts[prompt_name]["current"]
+        return ""
+    
+    def create_memory(self):
+        """Пустая история диалога (отдельная на каждую сессию сервера)"""
+        return ConversationMemory.from_env(summarizer=self.summarize_history)
+    
+    def summarize_history(self, summary, turns):
+        """Свёртка вытесненных из истории реплик в резюме"""
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": SUMMARY_PROMPT},
+                {"role": "user", "content": summary_request(summary, turns)}
+            ],
+            temperature=0,
+            max_tokens=MAX_TOKENS
+        )
+        return response.choices[0].message.content
+    
     def get_faq_answer(self, question):
         """Поиск ответа на вопрос в FAQ"""
-        for item in self.faq_data:
-            if item["q"].lower() in question.lower() or question.lower() in item["q"].lower():
-                return item["a"]
-        return None
+        return self.faq_index.get_answer(question)
     
     def get_order_status(self, order_id):
         """Получение статуса заказа по ID"""
-        if order_id in self.orders_data:
-            order = self.orders_data[order_id]
-            if order["status"] == "in_transit":
-                return f"Заказ {order_id} находится в пути. Ожидаемая доставка через {order['eta_days']} дня(ей). Перевозчик: {order['carrier']}."
-            elif order["status"] == "delivered":
-                return f"Заказ {order_id} был доставлен {order['delivered_at']}."
-            elif order["status"] == "processing":
-                return f"Заказ {order_id} находится в обработке. {order['note']}."
-        return None
+        return format_order_status(order_id, self.orders_data.get(order_id))
+    
+    def get_order_statuses(self, order_ids):
+        """Статусы многих заказов одним обращением к хранилищу"""
+        order_ids = list(dict.fromkeys(order_ids))
+        orders = self.orders_data.get_many(order_ids[:MAX_BULK_ORDERS])
+        return format_order_statuses(order_ids, orders)
     
-    def log_interaction(self, user_message, bot_response, usage=None):
+    def log_interaction(self, user_message, bot_response, usage=None, session_id=None, timing=None):
         """Логирование взаимодействия"""
         log_entry = {
             "timestamp": datetime.now().isoformat(),
             "user_message": user_message,
             "bot_response": bot_response,
-            "usage": usage
+            "model": self.model,
+            "prompt_version": self.get_prompt_version("main_agent"),
+            "usage": usage,
+            "cache": self.response_cache.stats()
         }
+        if session_id is not None:
+            log_entry["session_id"] = session_id
+        if timing is not None:
+            log_entry["timing"] = timing
+            METRICS.observe("turn", timing["latency_ms"] / 1000)
         
-        with open(self.log_file, "a", encoding="utf-8") as f:
-            f.write(json.dumps(log_entry, ensure_ascii=False) + "\n")
+        # Запись уходит в фоновый поток, который сбрасывает лог на диск пачками
+        with span("log"):
+            self.log_writer.write(log_entry)
+        self.log_metrics()
+    
+    def log_metrics(self):
+        """Раз в METRICS_LOG_INTERVAL секунд - сводка времени этапов в лог сессии"""
+        if METRICS.due():
+            self.log_writer.write({"timestamp": datetime.now().isoformat(), "event": "metrics", "stages": METRICS.summary()})
     
     def process_command(self, user_input):
         """Обработка специальных команд"""
+        if user_input.startswith("/orders"):
+            # Список номеров через пробел или запятую; статусы - одним обращением к хранилищу
+            order_ids = extract_order_ids(user_input[len("/orders"):])
+            if order_ids:
+                return self.get_order_statuses(order_ids)
+            return "Укажите номера заказов после команды: /orders <номер> <номер> ..."
+        
         if user_input.startswith("/order "):
-            order_id = user_input.split(" ")[1]
+            order_ids = extract_order_ids(user_input)
+            order_id = order_ids[0] if order_ids else user_input.split(" ")[1]
             order_status = self.get_order_status(order_id)
             if order_status:
                 return order_status
@@ -126,61 +222,169 @@ class EcomBot:
         
         return None
     
-    def get_bot_response(self, user_input):
+    def prepare_request(self, user_input, conversation_history=None):
+        """Сообщения для модели и ключ кэша ответов"""
+        # Один снимок промптов на запрос: перезагрузка между чтениями не смешает текст одной версии с номером другой
+        prompts = self.prompts
+        # Получение системного промпта
+        system_message = self.get_prompt("main_agent", prompts).format(brand_name=self.brand_name)
+        if not system_message:
+            system_message = f"Вы - вежливый и краткий ассистент интернет-магазина {self.brand_name}. Отвечайте кратко и по делу."
+        
+        # Подготовка сообщений для модели
+        messages = [{"role": "system", "content": system_message}]
+        
+        # Добавление истории разговора (в пределах бюджета токенов, с резюме старых реплик)
+        if conversation_history is None:
+            conversation_history = self.conversation_history
+        history = conversation_history.messages()
+        messages.extend(history)
+        
+        # Добавление текущего вопроса
+        messages.append({"role": "user", "content": user_input})
+        
+        cache_key = make_cache_key(
+            user_input,
+            history=history,
+            model=self.model,
+            temperature=TEMPERATURE,
+            prompt_version=self.get_prompt_version("main_agent", prompts)
+        )
+        return messages, cache_key
+    
+    @staticmethod
+    def make_usage(usage):
+        """Расход токенов для лога; cached_tokens - часть промпта, взятая из кэша префикса у провайдера"""
+        details = getattr(usage, "prompt_tokens_details", None)
+        return {
+            "prompt_tokens": usage.prompt_tokens,
+            "completion_tokens": usage.completion_tokens,
+            "total_tokens": usage.total_tokens,
+            "cached_tokens": getattr(details, "cached_tokens", 0) or 0
+        }
+    
+    def get_bot_response(self, user_input, conversation_history=None):
         """Получение ответа от бота"""
         # Проверка специальных команд
-        command_response = self.process_command(user_input)
+        with span("command"):
+            command_response = self.process_command(user_input)
         if command_response:
             return command_response
         
         # Проверка FAQ
-        faq_response = self.get_faq_answer(user_input)
+        with span("faq"):
+            faq_response = self.get_faq_answer(user_input)
         if faq_response:
             return faq_response
         
         # Если не найдено в FAQ, обращаемся к LLM
-        # Получение системного промпта
-        system_message = self.get_prompt("main_agent").format(brand_name=self.brand_name)
-        if not system_message:
-            system_message = f"Вы - вежливый и краткий ассистент интернет-магазина {self.brand_name}. Отвечайте кратко и по делу."
-        
-        # Подготовка сообщений для модели
-        messages = [{"role": "system", "content": system_message}]
+        with span("prompt"):
+            messages, cache_key = self.prepare_request(user_input, conversation_history)
         
-        # Добавление истории разговора (ограничиваем 3 последними репликами)
-        for msg in self.conversation_history[-6:]:  # 3 пары вопрос-ответ
-            messages.append(msg)
-        
-        # Добавление текущего вопроса
-        messages.append({"role": "user", "content": user_input})
+        # Проверка кэша ответов
+        with span("cache"):
+            cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            return cached["reply"], {"cache_hit": True}
         
         try:
             # Вызов API
+            started = time.perf_counter()
             response = self.client.chat.completions.create(
                 model=self.model,
                 messages=messages,
-                temperature=0.7,
-                max_tokens=300
+                temperature=TEMPERATURE,
+                max_tokens=MAX_TOKENS
             )
+            latency = time.perf_counter() - started
+            METRICS.observe("llm", latency)
             
             # Извлечение ответа и информации об использовании токенов
             bot_reply = response.choices[0].message.content
-            usage = {
-                "prompt_tokens": response.usage.prompt_tokens,
-                "completion_tokens": response.usage.completion_tokens,
-                "total_tokens": response.usage.total_tokens
-            }
+            usage = self.make_usage(response.usage)
             
+            self.response_cache.set(cache_key, {"reply": bot_reply.strip(), "usage": usage}, latency)
             return bot_reply.strip(), usage
         
         except Exception as e:
-            return "Извините, произошла ошибка при обработке вашего запроса. Пожалуйста, попробуйте позже.", None
+            return ERROR_REPLY, None
+    
+    def stream_bot_response(self, user_input, conversation_history=None, on_delta=None):
+        """Потоковый ответ: фрагменты модели уходят в on_delta по мере генерации; возвращает (ответ, usage, timing)"""
+        timer = StreamTimer(on_delta)
+        
+        # Команды, FAQ и кэш отдаются одним фрагментом
+        with span("command"):
+            ready = self.process_command(user_input)
+        if not ready:
+            with span("faq"):
+                ready = self.get_faq_answer(user_input)
+        if ready:
+            timer(ready)
+            return ready, None, timer.timing()
+        
+        with span("prompt"):
+            messages, cache_key = self.prepare_request(user_input, conversation_history)
+        with span("cache"):
+            cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            timer(cached["reply"])
+            return cached["reply"], {"cache_hit": True}, timer.timing()
+        
+        try:
+            started = time.perf_counter()
+            stream = self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=TEMPERATURE,
+                max_tokens=MAX_TOKENS,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+            parts = []
+            usage = None
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    timer(chunk.choices[0].delta.content)
+                # Расход токенов приходит последним фрагментом без choices
+                if chunk.usage is not None:
+                    usage = self.make_usage(chunk.usage)
+            latency = time.perf_counter() - started
+            METRICS.observe("llm", latency)
+            
+            bot_reply = "".join(parts).strip()
+            self.response_cache.set(cache_key, {"reply": bot_reply, "usage": usage}, latency)
+            return bot_reply, usage, timer.timing()
+        
+        except Exception as e:
+            if timer.first is None:
+                timer(ERROR_REPLY)
+            return ERROR_REPLY, None, timer.timing()
+    
+    async def aget_bot_response(self, user_input, conversation_history=None):
+        """Асинхронное получение ответа (для HTTP-сервера): синхронный клиент OpenAI в пуле потоков"""
+        result = await asyncio.to_thread(self.get_bot_response, user_input, conversation_history)
+        if isinstance(result, tuple):
+            return result
+        return result, None
+    
+    async def astream_bot_response(self, user_input, conversation_history=None, on_delta=None):
+        """Асинхронный потоковый ответ: поток из пула передаёт фрагменты в цикл событий"""
+        loop = asyncio.get_running_loop()
+        
+        def deliver(text):
+            if on_delta is not None:
+                loop.call_soon_threadsafe(on_delta, text)
+        
+        return await asyncio.to_thread(self.stream_bot_response, user_input, conversation_history, deliver)
     
-    def run(self):
-        """Запуск бота"""
+    def run(self, stream=False):
+        """Запуск бота (stream=True - ответ печатается по мере генерации)"""
         print(f"Добро пожаловать в чат-бот магазина {self.brand_name}!")
         print("Вы можете задавать вопросы о доставке, возврате, оплате и т.д.")
         print("Для проверки статуса заказа используйте команду: /order <номер_заказа>")
+        print("Для нескольких заказов сразу: /orders <номер> <номер> ...")
         print("Для выхода введите 'выход' или нажмите Ctrl+C\n")
         
         while True:
@@ -195,21 +399,30 @@ class EcomBot:
                     break
                 
                 # Получение ответа от бота
-                result = self.get_bot_response(user_input)
-                
-                if isinstance(result, tuple):
-                    bot_response, usage = result
+                if stream:
+                    print("Бот: ", end="", flush=True)
+                    bot_response, usage, timing = self.stream_bot_response(
+                        user_input, on_delta=lambda text: print(text, end="", flush=True)
+                    )
+                    print("\n")
                 else:
-                    bot_response, usage = result, None
-                
-                print(f"Бот: {bot_response}\n")
+                    # Без потока ответ приходит целиком: TTFT совпадает с временем ответа
+                    timer = StreamTimer()
+                    result = self.get_bot_response(user_input)
+                    
+                    if isinstance(result, tuple):
+                        bot_response, usage = result
+                    else:
+                        bot_response, usage = result, None
+                    timing = timer.timing()
+                    
+                    print(f"Бот: {bot_response}\n")
                 
                 # Логирование взаимодействия
-                self.log_interaction(user_input, bot_response, usage)
+                self.log_interaction(user_input, bot_response, usage, timing=timing)
                 
                 # Добавление в историю разговора
-                self.conversation_history.append({"role": "user", "content": user_input})
-                self.conversation_history.append({"role": "assistant", "content": bot_response})
+                self.conversation_history.add(user_input, bot_response)
                 
             except KeyboardInterrupt:
                 print("\n\nБот: До свидания! Спасибо за обращение.")
@@ -217,16 +430,22 @@ class EcomBot:
             except Exception as e:
                 print(f"Бот: Извините, произошла непредвиденная ошибка. Попробуйте еще раз.")
                 self.log_interaction(user_input, f"Ошибка: {str(e)}", None)
+        
+        # Останавливаем наблюдатель и дописываем в лог всё, что осталось в очереди
+        self.watcher.stop()
+        self.log_writer.close()
 
 def main():
     parser = argparse.ArgumentParser(description="E-commerce support chatbot")
     parser.add_argument("--faq-only", action="store_true", 
                         help="Режим только с FAQ (без использования LLM)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Печатать ответ по мере генерации")
     args = parser.parse_args()
     
     try:
         bot = EcomBot()
-        bot.run()
+        bot.run(stream=args.stream)
     except Exception as e:
         print(f"Ошибка при запуске бота: {e}")
 
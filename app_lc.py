@@ -1,31 +1,55 @@
 #!/usr/bin/env python3
 import os
-import json
+import time
 import argparse
 from datetime import datetime
 from dotenv import load_dotenv
-from src.brand_chain import ask, get_order_status
+from src.brand_chain import MODEL, get_prompt_version, ask, aask, stream_ask, astream_ask, summarize_history, track_usage, get_order_status, get_order_statuses, get_response_cache, get_watcher
+from src.log_writer import LogWriter
+from src.streaming import StreamTimer
+from src.memory import ConversationMemory
+from src.router import Router
+from src.order_store import extract_order_ids
+from src.metrics import METRICS, span
 
 # Загрузка переменных окружения
 load_dotenv()
 
 # Константы
 LOGS_DIR = "logs"
+ERROR_REPLY = "Извините, произошла ошибка при обработке вашего запроса. Пожалуйста, попробуйте позже."
 os.makedirs(LOGS_DIR, exist_ok=True)
 
 class EcomBrandBot:
-    def __init__(self):
+    def __init__(self, log_file=None):
         self.brand_name = os.getenv("BRAND_NAME", "Shoply")
-        self.conversation_history = []
+        # История диалога в пределах бюджета токенов (HISTORY_*), старые реплики сворачиваются в резюме
+        self.conversation_history = self.create_memory()
+        
+        # Ответы без LLM на приветствия, статус заказа и точные вопросы FAQ
+        self.router = Router.from_env()
         
         # Создание уникального лог-файла для этой сессии
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        self.log_file = f"{LOGS_DIR}/session_{timestamp}_lc.jsonl"
+        self.log_file = log_file or f"{LOGS_DIR}/session_{timestamp}_lc.jsonl"
+        self.log_writer = LogWriter(self.log_file)
+        
+        # Перезагрузка FAQ, заказов, стилевого гайда и примеров при изменении файлов
+        self.watcher = get_watcher()
+        self.watcher.add_listener(self.log_reload)
     
     def process_command(self, user_input):
         """Обработка специальных команд"""
+        if user_input.startswith("/orders"):
+            # Список номеров через пробел или запятую; статусы - одним обращением к хранилищу
+            order_ids = extract_order_ids(user_input[len("/orders"):])
+            if order_ids:
+                return get_order_statuses(order_ids)
+            return "Укажите номера заказов после команды: /orders <номер> <номер> ..."
+        
         if user_input.startswith("/order "):
-            order_id = user_input.split(" ")[1]
+            order_ids = extract_order_ids(user_input)
+            order_id = order_ids[0] if order_ids else user_input.split(" ")[1]
             order_status = get_order_status(order_id)
             if order_status:
                 return order_status
@@ -34,69 +58,168 @@ class EcomBrandBot:
         
         return None
     
-    def format_history(self):
-        """Форматирование истории разговора для включения в контекст"""
-        if not self.conversation_history:
-            return ""
-        
-        history_text = ""
-        for i, msg in enumerate(self.conversation_history[-6:]):  # Последние 3 пары вопрос-ответ
-            if msg["role"] == "user":
-                history_text += f"Пользователь: {msg['content']}\n"
-            else:
-                history_text += f"Ассистент: {msg['content']}\n"
-        
-        return history_text
+    def create_memory(self):
+        """Пустая история диалога (отдельная на каждую сессию сервера)"""
+        return ConversationMemory.from_env(summarizer=summarize_history)
     
-    def get_bot_response(self, user_input):
-        """Получение ответа от брендированного бота"""
-        # Проверка специальных команд
-        command_response = self.process_command(user_input)
+    def format_history(self, conversation_history=None):
+        """История разговора для включения в контекст: текст реплик собирается один раз при добавлении"""
+        if conversation_history is None:
+            conversation_history = self.conversation_history
+        return conversation_history.render()
+    
+    def make_reply(self, response, tokens=None):
+        """Ответ для клиента и данные для лога из структурированного ответа цепочки"""
+        usage = {
+            "model": MODEL,
+            "structured_response": {
+                "answer": response.answer,
+                "tone": response.tone,
+                "actions": response.actions
+            }
+        }
+        # Токены запроса, включая cached_tokens (пусто, если ответ взят из кэша ответов)
+        usage.update(tokens or {})
+        return response.answer, usage
+    
+    def fast_reply(self, user_input):
+        """Ответ без LLM: команды и маршрутизатор; None - нужен вызов цепочки"""
+        with span("command"):
+            command_response = self.process_command(user_input)
         if command_response:
             return command_response, None
         
+        started = time.perf_counter()
+        with span("route"):
+            route = self.router.route(user_input)
+        if route is None:
+            return None
+        self.router.record(route, time.perf_counter() - started)
+        bot_reply, usage = self.make_reply(route.response)
+        usage["route"] = route.intent
+        return bot_reply, usage
+    
+    def get_bot_response(self, user_input, conversation_history=None):
+        """Получение ответа от брендированного бота"""
+        # Команды и ответы по шаблонам
+        fast = self.fast_reply(user_input)
+        if fast:
+            return fast
+        
         # Форматирование истории
-        history = self.format_history()
+        history = self.format_history(conversation_history)
         
         try:
             # Получение ответа от цепочки
-            response = ask(user_input, history)
-            
-            # Формирование ответа в виде строки
-            bot_reply = response.answer
-            
-            # Подготовка данных для логирования
-            usage = {
-                "model": "gpt-4o-mini",  # Жестко задаем модель для логов
-                "structured_response": {
-                    "answer": response.answer,
-                    "tone": response.tone,
-                    "actions": response.actions
-                }
-            }
-            
-            return bot_reply, usage
+            started = time.perf_counter()
+            with track_usage() as tokens:
+                response = ask(user_input, history)
+            self.router.record(None, time.perf_counter() - started)
+            return self.make_reply(response, tokens)
         
         except Exception as e:
-            return "Извините, произошла ошибка при обработке вашего запроса. Пожалуйста, попробуйте позже.", None
+            return ERROR_REPLY, None
     
-    def log_interaction(self, user_input, bot_response, usage=None):
+    async def aget_bot_response(self, user_input, conversation_history=None):
+        """Асинхронное получение ответа (для HTTP-сервера)"""
+        fast = self.fast_reply(user_input)
+        if fast:
+            return fast
+        
+        history = self.format_history(conversation_history)
+        
+        try:
+            started = time.perf_counter()
+            with track_usage() as tokens:
+                response = await aask(user_input, history)
+            self.router.record(None, time.perf_counter() - started)
+            return self.make_reply(response, tokens)
+        
+        except Exception as e:
+            return ERROR_REPLY, None
+    
+    def stream_bot_response(self, user_input, conversation_history=None, on_delta=None):
+        """Потоковый ответ: поле answer уходит в on_delta по мере генерации; возвращает (ответ, usage, timing)"""
+        timer = StreamTimer(on_delta)
+        fast = self.fast_reply(user_input)
+        if fast:
+            timer(fast[0])
+            return (*fast, timer.timing())
+        
+        history = self.format_history(conversation_history)
+        
+        try:
+            started = time.perf_counter()
+            with track_usage() as tokens:
+                response = stream_ask(user_input, history, on_delta=timer)
+            self.router.record(None, time.perf_counter() - started)
+            return (*self.make_reply(response, tokens), timer.timing())
+        
+        except Exception as e:
+            if timer.first is None:
+                timer(ERROR_REPLY)
+            return ERROR_REPLY, None, timer.timing()
+    
+    async def astream_bot_response(self, user_input, conversation_history=None, on_delta=None):
+        """Асинхронный потоковый ответ (для HTTP-сервера)"""
+        timer = StreamTimer(on_delta)
+        fast = self.fast_reply(user_input)
+        if fast:
+            timer(fast[0])
+            return (*fast, timer.timing())
+        
+        history = self.format_history(conversation_history)
+        
+        try:
+            started = time.perf_counter()
+            with track_usage() as tokens:
+                response = await astream_ask(user_input, history, on_delta=timer)
+            self.router.record(None, time.perf_counter() - started)
+            return (*self.make_reply(response, tokens), timer.timing())
+        
+        except Exception as e:
+            if timer.first is None:
+                timer(ERROR_REPLY)
+            return ERROR_REPLY, None, timer.timing()
+    
+    def log_interaction(self, user_input, bot_response, usage=None, session_id=None, timing=None):
         """Логирование взаимодействия"""
         log_entry = {
             "timestamp": datetime.now().isoformat(),
             "user_message": user_input,
             "bot_response": bot_response,
-            "usage": usage
+            "model": MODEL,
+            "prompt_version": get_prompt_version(),
+            "usage": usage,
+            "cache": get_response_cache().stats(),
+            "router": self.router.stats()
         }
+        if session_id is not None:
+            log_entry["session_id"] = session_id
+        if timing is not None:
+            log_entry["timing"] = timing
+            METRICS.observe("turn", timing["latency_ms"] / 1000)
         
-        with open(self.log_file, "a", encoding="utf-8") as f:
-            f.write(json.dumps(log_entry, ensure_ascii=False) + "\n")
+        # Запись уходит в фоновый поток, который сбрасывает лог на диск пачками
+        with span("log"):
+            self.log_writer.write(log_entry)
+        self.log_metrics()
     
-    def run(self):
-        """Запуск бота"""
+    def log_metrics(self):
+        """Раз в METRICS_LOG_INTERVAL секунд - сводка времени этапов в лог сессии"""
+        if METRICS.due():
+            self.log_writer.write({"timestamp": datetime.now().isoformat(), "event": "metrics", "stages": METRICS.summary()})
+    
+    def log_reload(self, event):
+        """Запись события перезагрузки в лог сессии"""
+        self.log_writer.write({"timestamp": datetime.now().isoformat(), **event})
+    
+    def run(self, stream=False):
+        """Запуск бота (stream=True - ответ печатается по мере генерации)"""
         print(f"Добро пожаловать в брендированный чат-бот магазина {self.brand_name}!")
         print("Вы можете задавать вопросы о доставке, возврате, оплате и т.д.")
         print("Для проверки статуса заказа используйте команду: /order <номер_заказа>")
+        print("Для нескольких заказов сразу: /orders <номер> <номер> ...")
         print("Для выхода введите 'выход' или нажмите Ctrl+C\n")
         
         while True:
@@ -111,16 +234,24 @@ class EcomBrandBot:
                     break
                 
                 # Получение ответа от бота
-                bot_response, usage = self.get_bot_response(user_input)
-                
-                print(f"Бот: {bot_response}\n")
+                if stream:
+                    print("Бот: ", end="", flush=True)
+                    bot_response, usage, timing = self.stream_bot_response(
+                        user_input, on_delta=lambda text: print(text, end="", flush=True)
+                    )
+                    print("\n")
+                else:
+                    # Без потока ответ приходит целиком: TTFT совпадает с временем ответа
+                    timer = StreamTimer()
+                    bot_response, usage = self.get_bot_response(user_input)
+                    timing = timer.timing()
+                    print(f"Бот: {bot_response}\n")
                 
                 # Логирование взаимодействия
-                self.log_interaction(user_input, bot_response, usage)
+                self.log_interaction(user_input, bot_response, usage, timing=timing)
                 
                 # Добавление в историю разговора
-                self.conversation_history.append({"role": "user", "content": user_input})
-                self.conversation_history.append({"role": "assistant", "content": bot_response})
+                self.conversation_history.add(user_input, bot_response)
                 
             except KeyboardInterrupt:
                 print("\n\nБот: До свидания! Спасибо за обращение.")
@@ -128,11 +259,17 @@ class EcomBrandBot:
             except Exception as e:
                 print(f"Бот: Извините, произошла непредвиденная ошибка. Попробуйте еще раз.")
                 self.log_interaction(user_input, f"Ошибка: {str(e)}", None)
+        
+        # Дописываем в лог всё, что осталось в очереди
+        self.watcher.remove_listener(self.log_reload)
+        self.log_writer.close()
 
 def main():
     parser = argparse.ArgumentParser(description="E-commerce branded support chatbot with LangChain")
     parser.add_argument("--demo", action="store_true", 
                         help="Демонстрационный режим с предопределенными вопросами")
+    parser.add_argument("--stream", action="store_true",
+                        help="Печатать ответ по мере генерации")
     args = parser.parse_args()
     
     try:
@@ -156,13 +293,12 @@ def main():
                 print(f"Бот: {response}")
                 
                 # Добавляем в историю для контекста
-                bot.conversation_history.append({"role": "user", "content": question})
-                bot.conversation_history.append({"role": "assistant", "content": response})
+                bot.conversation_history.add(question, response)
             
             print("\n" + "=" * 50)
             print("Демонстрация завершена. Запуск интерактивного режима...")
             
-        bot.run()
+        bot.run(stream=args.stream)
     except Exception as e:
         print(f"Ошибка при запуске бота: {e}")
 
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Пакетная оценка стиля против оценки по одному ответу (src/style_eval.py): сколько запросов
+и токенов промпта уходит на оценку одного набора ответов и насколько совпадают баллы.
+Ответы берутся из отчёта reports/style_eval.json (или из --answers, по одному в строке).
+
+Без ключа API число запросов и токены промпта считаются по токенизатору (без схемы
+структурированного ответа, которую добавляет провайдер); с --live оба варианта
+отправляются в модель, и в отчёт попадают usage, время и согласие баллов.
+
+Запуск из корня проекта:
+    python benchmarks/bench_batch_grade.py [--batch-sizes 4,8] [--live] [--json reports/batch_grade.json]
+"""
+
+import sys
+import json
+import math
+import time
+import argparse
+import pathlib
+import statistics
+from typing import List
+
+BASE = pathlib.Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(BASE / "src"))
+
+import style_eval
+from brand_chain import track_usage
+from memory import count_tokens
+
+# Расхождение баллов, которое ещё считается согласием
+AGREEMENT_POINTS = 10
+
+
+def load_answers(path: str = "") -> List[str]:
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            return [line.strip().replace("\\n", "\n") for line in f if line.strip()]
+    report = json.loads((BASE / "reports" / "style_eval.json").read_text(encoding="utf-8"))
+    return [item["answer"] for item in report["items"] if "answer" in item]
+
+
+def chunks(items: List[str], size: int) -> List[List[str]]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def serialize(template, values) -> str:
+    return "".join(f"<{m.type}>{m.content}" for m in template.format_messages(**values))
+
+
+def offline(answers: List[str], batch_size: int) -> dict:
+    if batch_size <= 1:
+        template = style_eval.get_grade_prompt()
+        prompts = [serialize(template, {"answer": answer}) for answer in answers]
+    else:
+        template = style_eval.get_batch_grade_prompt()
+        prompts = [serialize(template, {"answers": style_eval.format_answers(batch)})
+                   for batch in chunks(answers, batch_size)]
+    return {"calls": len(prompts), "prompt_tokens": sum(count_tokens(text) for text in prompts)}
+
+
+class CallCounter:
+    """Считает вызовы модели-оценщика: слушатель on_start на подменённых цепочках"""
+
+    def __init__(self):
+        self.calls = 0
+        for getter in (style_eval.get_grader, style_eval.get_batch_grader):
+            getter.set(getter().with_listeners(on_start=self.count))
+
+    def count(self, run):
+        self.calls += 1
+
+
+def live(answers: List[str], batch_size: int, counter: CallCounter) -> dict:
+    counter.calls = 0
+    started = time.perf_counter()
+    with track_usage() as usage:
+        grades = [grade for batch in chunks(answers, batch_size) for grade in style_eval.llm_grade_batch(batch)]
+    return {
+        "grades": grades,
+        "calls": counter.calls,
+        "prompt_tokens": usage.get("prompt_tokens", 0),
+        "completion_tokens": usage.get("completion_tokens", 0),
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+def correlation(xs: List[float], ys: List[float]) -> float:
+    if len(xs) < 2:
+        return 1.0
+    mx, my = statistics.mean(xs), statistics.mean(ys)
+    sx = math.sqrt(sum((x - mx) ** 2 for x in xs))
+    sy = math.sqrt(sum((y - my) ** 2 for y in ys))
+    if not sx or not sy:
+        return 1.0 if sx == sy else 0.0
+    return sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / (sx * sy)
+
+
+def agreement(single: list, batched: list) -> dict:
+    """Согласие баллов пакетной оценки с оценкой по одному (ответы с ошибкой оценки пропускаются)"""
+    pairs = [(a.score, b.score) for a, b in zip(single, batched)
+             if not isinstance(a, Exception) and not isinstance(b, Exception)]
+    if not pairs:
+        return {"graded": 0}
+    diffs = [abs(a - b) for a, b in pairs]
+    return {
+        "graded": len(pairs),
+        "mean_abs_diff": round(statistics.mean(diffs), 2),
+        "max_abs_diff": max(diffs),
+        f"within_{AGREEMENT_POINTS}": round(sum(d <= AGREEMENT_POINTS for d in diffs) / len(diffs), 3),
+        "correlation": round(correlation([a for a, _ in pairs], [b for _, b in pairs]), 3),
+        "mean_single": round(statistics.mean(a for a, _ in pairs), 2),
+        "mean_batched": round(statistics.mean(b for _, b in pairs), 2),
+    }
+
+
+def reduction(before: dict, after: dict) -> dict:
+    return {
+        key: round(1 - after[key] / before[key], 3) if before.get(key) else 0.0
+        for key in ("calls", "prompt_tokens")
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пакетная оценка стиля против оценки по одному ответу")
+    parser.add_argument("--batch-sizes", default="4,8", help="Размеры пачек через запятую")
+    parser.add_argument("--answers", help="Файл с ответами по одному в строке (\\n - перевод строки)")
+    parser.add_argument("--live", action="store_true", help="Отправить запросы в модель и сравнить баллы")
+    parser.add_argument("--json", help="Сохранить отчёт в JSON-файл")
+    args = parser.parse_args()
+
+    answers = load_answers(args.answers)
+    sizes = [int(size) for size in args.batch_sizes.split(",") if size.strip()]
+    report = {"answers": len(answers), "single": offline(answers, 1), "batched": {}}
+    counter = CallCounter() if args.live else None
+    if args.live:
+        single = live(answers, 1, counter)
+        single_grades = single.pop("grades")
+        report["single"]["live"] = single
+    print(f"Ответов: {len(answers)}")
+    print("single: " + ", ".join(f"{k}={v}" for k, v in report["single"].items()))
+
+    for size in sizes:
+        result = offline(answers, size)
+        result["reduction"] = reduction(report["single"], result)
+        if args.live:
+            batched = live(answers, size, counter)
+            result["live"] = batched
+            result["live"]["agreement"] = agreement(single_grades, batched.pop("grades"))
+            result["live"]["reduction"] = reduction(report["single"]["live"], batched)
+        report["batched"][size] = result
+        print(f"batch={size}: " + ", ".join(f"{k}={v}" for k, v in result.items()))
+
+    if args.json:
+        pathlib.Path(args.json).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
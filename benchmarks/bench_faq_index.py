@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк поиска по FAQ: линейный перебор против FaqIndex.
+
+Запуск из корня проекта:
+    python benchmarks/bench_faq_index.py
+"""
+
+import sys
+import random
+import pathlib
+import timeit
+
+BASE = pathlib.Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(BASE))
+
+from src.faq_index import FaqIndex, normalize_text
+from fixtures import make_faq
+
+SIZES = [10, 100, 1_000, 10_000, 100_000]
+
+
+def linear_lookup(faq: list, question: str):
+    """Исходное правило: перебор всех записей с .lower() на каждой итерации"""
+    for item in faq:
+        if item["q"].lower() in question.lower() or question.lower() in item["q"].lower():
+            return item["a"]
+    return None
+
+
+def normalized_linear_lookup(faq: list, question: str):
+    """Эталон для проверки индекса: исходное правило на нормализованном тексте"""
+    message = normalize_text(question)
+    if not message:
+        return None
+    for item in faq:
+        q = normalize_text(item["q"])
+        if q in message or message in q:
+            return item["a"]
+    return None
+
+
+def main():
+    rng = random.Random(42)
+    print(f"{'size':>8} {'linear, мкс':>14} {'index, мкс':>12} {'build, с':>10}")
+    for size in SIZES:
+        faq = make_faq(size, rng)
+        queries = [faq[rng.randrange(size)]["q"] for _ in range(20)]
+        queries += ["Подскажите, пожалуйста, где мой заказ и когда его привезут?",
+                    "ВОЗВРАТ", "курьер", "привет"]
+
+        start = timeit.default_timer()
+        index = FaqIndex(faq)
+        build = timeit.default_timer() - start
+
+        if size <= 10_000:
+            for q in queries:
+                assert index.get_answer(q) == normalized_linear_lookup(faq, q), q
+
+        runs = 3 if size >= 10_000 else 20
+        linear = timeit.timeit(lambda: [linear_lookup(faq, q) for q in queries], number=runs)
+        indexed = timeit.timeit(lambda: [index.get_answer(q) for q in queries], number=runs)
+        per_query = runs * len(queries)
+        print(f"{size:>8} {linear / per_query * 1e6:>14.1f} {indexed / per_query * 1e6:>12.1f} {build:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
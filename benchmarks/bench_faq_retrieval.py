@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк TF-IDF поиска похожих вопросов FAQ: одиночные и пакетные запросы,
+сборка индекса и загрузка с диска через memory-map.
+
+Запуск из корня проекта:
+    python benchmarks/bench_faq_retrieval.py
+"""
+
+import sys
+import random
+import pathlib
+import tempfile
+import timeit
+
+BASE = pathlib.Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(BASE))
+
+from src.faq_retrieval import FaqRetriever
+from fixtures import make_faq
+
+SIZES = [100, 1_000, 10_000]
+QUERIES = ["Можно ускорить доставку?", "Где ввести промокод?", "Верните деньги за заказ",
+           "Курьер не приехал, что делать?"] * 16
+
+
+def main():
+    rng = random.Random(42)
+    print(f"{'size':>8} {'build, с':>10} {'load, мс':>10} {'single, мс':>12} {'batch, мс/запрос':>18}")
+    for size in SIZES:
+        questions = [item["q"] for item in make_faq(size, rng)]
+        start = timeit.default_timer()
+        retriever = FaqRetriever.build(questions)
+        build = timeit.default_timer() - start
+
+        with tempfile.TemporaryDirectory() as tmp:
+            retriever.save(tmp)
+            load = timeit.timeit(lambda: FaqRetriever.load(tmp), number=10) / 10
+            loaded = FaqRetriever.load(tmp)
+            single = timeit.timeit(lambda: [loaded.search(q) for q in QUERIES], number=3) / (3 * len(QUERIES))
+            batch = timeit.timeit(lambda: loaded.search_batch(QUERIES), number=3) / (3 * len(QUERIES))
+        print(f"{size:>8} {build:>10.2f} {load * 1e3:>10.2f} {single * 1e3:>12.2f} {batch * 1e3:>18.2f}")
+
+
+if __name__ == "__main__":
+    main()
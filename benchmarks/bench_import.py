@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Время холодного импорта app_lc.py и src/style_eval.py по данным `python -X importtime`.
+Каждый замер - отдельный процесс; выводится медиана и самые тяжёлые вложенные импорты.
+
+Запуск из корня проекта:
+    python benchmarks/bench_import.py [--runs 5] [--json reports/import_time.json]
+"""
+
+import sys
+import json
+import argparse
+import pathlib
+import statistics
+import subprocess
+
+BASE = pathlib.Path(__file__).parent.parent.resolve()
+
+TARGETS = {
+    "app_lc": "import app_lc",
+    "style_eval": "import sys; sys.path.insert(0, 'src'); import style_eval",
+}
+
+
+def import_times(code: str) -> dict:
+    """Суммарное время импорта (мкс) каждого модуля за один холодный запуск"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BASE, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def measure(module: str, code: str, runs: int, top: int) -> dict:
+    samples = [import_times(code) for _ in range(runs)]
+    total = statistics.median(s[module] for s in samples)
+    heaviest = {}
+    for name in samples[0]:
+        if name != module:
+            heaviest[name] = statistics.median(s.get(name, 0) for s in samples)
+    heaviest = sorted(heaviest.items(), key=lambda kv: kv[1], reverse=True)[:top]
+    return {
+        "total_ms": round(total / 1000, 1),
+        "heaviest": [{"module": name, "ms": round(us / 1000, 1)} for name, us in heaviest],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Время холодного импорта модулей бота")
+    parser.add_argument("--runs", type=int, default=5, help="Число запусков на модуль")
+    parser.add_argument("--top", type=int, default=5, help="Сколько тяжёлых импортов показать")
+    parser.add_argument("--json", help="Сохранить результат в JSON-файл")
+    args = parser.parse_args()
+
+    report = {}
+    for module, code in TARGETS.items():
+        report[module] = result = measure(module, code, args.runs, args.top)
+        print(f"{module}: {result['total_ms']} мс (медиана из {args.runs})")
+        for item in result["heaviest"]:
+            print(f"    {item['ms']:>8.1f} мс  {item['module']}")
+
+    if args.json:
+        pathlib.Path(args.json).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк клиента LLM в скриптах погоды: прежний вариант (новый ChatOpenAI, парсер и промпт
+на каждый вызов) против общего клиента из src/llm_client.py (модель и цепочка собираются
+один раз, соединения переиспользуются). Запросы идут в локальную заглушку OpenAI API,
+поэтому в замер попадают только накладные расходы клиента и соединения.
+
+Каждый вариант идёт в свою свежую заглушку, поэтому connections - число TCP-соединений,
+открытых именно этим вариантом. langchain-openai 1.x и сам держит общий httpx-клиент
+по умолчанию, так что прежний вариант тоже переиспользует соединение; вариант
+"new client" создаёт httpx-клиент на каждый вызов: в его цену входят и новое соединение,
+и сборка клиента (контекст TLS).
+
+С --fail-every N заглушка отвечает 503 на каждый N-й запрос - видно, что повторы срабатывают.
+
+Запуск из корня проекта:
+    python benchmarks/bench_llm_client.py [--calls 200] [--fail-every 10]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import pathlib
+import threading
+import statistics
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BASE = pathlib.Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(BASE))
+
+WEATHER = {"city": "Москва", "temperature": 12.5, "condition": "облачно"}
+
+
+class FakeOpenAI(ThreadingHTTPServer):
+    """Заглушка /v1/chat/completions с keep-alive; считает запросы и открытые соединения"""
+    daemon_threads = True
+
+    def __init__(self, fail_every: int = 0):
+        super().__init__(("127.0.0.1", 0), FakeHandler)
+        self.fail_every = fail_every
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+
+    def process_request(self, request, client_address):
+        with self.lock:
+            self.connections += 1
+        super().process_request(request, client_address)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", "0")))
+        with self.server.lock:
+            self.server.requests += 1
+            number = self.server.requests
+        if self.server.fail_every and number % self.server.fail_every == 0:
+            self.reply(503, {"error": {"message": "overloaded", "type": "server_error"}})
+            return
+        self.reply(200, {
+            "id": f"chatcmpl-{number}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": "gpt-4o-mini",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": json.dumps(WEATHER, ensure_ascii=False)},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 50, "completion_tokens": 20, "total_tokens": 70},
+        })
+
+    def reply(self, status: int, payload: dict):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def legacy_get_weather_info(city: str) -> str:
+    """Прежний get_weather_info из weather_api_script.py: всё создаётся на каждый вызов"""
+    from langchain_openai import ChatOpenAI
+    from langchain_core.prompts import PromptTemplate
+    from langchain_core.output_parsers import PydanticOutputParser
+    from weather_api_script import WeatherInfo
+
+    try:
+        llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.7)
+        parser = PydanticOutputParser(pydantic_object=WeatherInfo)
+        prompt = PromptTemplate(
+            template="Получи информацию о погоде для города {city}.\n{format_instructions}",
+            input_variables=["city"],
+            partial_variables={"format_instructions": parser.get_format_instructions()}
+        )
+        return (prompt | llm | parser).invoke({"city": city}).model_dump_json()
+    except Exception as e:
+        return json.dumps({"error": str(e)}, ensure_ascii=False)
+
+
+def legacy_new_client(city: str) -> str:
+    """Прежний вариант со своим httpx-клиентом на каждый вызов: новый клиент и новое соединение"""
+    import httpx
+    from langchain_openai import ChatOpenAI
+    from langchain_core.output_parsers import PydanticOutputParser
+    from weather_api_script import WeatherInfo
+
+    try:
+        with httpx.Client() as http_client:
+            llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.7, http_client=http_client)
+            parser = PydanticOutputParser(pydantic_object=WeatherInfo)
+            text = llm.invoke(f"Получи информацию о погоде для города {city}.\n{parser.get_format_instructions()}")
+            return parser.invoke(text).model_dump_json()
+    except Exception as e:
+        return json.dumps({"error": str(e)}, ensure_ascii=False)
+
+
+def start_server(fail_every: int) -> FakeOpenAI:
+    """Свежая заглушка; клиенты и цепочки скриптов пересоздаются под её адрес"""
+    from src import llm_client
+    import weather_api_script
+    import weather_api_script_v2
+
+    server = FakeOpenAI(fail_every)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["OPENAI_BASE_URL"] = server.base_url
+    llm_client.reset()
+    weather_api_script.get_weather_chain.cache_clear()
+    weather_api_script_v2.get_structured_llm.cache_clear()
+    return server
+
+
+def run(name: str, fn, fail_every: int, calls: int) -> dict:
+    server = start_server(fail_every)
+    latencies, errors = [], 0
+    for i in range(calls):
+        started = time.perf_counter()
+        result = fn("Москва")
+        latencies.append(time.perf_counter() - started)
+        errors += '"error"' in result
+    stats = {
+        "mean_ms": round(statistics.mean(latencies) * 1000, 3),
+        "p50_ms": round(statistics.median(latencies) * 1000, 3),
+        "requests": server.requests,
+        "connections": server.connections,
+        "errors": errors,
+    }
+    server.shutdown()
+    server.server_close()
+    print(f"{name:<24} " + ", ".join(f"{k}={v}" for k, v in stats.items()))
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Накладные расходы клиента LLM в скриптах погоды")
+    parser.add_argument("--calls", type=int, default=200, help="Число вызовов на вариант")
+    parser.add_argument("--fail-every", type=int, default=0, help="Отвечать 503 на каждый N-й запрос")
+    args = parser.parse_args()
+
+    os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+    # Короткие задержки между повторами, чтобы замер не превращался в ожидание
+    os.environ.setdefault("LLM_BACKOFF_INITIAL", "0.01")
+    os.environ.setdefault("LLM_BACKOFF_MAX", "0.05")
+
+    import weather_api_script
+    import weather_api_script_v2
+
+    print(f"Вызовов на вариант: {args.calls}")
+    # Прогрев импортов на отдельной заглушке: её соединения в замер не попадают
+    warmup = start_server(0)
+    for fn in (legacy_new_client, legacy_get_weather_info,
+               weather_api_script.get_weather_info, weather_api_script_v2.get_weather_info):
+        fn("Москва")
+    warmup.shutdown()
+    warmup.server_close()
+
+    fresh = run("before (new client)", legacy_new_client, args.fail_every, args.calls)
+    before = run("before (per call)", legacy_get_weather_info, args.fail_every, args.calls)
+    after = run("after (pooled)", weather_api_script.get_weather_info, args.fail_every, args.calls)
+    run("after v2 (structured)", weather_api_script_v2.get_weather_info, args.fail_every, args.calls)
+    for name, base in (("per call", before), ("new client", fresh)):
+        print(f"Накладные расходы на вызов против {name}: {base['mean_ms'] - after['mean_ms']:.3f} мс меньше "
+              f"(x{base['mean_ms'] / after['mean_ms']:.1f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк записи лога сессии: open/append/close на каждую реплику против LogWriter.
+
+Запуск из корня проекта:
+    python benchmarks/bench_log_writer.py
+"""
+
+import os
+import sys
+import json
+import pathlib
+import tempfile
+import timeit
+from datetime import datetime
+
+BASE = pathlib.Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(BASE))
+
+from src.log_writer import LogWriter
+
+TURNS = 5_000
+
+
+def make_entry(i: int) -> dict:
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "user_message": f"Сколько идёт доставка заказа {i}?",
+        "bot_response": "Стандартная доставка 2–5 рабочих дней. Экспресс — в течение 24–48 часов.",
+        "usage": {"prompt_tokens": 120, "completion_tokens": 40, "total_tokens": 160},
+    }
+
+
+def append_close(path: str, entry: dict):
+    """Исходный вариант log_interaction"""
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+def count_lines(path: str) -> int:
+    with open(path, "r", encoding="utf-8") as f:
+        return sum(1 for _ in f)
+
+
+def main():
+    entries = [make_entry(i) for i in range(TURNS)]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "append.jsonl")
+        direct = timeit.timeit(lambda: [append_close(path, e) for e in entries], number=1)
+        assert count_lines(path) == TURNS
+
+        path = os.path.join(tmp, "writer.jsonl")
+        writer = LogWriter(path)
+        queued = timeit.timeit(lambda: [writer.write(e) for e in entries], number=1)
+        drained = timeit.timeit(writer.close, number=1)
+        assert count_lines(path) == TURNS
+
+    print(f"Реплик: {TURNS}")
+    print(f"open/append/close: {direct / TURNS * 1e6:8.1f} мкс на реплику")
+    print(f"LogWriter.write:   {queued / TURNS * 1e6:8.1f} мкс на реплику (сброс очереди при закрытии: {drained * 1e3:.1f} мс)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк истории диалога: прежний список сообщений со срезом [-6:] и сборкой
+текста через += против ConversationMemory (бюджет токенов, готовый текст реплик).
+Резюме собирается без LLM, поэтому замер показывает только накладные расходы истории.
+
+Запуск из корня проекта:
+    python benchmarks/bench_memory.py --turns 2000
+"""
+
+import sys
+import time
+import argparse
+import pathlib
+import tracemalloc
+
+BASE = pathlib.Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(BASE))
+
+from src.memory import ConversationMemory, count_tokens
+
+
+def format_history(conversation_history):
+    """Прежняя реализация из app_lc.py"""
+    history_text = ""
+    for msg in conversation_history[-6:]:
+        if msg["role"] == "user":
+            history_text += f"Пользователь: {msg['content']}\n"
+        else:
+            history_text += f"Ассистент: {msg['content']}\n"
+    return history_text
+
+
+def make_turn(i: int):
+    user = f"Подскажите, что с заказом {10000 + i}? Хочу уточнить сроки доставки и способ оплаты."
+    assistant = "Заказ в пути, ожидаемая доставка через 2 дня. Оплатить можно картой при получении. " * 3
+    return user, assistant
+
+
+def run_list(turns: int):
+    history = []
+    for i in range(turns):
+        user, assistant = make_turn(i)
+        format_history(history)
+        history.append({"role": "user", "content": user})
+        history.append({"role": "assistant", "content": assistant})
+    return history
+
+
+def run_memory(turns: int, max_tokens: int):
+    memory = ConversationMemory(max_tokens=max_tokens)
+    for i in range(turns):
+        user, assistant = make_turn(i)
+        memory.render()
+        memory.add(user, assistant)
+    return memory
+
+
+def measure(name: str, fn, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    turns = args[0]
+    print(f"  {name:<34} {elapsed / turns * 1e6:8.1f} мкс/ход   пик памяти {peak / 1024:8.0f} КБ")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк истории диалога")
+    parser.add_argument("--turns", type=int, default=2000, help="Число ходов в сессии")
+    parser.add_argument("--max-tokens", type=int, default=1000, help="Бюджет токенов истории")
+    args = parser.parse_args()
+
+    count_tokens("")  # загрузка токенизатора не входит в замер
+    print(f"Сессия из {args.turns} ходов:")
+    history = measure("список + срез [-6:]", run_list, args.turns)
+    memory = measure(f"ConversationMemory ({args.max_tokens} ток.)", run_memory, args.turns, args.max_tokens)
+    print(f"  Сообщений в списке: {len(history)}; реплик в памяти: {len(memory)}, "
+          f"токенов в промпте: {memory.tokens}")
+
+
+if __name__ == "__main__":
+    main()
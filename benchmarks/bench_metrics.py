@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Цена замеров времени этапов: реплика проходит ~10 блоков span() (команда, маршрутизатор,
+FAQ, заказы, кэш, промпт, LLM, разбор, запись лога) плюс observe() итогового времени.
+Сравниваются пустой цикл, включённые и выключенные (METRICS=0) метрики.
+
+Запуск из корня проекта:
+    python benchmarks/bench_metrics.py
+"""
+
+import sys
+import pathlib
+import timeit
+
+BASE = pathlib.Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(BASE))
+
+from src.metrics import Metrics
+
+TURNS = 100_000
+STAGES = ("command", "route", "faq", "orders", "cache", "prompt", "llm", "parse", "log")
+
+
+def make_turn(metrics):
+    def turn():
+        for stage in STAGES:
+            with metrics.span(stage):
+                pass
+        metrics.observe("turn", 0.5)
+    return turn
+
+
+def baseline():
+    for stage in STAGES:
+        pass
+
+
+def per_turn_us(fn) -> float:
+    return min(timeit.repeat(fn, number=TURNS, repeat=5)) / TURNS * 1e6
+
+
+def main():
+    empty = per_turn_us(baseline)
+    disabled = per_turn_us(make_turn(Metrics(enabled=False)))
+    enabled_metrics = Metrics(enabled=True)
+    enabled = per_turn_us(make_turn(enabled_metrics))
+
+    print(f"Реплик: {TURNS}, блоков span на реплику: {len(STAGES)}")
+    print(f"  без замеров:          {empty:.2f} мкс/реплика")
+    print(f"  метрики выключены:    {disabled:.2f} мкс/реплика (+{disabled - empty:.2f})")
+    print(f"  метрики включены:     {enabled:.2f} мкс/реплика (+{enabled - empty:.2f})")
+    print(f"  строк в /metrics:     {len(enabled_metrics.render().splitlines())}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк хранилищ заказов: массовый импорт в SQLite и задержка поиска
+(JSON-словарь против SQLite) на синтетических заказах.
+
+Запуск из корня проекта (10 млн заказов занимают около 1 ГБ на диске):
+    python benchmarks/bench_order_store.py --rows 10000000
+"""
+
+import os
+import sys
+import random
+import argparse
+import pathlib
+import tempfile
+import threading
+import statistics
+import time
+
+BASE = pathlib.Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(BASE))
+
+from src.order_store import JsonOrderStore, SqliteOrderStore, import_orders
+
+STATUSES = ["in_transit", "delivered", "processing"]
+
+
+def make_order(i: int) -> dict:
+    status = STATUSES[i % 3]
+    if status == "in_transit":
+        return {"status": status, "eta_days": i % 7 + 1, "carrier": "ShoplyExpress"}
+    if status == "delivered":
+        return {"status": status, "delivered_at": "2025-08-10"}
+    return {"status": status, "note": "Ожидает комплектации на складе"}
+
+
+def iter_orders(rows: int):
+    for i in range(rows):
+        yield str(10_000_000 + i), make_order(i)
+
+
+def latencies(lookup, ids) -> list:
+    out = []
+    for order_id in ids:
+        start = time.perf_counter()
+        lookup(order_id)
+        out.append(time.perf_counter() - start)
+    return out
+
+
+def describe(name: str, samples: list):
+    samples = sorted(samples)
+    p50 = statistics.median(samples) * 1e6
+    p99 = samples[int(len(samples) * 0.99) - 1] * 1e6
+    print(f"  {name:<28} p50 {p50:8.1f} мкс   p99 {p99:8.1f} мкс")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк хранилищ заказов")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Число заказов")
+    parser.add_argument("--lookups", type=int, default=20_000, help="Число поисков")
+    parser.add_argument("--threads", type=int, default=4, help="Потоков для параллельного поиска в SQLite")
+    parser.add_argument("--json-limit", type=int, default=2_000_000,
+                        help="Не строить JSON-словарь больше этого размера (память)")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    hits = [str(10_000_000 + rng.randrange(args.rows)) for _ in range(args.lookups)]
+    misses = [str(rng.randrange(10_000_000)) for _ in range(args.lookups)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "orders.sqlite")
+        start = time.perf_counter()
+        import_orders(iter_orders(args.rows), db_path)
+        elapsed = time.perf_counter() - start
+        size_mb = os.path.getsize(db_path) / 2 ** 20
+        print(f"Импорт {args.rows} заказов: {elapsed:.1f} с ({args.rows / elapsed:,.0f} заказов/с), база {size_mb:.0f} МБ")
+
+        print("Поиск одного заказа:")
+        if args.rows <= args.json_limit:
+            store = JsonOrderStore(dict(iter_orders(args.rows)))
+            describe("JSON, найден", latencies(store.get, hits))
+            describe("JSON, не найден", latencies(store.get, misses))
+            del store
+
+        store = SqliteOrderStore(db_path)
+        describe("SQLite, найден", latencies(store.get, hits))
+        describe("SQLite, не найден", latencies(store.get, misses))
+
+        start = time.perf_counter()
+        for i in range(0, len(hits), 50):
+            store.get_many(hits[i:i + 50])
+        per_id = (time.perf_counter() - start) / len(hits) * 1e6
+        print(f"  {'SQLite, пачки по 50':<28} {per_id:8.1f} мкс на заказ")
+
+        results = []
+
+        def worker(ids):
+            results.extend(latencies(store.get, ids))
+
+        chunk = len(hits) // args.threads
+        threads = [threading.Thread(target=worker, args=(hits[i * chunk:(i + 1) * chunk],))
+                   for i in range(args.threads)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        throughput = len(results) / (time.perf_counter() - start)
+        describe(f"SQLite, {args.threads} потока", results)
+        print(f"  {'':<28} {throughput:,.0f} поисков/с")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Память и время старта pre-fork сервера: данные загружены в родителе до fork (по умолчанию)
+против загрузки в каждом процессе (--no-preload). Сервер запускается с заглушкой LLM,
+каждый процесс получает запросы к чату, затем по /proc снимается память родителя
+и обработчиков: rss, pss (общие страницы делятся поровну), shared и private.
+
+Только Linux. Запуск из корня проекта:
+    python benchmarks/bench_prefork.py [--workers 4] [--requests 40]
+"""
+
+import sys
+import json
+import time
+import socket
+import argparse
+import pathlib
+import subprocess
+import http.client
+
+BASE = pathlib.Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(BASE))
+
+from src.prefork import memory_usage
+
+MESSAGES = ["Сколько идёт доставка?", "Где мой заказ 12345?", "Как оформить возврат?", "Можно ли оплатить картой?"]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def request(port: int, method: str, path: str, payload: dict = None) -> dict:
+    # Новое соединение на каждый запрос, чтобы запросы расходились по процессам
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    try:
+        conn.request(method, path, json.dumps(payload, ensure_ascii=False).encode("utf-8") if payload else None)
+        return json.loads(conn.getresponse().read())
+    finally:
+        conn.close()
+
+
+def children(pid: int) -> list:
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(child) for child in f.read().split()]
+
+
+def run(workers: int, requests: int, preload: bool) -> dict:
+    port = free_port()
+    cmd = [sys.executable, "server.py", "--bot", "lc", "--fake-llm", "--fake-delay", "0",
+           "--workers", str(workers), "--port", str(port), "--memory-interval", "0"]
+    if not preload:
+        cmd.append("--no-preload")
+    started = time.perf_counter()
+    server = subprocess.Popen(cmd, cwd=BASE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            try:
+                request(port, "GET", "/health")
+                break
+            except OSError:
+                if time.perf_counter() - started > 60:
+                    raise RuntimeError("сервер не запустился за 60 с")
+                time.sleep(0.05)
+        ready = time.perf_counter() - started
+        first = time.perf_counter()
+        request(port, "POST", "/chat", {"session_id": "bench", "message": MESSAGES[0]})
+        first_chat = time.perf_counter() - first
+        for i in range(requests):
+            request(port, "POST", "/chat", {"session_id": f"bench-{i}", "message": MESSAGES[i % len(MESSAGES)]})
+
+        worker_memory = [memory_usage(pid) for pid in children(server.pid)]
+        parent = memory_usage(server.pid)
+        return {
+            "ready_s": round(ready, 2),
+            "first_chat_ms": round(first_chat * 1000, 1),
+            "parent": parent,
+            "workers": worker_memory,
+            "worker_rss_mean": round(sum(m.get("rss", 0) for m in worker_memory) / len(worker_memory), 1),
+            "worker_private_mean": round(sum(m.get("private", 0) for m in worker_memory) / len(worker_memory), 1),
+            "total_pss": round(parent.get("pss", 0) + sum(m.get("pss", 0) for m in worker_memory), 1),
+        }
+    finally:
+        server.terminate()
+        server.wait(30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Память и старт pre-fork сервера с загрузкой данных в родителе и без")
+    parser.add_argument("--workers", type=int, default=4, help="Число процессов-обработчиков")
+    parser.add_argument("--requests", type=int, default=40, help="Запросов к чату после старта (по всем процессам)")
+    parser.add_argument("--json", help="Сохранить отчёт в JSON-файл")
+    args = parser.parse_args()
+
+    report = {"workers": args.workers}
+    for name, preload in (("per-worker", False), ("preload", True)):
+        report[name] = result = run(args.workers, args.requests, preload)
+        print(f"{name:<11} ready {result['ready_s']} с, первый ответ {result['first_chat_ms']} мс, "
+              f"rss обработчика {result['worker_rss_mean']} МБ, своих {result['worker_private_mean']} МБ, "
+              f"всего pss {result['total_pss']} МБ")
+    saved = report["per-worker"]["total_pss"] - report["preload"]["total_pss"]
+    print(f"Экономия памяти на {args.workers} процессах: {saved:.1f} МБ pss")
+
+    if args.json:
+        pathlib.Path(args.json).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
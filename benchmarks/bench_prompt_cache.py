@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Сравнение раскладки промпта брендированной цепочки до и после переноса изменяемых
+частей в конец: сколько токенов промпта совпадает с предыдущим запросом (их провайдер
+может взять из кэша префикса) на тестовых промптах data/eval_prompts.txt.
+
+Без ключа API считается по токенизатору; с --live оба варианта отправляются в модель,
+и в отчёт попадают prompt_tokens, cached_tokens из usage и задержка.
+
+Запуск из корня проекта:
+    python benchmarks/bench_prompt_cache.py [--live] [--json reports/prompt_cache.json]
+"""
+
+import sys
+import json
+import time
+import argparse
+import pathlib
+import statistics
+
+BASE = pathlib.Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(BASE))
+
+from src.brand_chain import (
+    BrandResponse, create_faq_contexts, create_order_context, create_prompt_template,
+    create_system_prompt, get_llm, load_few_shots, track_usage,
+)
+from src.memory import count_tokens
+
+# Провайдер кэширует префиксы от 1024 токенов с шагом 128
+CACHE_MIN_TOKENS = 1024
+CACHE_STEP = 128
+
+
+def create_legacy_prompt_template():
+    """Прежняя раскладка: примеры, контексты и история в одном сообщении пользователя"""
+    from langchain_core.prompts import ChatPromptTemplate
+
+    few_shot_text = "\n\nПримеры:\n"
+    for shot in load_few_shots()[:2]:
+        few_shot_text += f"Пользователь: {shot['user']}\nАссистент: {shot['assistant']}\n\n"
+    return ChatPromptTemplate.from_messages([
+        ("system", create_system_prompt()),
+        ("human", few_shot_text.replace("{", "{{").replace("}", "}}") + "\nКонтекст FAQ:\n{faq_context}\n\nКонтекст заказов:\n{order_context}\n\nТекущий диалог:\n{history}\n\nПользователь: {input}\nАссистент:")
+    ])
+
+
+def make_inputs(prompts):
+    """Вход цепочки для каждого промпта; история - предыдущие вопросы, как в одной сессии"""
+    inputs, history = [], ""
+    for prompt, faq_context in zip(prompts, create_faq_contexts(prompts)):
+        inputs.append({
+            "faq_context": faq_context,
+            "order_context": create_order_context(prompt),
+            "history": history,
+            "input": prompt,
+        })
+        history += f"Пользователь: {prompt}\nАссистент: ...\n"
+    return inputs
+
+
+def serialize(template, values) -> str:
+    return "".join(f"<{m.type}>{m.content}" for m in template.format_messages(**values))
+
+
+def common_prefix(a: str, b: str) -> str:
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return a[:n]
+
+
+def cacheable(prefix_tokens: int) -> int:
+    if prefix_tokens < CACHE_MIN_TOKENS:
+        return 0
+    return prefix_tokens // CACHE_STEP * CACHE_STEP
+
+
+def offline(template, inputs) -> dict:
+    prompt_tokens, prefix_tokens = [], []
+    previous = ""
+    for values in inputs:
+        text = serialize(template, values)
+        prompt_tokens.append(count_tokens(text))
+        prefix_tokens.append(count_tokens(common_prefix(text, previous)) if previous else 0)
+        previous = text
+    shared = prefix_tokens[1:] or [0]
+    return {
+        "prompt_tokens_mean": round(statistics.mean(prompt_tokens), 1),
+        "shared_prefix_tokens_mean": round(statistics.mean(shared), 1),
+        "shared_prefix_share": round(sum(shared) / sum(prompt_tokens[1:] or [1]), 3),
+        "cacheable_tokens_mean": round(statistics.mean(cacheable(t) for t in shared), 1),
+    }
+
+
+def live(template, inputs) -> dict:
+    chain = template | get_llm().with_structured_output(BrandResponse)
+    prompt_tokens, cached_tokens, latencies = [], [], []
+    for values in inputs:
+        started = time.perf_counter()
+        with track_usage() as usage:
+            chain.invoke(values)
+        latencies.append(time.perf_counter() - started)
+        prompt_tokens.append(usage.get("prompt_tokens", 0))
+        cached_tokens.append(usage.get("cached_tokens", 0))
+    return {
+        "prompt_tokens_mean": round(statistics.mean(prompt_tokens), 1),
+        "cached_tokens_mean": round(statistics.mean(cached_tokens), 1),
+        "latency_ms_p50": round(statistics.median(latencies) * 1000, 1),
+        "latency_ms_mean": round(statistics.mean(latencies) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Кэшируемый префикс промпта: до и после")
+    parser.add_argument("--live", action="store_true", help="Отправить запросы в модель и взять usage")
+    parser.add_argument("--json", help="Сохранить отчёт в JSON-файл")
+    args = parser.parse_args()
+
+    with open(BASE / "data" / "eval_prompts.txt", "r", encoding="utf-8") as f:
+        prompts = [line.strip() for line in f if line.strip()]
+    inputs = make_inputs(prompts)
+    layouts = {"before": create_legacy_prompt_template(), "after": create_prompt_template()}
+
+    report = {"prompts": len(prompts)}
+    for name, template in layouts.items():
+        report[name] = result = offline(template, inputs)
+        if args.live:
+            result.update(live(template, inputs))
+        print(f"{name}: " + ", ".join(f"{k}={v}" for k, v in result.items()))
+
+    if args.json:
+        pathlib.Path(args.json).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
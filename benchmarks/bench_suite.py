@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Набор микробенчмарков горячих путей без LLM (app.py, app_lc.py и src/) на синтетических
+данных нескольких размеров (benchmarks/fixtures.py). Результаты сохраняются в JSON
+с номером коммита, чтобы сравнивать прогоны между коммитами.
+
+Запуск из корня проекта:
+    python benchmarks/bench_suite.py [--sizes small,medium] [--only faq] [--json reports/benchmarks/<commit>.json]
+    python benchmarks/bench_suite.py --compare reports/benchmarks/<старый коммит>.json [--threshold 1.2]
+"""
+
+import os
+import sys
+import json
+import time
+import timeit
+import argparse
+import pathlib
+import platform
+import itertools
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+
+BASE = pathlib.Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(BASE))
+os.chdir(BASE)
+
+# Без наблюдателя за файлами, дискового кэша ответов и настоящего ключа API
+os.environ["HOT_RELOAD_INTERVAL"] = "0"
+os.environ["RESPONSE_CACHE_PATH"] = ""
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+from fixtures import ANSWERS, SIZES, Fixture, make_fixture
+from src.faq_index import FaqIndex
+from src.faq_retrieval import FaqRetriever
+from src.order_store import JsonOrderStore
+from src.memory import ConversationMemory
+from src import brand_chain
+from src.style_rules import rule_checks
+
+REPORTS_DIR = BASE / "reports" / "benchmarks"
+REPEAT = 5
+
+
+class Context:
+    """Боты и ресурсы цепочки, подменённые синтетическими данными одного размера"""
+
+    def __init__(self, fixture: Fixture, log_dir: str):
+        from app import EcomBot
+        from app_lc import EcomBrandBot
+
+        self.fixture = fixture
+        brand_chain.get_faq_state.set(brand_chain.FaqState(
+            fixture.faq, FaqIndex(fixture.faq), FaqRetriever.build([item["q"] for item in fixture.faq])
+        ))
+        brand_chain.get_order_store.set(JsonOrderStore(fixture.orders))
+        brand_chain.load_few_shots.set(fixture.few_shots)
+        brand_chain.get_chain_state.set(brand_chain.build_chain_state(None, fixture.few_shots))
+        brand_chain.get_response_cache.reset()
+
+        self.bot = EcomBot(log_file=os.path.join(log_dir, "app.jsonl"))
+        self.bot.faq_data = fixture.faq
+        self.bot.faq_index = FaqIndex(fixture.faq)
+        self.bot.orders_data = JsonOrderStore(fixture.orders)
+        self.lc_bot = EcomBrandBot(log_file=os.path.join(log_dir, "app_lc.jsonl"))
+
+    def close(self):
+        for bot in (self.bot, self.lc_bot):
+            bot.log_writer.close()
+            bot.watcher.stop()
+
+    def order_ids(self) -> List[str]:
+        ids = list(self.fixture.orders)
+        return [ids[0], ids[len(ids) // 2], ids[-1], "99999999"]
+
+    def history(self) -> ConversationMemory:
+        """История из синтетического диалога; резюме без LLM (extractive_summary)"""
+        memory = ConversationMemory.from_env()
+        for user, assistant in self.fixture.dialog:
+            memory.add(user, assistant)
+        return memory
+
+
+def cycle(items) -> Callable:
+    return itertools.cycle(items).__next__
+
+
+def bench_app_get_faq_answer(ctx: Context):
+    query = cycle(ctx.fixture.queries)
+    return lambda: ctx.bot.get_faq_answer(query())
+
+
+def bench_app_get_order_status(ctx: Context):
+    order_id = cycle(ctx.order_ids())
+    return lambda: ctx.bot.get_order_status(order_id())
+
+
+def bench_app_prepare_request(ctx: Context):
+    """Сообщения для модели (системный промпт, история, вопрос) и ключ кэша"""
+    query, history = cycle(ctx.fixture.queries), ctx.history()
+    return lambda: ctx.bot.prepare_request(query(), history)
+
+
+def bench_app_log_interaction(ctx: Context):
+    usage = {"prompt_tokens": 1200, "completion_tokens": 80, "total_tokens": 1280, "cached_tokens": 1024}
+    timing = {"ttft_ms": 420.0, "latency_ms": 1250.0}
+    return lambda: ctx.bot.log_interaction("Сколько идёт доставка?", ANSWERS[0], usage, timing=timing)
+
+
+def bench_app_lc_fast_reply(ctx: Context):
+    """Команды и маршрутизатор: шаблон, статус заказа, FAQ или None"""
+    query = cycle(ctx.fixture.queries)
+    return lambda: ctx.lc_bot.fast_reply(query())
+
+
+def bench_app_lc_format_history(ctx: Context):
+    """Как на каждом ходу: реплика добавляется в историю, затем история берётся текстом"""
+    memory = ctx.history()
+    turn = cycle(ctx.fixture.dialog)
+
+    def run():
+        memory.add(*turn())
+        return ctx.lc_bot.format_history(memory)
+    return run
+
+
+def bench_app_lc_log_interaction(ctx: Context):
+    usage = {"model": brand_chain.MODEL, "prompt_tokens": 1500, "completion_tokens": 90, "total_tokens": 1590}
+    timing = {"ttft_ms": 510.0, "latency_ms": 1400.0}
+    return lambda: ctx.lc_bot.log_interaction("Как оформить возврат?", ANSWERS[1], usage, timing=timing)
+
+
+def bench_get_order_status(ctx: Context):
+    order_id = cycle(ctx.order_ids())
+    return lambda: brand_chain.get_order_status(order_id())
+
+
+def bench_create_order_context(ctx: Context):
+    query = cycle(ctx.fixture.queries)
+    return lambda: brand_chain.create_order_context(query())
+
+
+def bench_create_faq_context(ctx: Context):
+    query = cycle(ctx.fixture.queries)
+    return lambda: brand_chain.create_faq_context(query())
+
+
+def bench_create_prompt_template(ctx: Context):
+    return lambda: brand_chain.create_prompt_template(None, ctx.fixture.few_shots)
+
+
+def bench_format_prompt(ctx: Context):
+    """Подстановка истории, контекстов и вопроса в готовый шаблон"""
+    template = brand_chain.create_prompt_template(None, ctx.fixture.few_shots)
+    history = ctx.history().render()
+    inputs = [
+        {"history": history, "faq_context": brand_chain.create_faq_context(q),
+         "order_context": brand_chain.create_order_context(q), "input": q}
+        for q in ctx.fixture.queries
+    ]
+    values = cycle(inputs)
+    return lambda: template.format_messages(**values())
+
+
+def bench_rule_checks(ctx: Context):
+    answer = cycle(ANSWERS)
+    return lambda: rule_checks(answer())
+
+
+BENCHMARKS: List[Tuple[str, Callable]] = [
+    ("app.get_faq_answer", bench_app_get_faq_answer),
+    ("app.get_order_status", bench_app_get_order_status),
+    ("app.prepare_request", bench_app_prepare_request),
+    ("app.log_interaction", bench_app_log_interaction),
+    ("app_lc.fast_reply", bench_app_lc_fast_reply),
+    ("app_lc.format_history", bench_app_lc_format_history),
+    ("app_lc.log_interaction", bench_app_lc_log_interaction),
+    ("brand_chain.get_order_status", bench_get_order_status),
+    ("brand_chain.create_order_context", bench_create_order_context),
+    ("brand_chain.create_faq_context", bench_create_faq_context),
+    ("brand_chain.create_prompt_template", bench_create_prompt_template),
+    ("brand_chain.format_prompt", bench_format_prompt),
+    ("style_rules.rule_checks", bench_rule_checks),
+]
+
+
+def measure(fn: Callable, repeat: int = REPEAT) -> dict:
+    """Время одного вызова, мкс: число вызовов подбирается так, чтобы замер шёл ~0.2 с"""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    per_call = [t / number * 1e6 for t in timer.repeat(repeat, number)]
+    return {
+        "calls": number,
+        "min_us": round(min(per_call), 3),
+        "median_us": round(statistics.median(per_call), 3),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], cwd=BASE, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(sizes: List[str], only: str = "", repeat: int = REPEAT) -> Dict[str, Dict[str, dict]]:
+    results = {}
+    for size in sizes:
+        started = time.perf_counter()
+        fixture = make_fixture(size)
+        with tempfile.TemporaryDirectory() as log_dir:
+            ctx = Context(fixture, log_dir)
+            print(f"[{size}] данные и боты: {time.perf_counter() - started:.1f} с")
+            results[size] = {}
+            for name, setup in BENCHMARKS:
+                if only and only not in name:
+                    continue
+                results[size][name] = stats = measure(setup(ctx), repeat)
+                print(f"  {name:<36} {stats['median_us']:>12.2f} мкс")
+            ctx.close()
+    return results
+
+
+def compare(results: Dict[str, Dict[str, dict]], baseline: dict, threshold: float) -> List[str]:
+    """Сравнение медиан с прошлым прогоном; возвращает список замедлений больше threshold раз"""
+    regressions = []
+    print(f"\nСравнение с {baseline.get('commit', '?')} (порог {threshold}x):")
+    for size, benches in results.items():
+        for name, stats in benches.items():
+            old = baseline.get("results", {}).get(size, {}).get(name)
+            if not old:
+                continue
+            ratio = stats["median_us"] / old["median_us"] if old["median_us"] else 1.0
+            mark = ""
+            if ratio > threshold:
+                mark = "  <- медленнее"
+                regressions.append(f"{size}/{name}")
+            print(f"  {size:<7} {name:<36} {old['median_us']:>12.2f} -> {stats['median_us']:>12.2f} мкс  x{ratio:.2f}{mark}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Микробенчмарки горячих путей без LLM")
+    parser.add_argument("--sizes", default="small,medium", help=f"Размеры данных через запятую: {', '.join(SIZES)}")
+    parser.add_argument("--only", default="", help="Только бенчмарки, в имени которых есть эта строка")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="Число повторов замера")
+    parser.add_argument("--json", help="Файл результатов (по умолчанию reports/benchmarks/<коммит>.json)")
+    parser.add_argument("--compare", help="JSON прошлого прогона для сравнения")
+    parser.add_argument("--threshold", type=float, default=1.2, help="Замедление, которое считается регрессией")
+    args = parser.parse_args()
+
+    sizes = [size.strip() for size in args.sizes.split(",") if size.strip()]
+    unknown = [size for size in sizes if size not in SIZES]
+    if unknown:
+        parser.error(f"неизвестные размеры: {', '.join(unknown)}")
+
+    commit = git_commit()
+    results = run(sizes, args.only, args.repeat)
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "sizes": {size: SIZES[size] for size in sizes},
+        "results": results,
+    }
+    out = pathlib.Path(args.json) if args.json else REPORTS_DIR / f"{commit}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"Результаты: {out}")
+
+    if args.compare:
+        baseline = json.loads(pathlib.Path(args.compare).read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"Замедлений: {len(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Синтетические данные для бенчмарков: FAQ, заказы, few-shot примеры, диалог и запросы
+клиента нескольких размеров. Генерация детерминированная (фиксированный seed),
+поэтому прогоны на разных коммитах сравнимы между собой.
+"""
+
+import random
+from typing import Dict, List, NamedTuple, Tuple
+
+# Размеры наборов: записи FAQ, заказы, few-shot примеры, реплики истории
+SIZES = {
+    "small": {"faq": 100, "orders": 1_000, "few_shots": 5, "history": 5},
+    "medium": {"faq": 1_000, "orders": 100_000, "few_shots": 20, "history": 20},
+    "large": {"faq": 10_000, "orders": 1_000_000, "few_shots": 100, "history": 50},
+}
+SEED = 42
+FIRST_ORDER_ID = 10_000
+
+WORDS = ("заказ доставка возврат оплата промокод адрес курьер самовывоз карта чек "
+         "упаковка склад пункт срок статус товар гарантия обмен подарок скидка").split()
+CATEGORIES = ["доставка", "оплата", "возврат", "аккаунт", "гарантия"]
+STATUSES = ("in_transit", "delivered", "processing")
+ANSWERS = [
+    "Стандартная доставка 2–5 рабочих дней. Экспресс — в течение 24–48 часов.",
+    "Вернуть можно в течение 14 дней.\n- Заполните форму в личном кабинете\n- Приложите чек",
+    "Отличная новость!!! Заказ уже в пути 🚚",
+    "Доступны карты и СБП. " * 40,
+]
+
+
+class Fixture(NamedTuple):
+    faq: List[Dict[str, str]]
+    orders: Dict[str, dict]
+    few_shots: List[Dict[str, str]]
+    dialog: List[Tuple[str, str]]
+    queries: List[str]
+
+
+def make_faq(size: int, rng: random.Random) -> List[Dict[str, str]]:
+    faq = []
+    for i in range(size):
+        words = rng.sample(WORDS, 4)
+        question = f"{rng.choice(CATEGORIES).capitalize()} {i}: {' '.join(words)}?"
+        faq.append({"q": question, "a": f"Ответ {i}: {' '.join(rng.sample(WORDS, 6))}."})
+    return faq
+
+
+def make_order(i: int) -> dict:
+    status = STATUSES[i % 3]
+    if status == "in_transit":
+        return {"status": status, "eta_days": i % 7 + 1, "carrier": "ShoplyExpress"}
+    if status == "delivered":
+        return {"status": status, "delivered_at": "2025-08-10"}
+    return {"status": status, "note": "Ожидает комплектации на складе"}
+
+
+def make_orders(size: int) -> Dict[str, dict]:
+    return {str(FIRST_ORDER_ID + i): make_order(i) for i in range(size)}
+
+
+def make_few_shots(size: int, rng: random.Random) -> List[Dict[str, str]]:
+    return [
+        {"user": f"Вопрос {i}: {' '.join(rng.sample(WORDS, 5))}?", "assistant": rng.choice(ANSWERS[:2])}
+        for i in range(size)
+    ]
+
+
+def make_dialog(turns: int, rng: random.Random) -> List[Tuple[str, str]]:
+    return [(f"Подскажите про {' '.join(rng.sample(WORDS, 3))}", rng.choice(ANSWERS)) for _ in range(turns)]
+
+
+def make_queries(faq: List[Dict[str, str]], orders: Dict[str, dict], rng: random.Random, count: int = 50) -> List[str]:
+    """Смесь запросов: точный вопрос FAQ, статус заказа (в том числе несуществующего), вопрос мимо FAQ"""
+    order_ids = list(orders)
+    queries = []
+    for i in range(count):
+        kind = i % 4
+        if kind == 0:
+            queries.append(rng.choice(faq)["q"])
+        elif kind == 1:
+            queries.append(f"Где мой заказ {rng.choice(order_ids)}?")
+        elif kind == 2:
+            queries.append(f"Заказы {rng.choice(order_ids)}, {rng.choice(order_ids)} и 99999999 - что со статусом?")
+        else:
+            queries.append(f"Можно ли {' '.join(rng.sample(WORDS, 4))} в выходные?")
+    return queries
+
+
+def make_fixture(size: str) -> Fixture:
+    params = SIZES[size]
+    rng = random.Random(SEED)
+    faq = make_faq(params["faq"], rng)
+    orders = make_orders(params["orders"])
+    return Fixture(
+        faq=faq,
+        orders=orders,
+        few_shots=make_few_shots(params["few_shots"], rng),
+        dialog=make_dialog(params["history"], rng),
+        queries=make_queries(faq, orders, rng),
+    )
@@ -5,6 +5,8 @@ import argparse
 from datetime import datetime
 from dotenv import load_dotenv
 from openai import OpenAI
+from faq_index import FaqIndex
+from log_writer import LogWriter
 
 # Загрузка переменных окружения
 load_dotenv()
@@ -24,6 +26,7 @@ class EcomBot:
         # Загрузка FAQ
         with open(FAQ_FILE, "r", encoding="utf-8") as f:
             self.faq_data = json.load(f)
+        self.faq_index = FaqIndex(self.faq_data)
         
         # Загрузка заказов
         with open(ORDERS_FILE, "r", encoding="utf-8") as f:
@@ -35,13 +38,11 @@ class EcomBot:
         # Создание уникального лог-файла для этой сессии
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         self.log_file = f"{LOGS_DIR}/session_{timestamp}.jsonl"
+        self.log_writer = LogWriter(self.log_file)
     
     def get_faq_answer(self, question):
         """Поиск ответа на вопрос в FAQ"""
-        for item in self.faq_data:
-            if item["q"].lower() in question.lower() or question.lower() in item["q"].lower():
-                return item["a"]
-        return None
+        return self.faq_index.get_answer(question)
     
     def get_order_status(self, order_id):
         """Получение статуса заказа по ID"""
@@ -64,8 +65,8 @@ class EcomBot:
             "usage": usage
         }
         
-        with open(self.log_file, "a", encoding="utf-8") as f:
-            f.write(json.dumps(log_entry, ensure_ascii=False) + "\n")
+        # Запись уходит в фоновый поток, который сбрасывает лог на диск пачками
+        self.log_writer.write(log_entry)
     
     def process_command(self, user_input):
         """Обработка специальных команд"""
@@ -168,6 +169,9 @@ class EcomBot:
             except Exception as e:
                 print(f"Бот: Извините, произошла непредвиденная ошибка. Попробуйте еще раз.")
                 self.log_interaction(user_input, f"Ошибка: {str(e)}", None)
+        
+        # Дописываем в лог всё, что осталось в очереди
+        self.log_writer.close()
 
 def main():
     parser = argparse.ArgumentParser(description="E-commerce support chatbot")
@@ -0,0 +1,116 @@
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import threading
+from typing import Optional
+
+# Служебные сигналы для фонового потока
+_FLUSH = object()
+_STOP = object()
+
+
+class LogWriter:
+    """
+    Буферизованная запись JSONL-лога в фоновом потоке.
+    write() сериализует запись (ошибка сериализации достаётся вызывающему) и кладёт строку
+    в очередь; поток сбрасывает строки на диск пачками - при накоплении batch_size строк
+    или раз в flush_interval секунд. Ошибка записи пачки печатается в stderr, пачка
+    отбрасывается, поток продолжает работу. При close() (и при выходе из процесса)
+    очередь дописывается полностью.
+    """
+
+    def __init__(self, path: str, batch_size: int = 64, flush_interval: float = 0.5):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue: "queue.Queue" = queue.Queue()
+        self.closed = False
+        self.dropped = 0
+        self.thread = threading.Thread(target=self._run, name=f"log-writer:{path}", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def write(self, entry: dict):
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        if self.closed or not self.thread.is_alive():
+            # После закрытия (или без потока) пишем синхронно, чтобы не потерять запись
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+            return
+        self.queue.put(line)
+
+    def flush(self, timeout: Optional[float] = None):
+        """Дождаться, пока всё, что уже в очереди, окажется в файле"""
+        if self.closed or not self.thread.is_alive():
+            return
+        done = threading.Event()
+        self.queue.put((_FLUSH, done))
+        deadline = None if timeout is None else time.monotonic() + timeout
+        # Не ждём вечно, если поток всё же завершился
+        while not done.wait(0.1) and self.thread.is_alive():
+            if deadline is not None and time.monotonic() >= deadline:
+                return
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        if self.thread.is_alive():
+            self.queue.put(_STOP)
+            self.thread.join()
+        atexit.unregister(self.close)
+
+    def _write_batch(self, f, batch):
+        """Записать пачку; при ошибке файл закрывается и открывается заново на следующей пачке"""
+        try:
+            if f is None:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                f = open(self.path, "a", encoding="utf-8")
+            f.write("".join(batch))
+            f.flush()
+        except Exception as e:
+            self.dropped += len(batch)
+            print(f"Лог {self.path}: не записано {len(batch)} строк ({type(e).__name__}: {e}), "
+                  f"всего потеряно {self.dropped}", file=sys.stderr, flush=True)
+            if f is not None:
+                try:
+                    f.close()
+                except Exception:
+                    pass
+            return None
+        return f
+
+    def _run(self):
+        f = None
+        batch = []
+        deadline = 0.0
+        try:
+            while True:
+                try:
+                    item = self.queue.get(timeout=max(deadline - time.monotonic(), 0) if batch else None)
+                except queue.Empty:
+                    item = None
+
+                done = None
+                if isinstance(item, tuple) and item and item[0] is _FLUSH:
+                    done = item[1]
+                elif item is not None and item is not _STOP:
+                    if not batch:
+                        deadline = time.monotonic() + self.flush_interval
+                    batch.append(item)
+
+                if batch and (item is None or item is _STOP or done is not None
+                              or len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                    f = self._write_batch(f, batch)
+                    batch.clear()
+
+                if done is not None:
+                    done.set()
+                if item is _STOP:
+                    return
+        finally:
+            if f is not None:
+                f.close()
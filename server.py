@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+"""
+HTTP-сервер для одновременной работы с множеством клиентов: один процесс asyncio
+обслуживает тысячи сессий, у каждой своя история диалога (по session_id).
+
+    POST /chat    {"session_id": "...", "message": "..."} -> {"session_id", "response", "usage"}
+                  с "stream": true ответ идёт строками JSON: {"delta": "..."}, затем итоговая строка
+    GET  /health  -> {"status": "ok", "sessions": N, "pid": ..., "memory": {"rss", "pss", "shared", "private"}}
+    GET  /metrics -> гистограммы времени этапов обработки реплики (текстовый формат Prometheus)
+
+Запуск из корня проекта:
+    python server.py --bot lc --port 8080 --workers 4 [--memory-interval 60]
+    python server.py --bot openai --fake-llm          # локальная заглушка вместо LLM
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import signal
+import socket
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from types import SimpleNamespace
+from src.streaming import StreamTimer
+from src.metrics import METRICS, span
+from src.prefork import Supervisor, format_memory, freeze, memory_usage
+
+LOGS_DIR = "logs"
+MAX_BODY = 64 * 1024
+EXIT_WORDS = ["выход", "exit", "quit"]
+ERROR_REPLY = "Извините, произошла ошибка при обработке вашего запроса. Пожалуйста, попробуйте позже."
+TIMEOUT_REPLY = "Извините, ответ занимает слишком много времени. Пожалуйста, попробуйте позже."
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 504: "Gateway Timeout"}
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class Sessions:
+    """
+    История диалога (ConversationMemory бота) по session_id в памяти процесса (при --workers > 1
+    у каждого процесса своя); неактивные сессии удаляются через ttl секунд
+    """
+
+    def __init__(self, create_memory, ttl: float = 1800):
+        self.create_memory = create_memory
+        self.ttl = ttl
+        self.items = {}
+
+    def get(self, session_id: str):
+        item = self.items.get(session_id)
+        memory = item[0] if item else self.create_memory()
+        self.items[session_id] = (memory, time.monotonic())
+        return memory
+
+    async def append(self, session_id: str, user_input: str, bot_response: str):
+        # При переполнении бюджета память вызывает LLM для резюме - не блокируем цикл событий
+        with span("history"):
+            await asyncio.to_thread(self.get(session_id).add, user_input, bot_response)
+
+    def drop(self, session_id: str):
+        self.items.pop(session_id, None)
+
+    def expire(self) -> int:
+        deadline = time.monotonic() - self.ttl
+        stale = [sid for sid, (_, seen) in self.items.items() if seen < deadline]
+        for sid in stale:
+            del self.items[sid]
+        return len(stale)
+
+
+def create_bot(kind: str, log_file: str):
+    """Бот выбранного типа; импорт внутри, чтобы не тянуть лишние зависимости"""
+    if kind == "lc":
+        from app_lc import EcomBrandBot
+        return EcomBrandBot(log_file=log_file)
+    from app import EcomBot
+    return EcomBot(log_file=log_file)
+
+
+def install_fake_llm(kind: str, bot, delay: float):
+    """Локальная заглушка LLM с задержкой delay секунд - для нагрузочных проверок без API"""
+    if kind == "lc":
+        from langchain_core.runnables import RunnableLambda
+        from src.brand_chain import BrandResponse, ChainState, get_chain_state, get_llm
+
+        def answer(inputs):
+            return BrandResponse(answer=f"Ответ на: {inputs['input']}", tone="дружелюбный", actions=[])
+
+        async def aanswer(inputs):
+            await asyncio.sleep(delay)
+            return answer(inputs)
+
+        def stream(inputs):
+            time.sleep(delay)
+            text = answer(inputs).answer
+            for end in range(1, len(text) + 1):
+                yield {"answer": text[:end]}
+            yield answer(inputs).model_dump()
+
+        async def astream(inputs):
+            await asyncio.sleep(delay)
+            text = answer(inputs).answer
+            for end in range(1, len(text) + 1):
+                yield {"answer": text[:end]}
+            yield answer(inputs).model_dump()
+
+        get_llm.set(SimpleNamespace(model_name="fake", temperature=0.0))
+        stream_chain = RunnableLambda(stream, afunc=astream)
+        get_chain_state.set(ChainState(RunnableLambda(answer, afunc=aanswer), "fake", stream_chain))
+        return
+
+    def create(model, messages, stream=False, **kwargs):
+        time.sleep(delay)
+        text = f"Ответ на: {messages[-1]['content']}"
+        usage = SimpleNamespace(prompt_tokens=0, completion_tokens=0, total_tokens=0)
+        if stream:
+            chunks = [SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=c))], usage=None)
+                      for c in text]
+            return chunks + [SimpleNamespace(choices=[], usage=usage)]
+        message = SimpleNamespace(content=text)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+    bot.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+class ChatServer:
+    def __init__(self, bot, timeout: float = 30, session_ttl: float = 1800, threads: int = 64):
+        self.bot = bot
+        self.timeout = timeout
+        self.threads = threads
+        self.sessions = Sessions(bot.create_memory, session_ttl)
+
+    @staticmethod
+    def parse_chat(payload: dict) -> tuple:
+        message = payload.get("message")
+        if not isinstance(message, str) or not message.strip():
+            raise HttpError(400, "Поле message обязательно")
+        return message.strip(), str(payload.get("session_id") or uuid.uuid4().hex)
+
+    def goodbye(self, session_id: str) -> dict:
+        self.sessions.drop(session_id)
+        return {"session_id": session_id, "response": "До свидания! Спасибо за обращение.", "usage": None}
+
+    async def chat(self, message: str, session_id: str) -> tuple:
+        if message.lower() in EXIT_WORDS:
+            return 200, self.goodbye(session_id)
+
+        history = self.sessions.get(session_id)
+        timer = StreamTimer()
+        try:
+            bot_response, usage = await asyncio.wait_for(
+                self.bot.aget_bot_response(message, history), self.timeout
+            )
+        except asyncio.TimeoutError:
+            self.bot.log_interaction(message, "Ошибка: превышено время ответа", None, session_id=session_id)
+            return 504, {"session_id": session_id, "response": TIMEOUT_REPLY, "usage": None}
+        except Exception as e:
+            self.bot.log_interaction(message, f"Ошибка: {str(e)}", None, session_id=session_id)
+            return 200, {"session_id": session_id, "response": ERROR_REPLY, "usage": None}
+
+        self.bot.log_interaction(message, bot_response, usage, session_id=session_id, timing=timer.timing())
+        await self.sessions.append(session_id, message, bot_response)
+        return 200, {"session_id": session_id, "response": bot_response, "usage": usage}
+
+    async def chat_stream(self, message: str, session_id: str):
+        """Потоковый ответ: строки {"delta": ...} по мере генерации, затем итог с usage и timing"""
+        if message.lower() in EXIT_WORDS:
+            yield self.goodbye(session_id)
+            return
+
+        history = self.sessions.get(session_id)
+        deltas = asyncio.Queue()
+        task = asyncio.ensure_future(asyncio.wait_for(
+            self.bot.astream_bot_response(message, history, deltas.put_nowait), self.timeout
+        ))
+        try:
+            while not task.done():
+                get = asyncio.ensure_future(deltas.get())
+                await asyncio.wait({get, task}, return_when=asyncio.FIRST_COMPLETED)
+                if get.done():
+                    yield {"delta": get.result()}
+                else:
+                    get.cancel()
+            while not deltas.empty():
+                yield {"delta": deltas.get_nowait()}
+            bot_response, usage, timing = task.result()
+        except asyncio.TimeoutError:
+            self.bot.log_interaction(message, "Ошибка: превышено время ответа", None, session_id=session_id)
+            yield {"session_id": session_id, "error": "timeout", "response": TIMEOUT_REPLY, "usage": None}
+            return
+        except Exception as e:
+            self.bot.log_interaction(message, f"Ошибка: {str(e)}", None, session_id=session_id)
+            yield {"session_id": session_id, "error": "internal", "response": ERROR_REPLY, "usage": None}
+            return
+        finally:
+            task.cancel()
+
+        self.bot.log_interaction(message, bot_response, usage, session_id=session_id, timing=timing)
+        await self.sessions.append(session_id, message, bot_response)
+        yield {"session_id": session_id, "response": bot_response, "usage": usage, "timing": timing}
+
+    async def route(self, method: str, path: str, body: bytes) -> tuple:
+        if path == "/health":
+            if method != "GET":
+                raise HttpError(405, "Ожидается GET")
+            return 200, {"status": "ok", "sessions": len(self.sessions.items), "pid": os.getpid(),
+                         "memory": memory_usage(os.getpid())}
+        if path == "/metrics":
+            if method != "GET":
+                raise HttpError(405, "Ожидается GET")
+            # У каждого процесса свои метрики, поэтому в метках есть pid
+            return 200, METRICS.render({"pid": str(os.getpid())})
+        if path == "/chat":
+            if method != "POST":
+                raise HttpError(405, "Ожидается POST")
+            try:
+                payload = json.loads(body or b"{}")
+            except ValueError:
+                raise HttpError(400, "Тело запроса должно быть JSON")
+            if not isinstance(payload, dict):
+                raise HttpError(400, "Тело запроса должно быть JSON-объектом")
+            message, session_id = self.parse_chat(payload)
+            if payload.get("stream"):
+                return 200, self.chat_stream(message, session_id)
+            return await self.chat(message, session_id)
+        raise HttpError(404, "Неизвестный путь")
+
+    @staticmethod
+    async def read_request(reader: asyncio.StreamReader):
+        """Запрос HTTP/1.1: (метод, путь, keep-alive, тело) или None, если клиент закрыл соединение"""
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            return None
+        except asyncio.LimitOverrunError:
+            raise HttpError(413, "Слишком большие заголовки")
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, path, version = lines[0].split(" ")
+        except ValueError:
+            raise HttpError(400, "Некорректная строка запроса")
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length", "0"))
+        except ValueError:
+            raise HttpError(400, "Некорректный Content-Length")
+        if length > MAX_BODY:
+            raise HttpError(413, "Слишком большое тело запроса")
+        body = await reader.readexactly(length) if length else b""
+        keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+        return method, path.split("?", 1)[0], keep_alive, body
+
+    @staticmethod
+    def write_response(writer: asyncio.StreamWriter, status: int, payload, keep_alive: bool):
+        """Ответ целиком: dict - JSON, str - обычный текст (/metrics)"""
+        if isinstance(payload, str):
+            body, content_type = payload.encode("utf-8"), "text/plain; version=0.0.4"
+        else:
+            body, content_type = json.dumps(payload, ensure_ascii=False).encode("utf-8"), "application/json"
+        head = (
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+
+    @staticmethod
+    async def write_stream(writer: asyncio.StreamWriter, lines, keep_alive: bool):
+        """Ответ частями (chunked): по строке JSON на событие"""
+        writer.write((
+            "HTTP/1.1 200 OK\r\n"
+            "Content-Type: application/x-ndjson; charset=utf-8\r\n"
+            "Transfer-Encoding: chunked\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        ).encode("latin-1"))
+        async for line in lines:
+            data = json.dumps(line, ensure_ascii=False).encode("utf-8") + b"\n"
+            writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+            await writer.drain()
+        writer.write(b"0\r\n\r\n")
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    request = await self.read_request(reader)
+                    if request is None:
+                        break
+                    method, path, keep_alive, body = request
+                    status, payload = await self.route(method, path, body)
+                except HttpError as e:
+                    status, payload, keep_alive = e.status, {"error": str(e)}, False
+                if isinstance(payload, (dict, str)):
+                    self.write_response(writer, status, payload, keep_alive)
+                else:
+                    await self.write_stream(writer, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def expire_sessions(self):
+        while True:
+            await asyncio.sleep(60)
+            self.sessions.expire()
+
+    async def serve(self, sock: socket.socket):
+        server = await asyncio.start_server(self.handle, sock=sock, limit=MAX_BODY)
+        loop = asyncio.get_running_loop()
+        # Синхронный клиент OpenAI (EcomBot) работает в пуле потоков - по потоку на запрос к LLM
+        loop.set_default_executor(ThreadPoolExecutor(self.threads))
+        stop = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        cleanup = asyncio.create_task(self.expire_sessions())
+        async with server:
+            await stop.wait()
+        cleanup.cancel()
+
+
+def create_socket(host: str, port: int, reuse_port: bool = False) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        # Несколько слушающих сокетов на одном порту: ядро раскладывает соединения между ними поровну
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(1024)
+    sock.setblocking(False)
+    return sock
+
+
+def preload(kind: str):
+    """
+    Pre-fork: модули бота и данные только для чтения (стилевой гайд, FAQ с индексами,
+    заказы, few-shot примеры, цепочка) загружаются в родителе один раз до запуска процессов
+    """
+    started = time.perf_counter()
+    if kind == "lc":
+        import app_lc  # noqa: F401
+        from src.brand_chain import preload as preload_chain
+        preload_chain()
+    else:
+        # EcomBot читает FAQ и заказы в конструкторе, поэтому общими будут только модули
+        import app  # noqa: F401
+    freeze()
+    print(f"Данные загружены за {time.perf_counter() - started:.2f} с, "
+          f"память: {format_memory(memory_usage(os.getpid()))}", flush=True)
+
+
+def run_worker(args, sock: socket.socket, worker: int):
+    """Один процесс: свой бот, свой лог-файл и свои сессии; слушающий сокет создан в родителе"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    suffix = "_lc" if args.bot == "lc" else ""
+    bot = create_bot(args.bot, f"{LOGS_DIR}/session_{timestamp}_server_w{worker}{suffix}.jsonl")
+    if args.fake_llm:
+        install_fake_llm(args.bot, bot, args.fake_delay)
+    elif args.bot == "lc":
+        from src.brand_chain import warmup
+        warmup()
+    server = ChatServer(bot, timeout=args.timeout, session_ttl=args.session_ttl, threads=args.threads)
+    try:
+        asyncio.run(server.serve(sock))
+    finally:
+        # Дописываем в лог всё, что осталось в очереди
+        if args.bot == "lc":
+            bot.watcher.remove_listener(bot.log_reload)
+        else:
+            bot.watcher.stop()
+        bot.log_writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP-сервер чат-бота магазина")
+    parser.add_argument("--bot", choices=["lc", "openai"], default="lc",
+                        help="lc - EcomBrandBot (app_lc.py), openai - EcomBot (app.py)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Число процессов (по ядрам). История сессий хранится в каждом процессе отдельно: "
+                             "реплики одной сессии по разным соединениям могут попасть в разные процессы "
+                             "и не увидеть общую историю")
+    parser.add_argument("--timeout", type=float, default=30, help="Таймаут ответа на запрос, с")
+    parser.add_argument("--threads", type=int, default=64, help="Потоков для синхронных вызовов LLM в процессе")
+    parser.add_argument("--session-ttl", type=float, default=1800, help="Удалять сессии после простоя, с")
+    parser.add_argument("--fake-llm", action="store_true", help="Локальная заглушка вместо LLM")
+    parser.add_argument("--fake-delay", type=float, default=0.05, help="Задержка заглушки LLM, с")
+    parser.add_argument("--no-preload", action="store_true",
+                        help="Не загружать данные в родителе: каждый процесс загружает их сам")
+    parser.add_argument("--memory-interval", type=float, default=60,
+                        help="Как часто печатать память процессов, с (0 - не печатать)")
+    args = parser.parse_args()
+
+    os.makedirs(LOGS_DIR, exist_ok=True)
+    if args.workers <= 1:
+        sock = create_socket(args.host, args.port)
+        print(f"Сервер слушает http://{args.host}:{args.port} (бот: {args.bot}, процессов: 1)")
+        run_worker(args, sock, 0)
+        return
+
+    # У каждого процесса свой слушающий сокет с SO_REUSEPORT (где он есть), иначе общий на всех.
+    # Сокет упавшего процесса родитель сразу закрывает, чтобы ядро не отдавало ему соединения
+    # до перезапуска, и открывает заново перед запуском нового процесса.
+    reuse_port = hasattr(socket, "SO_REUSEPORT")
+    socks = {}
+
+    def open_socket(worker: int):
+        if worker not in socks:
+            socks[worker] = create_socket(args.host, args.port, reuse_port=True)
+
+    def close_socket(worker: int):
+        sock = socks.pop(worker, None)
+        if sock is not None:
+            sock.close()
+
+    def start_worker(worker: int):
+        # Копии сокетов других процессов, доставшиеся через fork, держали бы их открытыми
+        for other in [other for other in socks if other != worker]:
+            socks.pop(other).close()
+        run_worker(args, socks[worker], worker)
+
+    if reuse_port:
+        for worker in range(args.workers):
+            open_socket(worker)
+        supervisor = Supervisor(start_worker, args.workers, args.memory_interval,
+                                on_spawn=open_socket, on_exit=close_socket)
+    else:
+        shared = create_socket(args.host, args.port)
+        supervisor = Supervisor(lambda worker: run_worker(args, shared, worker), args.workers, args.memory_interval)
+    print(f"Сервер слушает http://{args.host}:{args.port} (бот: {args.bot}, процессов: {args.workers})")
+    print("Внимание: история сессий хранится в каждом процессе отдельно; для общей истории нужен "
+          "один процесс или балансировщик с привязкой по session_id", file=sys.stderr)
+    if not args.no_preload:
+        preload(args.bot)
+
+    supervisor.run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,32 +1,87 @@
 import os
 import json
+import time
 import yaml
+import hashlib
+import contextlib
 import pathlib
-from typing import List, Dict, Optional
-from dotenv import load_dotenv
+import functools
+import threading
+from typing import Any, Callable, Iterable, List, Dict, NamedTuple, Optional, Tuple
 from pydantic import BaseModel, Field
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
+
+try:
+    from .faq_index import FaqIndex
+    from .response_cache import ResponseCache, make_cache_key
+    from .order_store import (
+        MAX_BULK_ORDERS, OrderStore, extract_order_ids, format_order_status, format_order_statuses, open_order_store,
+    )
+    from .hot_reload import FileWatcher
+    from .memory import SUMMARY_PROMPT, summary_request
+    from .metrics import METRICS, span
+except ImportError:
+    from faq_index import FaqIndex
+    from response_cache import ResponseCache, make_cache_key
+    from order_store import (
+        MAX_BULK_ORDERS, OrderStore, extract_order_ids, format_order_status, format_order_statuses, open_order_store,
+    )
+    from hot_reload import FileWatcher
+    from memory import SUMMARY_PROMPT, summary_request
+    from metrics import METRICS, span
 
 # Базовая директория проекта
 BASE = pathlib.Path(__file__).parent.parent.resolve()
+# Модель цепочки (пишется и в логи сессий)
+MODEL = "gpt-4o-mini"
+
+# Все ресурсы модуля (данные, индексы, модель, цепочка) создаются лениво при первом
+# обращении и запоминаются. Повторная инициализация защищена общей блокировкой.
+# При горячей перезагрузке новое значение собирается целиком и подменяется через set().
+_INIT_LOCK = threading.RLock()
 
-# Проверка существования файла .env
-env_path = BASE / ".env"
-if env_path.exists():
-    # Загрузка переменных окружения
-    load_dotenv(env_path, override=True)
-    print(f"✅ Переменные окружения загружены из: {env_path}")
-else:
+def lazy(fn):
+    """Потокобезопасная ленивая инициализация: fn вызывается один раз, результат запоминается"""
+    result = []
+    
+    @functools.wraps(fn)
+    def wrapper():
+        if not result:
+            with _INIT_LOCK:
+                if not result:
+                    result.append(fn())
+        return result[0]
+    
+    def set_value(value):
+        with _INIT_LOCK:
+            if result:
+                result[0] = value
+            else:
+                result.append(value)
+    
+    wrapper.reset = result.clear
+    wrapper.set = set_value
+    wrapper.loaded = lambda: bool(result)
+    return wrapper
+
+# Загрузка переменных окружения из .env
+@lazy
+def load_env():
+    from dotenv import load_dotenv
+    
+    env_path = BASE / ".env"
+    if env_path.exists():
+        load_dotenv(env_path, override=True)
+        print(f"✅ Переменные окружения загружены из: {env_path}")
+        return env_path
     print(f"❌ Файл .env не найден по пути: {env_path}")
     raise FileNotFoundError(f"Файл .env не найден по пути: {env_path}")
 
 # Загрузка стилевого гайда
-def load_style_guide():
+def read_style_guide():
     with open(BASE / "data" / "style_guide.yaml", "r", encoding="utf-8") as f:
         return yaml.safe_load(f)
 
-STYLE = load_style_guide()
+load_style_guide = lazy(read_style_guide)
 
 # Модель для структурированного ответа
 class BrandResponse(BaseModel):
@@ -34,22 +89,51 @@ class BrandResponse(BaseModel):
     tone: str = Field(description="Контроль: совпадает ли тон (да/нет) + одна фраза почему")
     actions: List[str] = Field(description="Список следующих шагов для клиента (0–3 пункта)")
 
+# FAQ, индекс точных совпадений и индекс похожих вопросов собираются вместе
+# из одной версии faq.json и подменяются при перезагрузке одним присваиванием
+class FaqState(NamedTuple):
+    data: List[Dict[str, str]]
+    index: FaqIndex
+    retriever: Any
+
+def read_faq_state() -> FaqState:
+    try:
+        from .faq_retrieval import FaqRetriever
+    except ImportError:
+        from faq_retrieval import FaqRetriever
+    
+    raw = (BASE / "data" / "faq.json").read_bytes()
+    data = json.loads(raw)
+    # Индекс похожих вопросов берётся с диска, если собран для этой же версии FAQ
+    # (собирается офлайн: python src/faq_retrieval.py build)
+    retriever = FaqRetriever.for_questions(
+        [item["q"] for item in data], hashlib.sha256(raw).hexdigest(), BASE / "data" / "faq_retrieval"
+    )
+    return FaqState(data, FaqIndex(data), retriever)
+
+get_faq_state = lazy(read_faq_state)
+
 # Загрузка FAQ
 def load_faq():
-    with open(BASE / "data" / "faq.json", "r", encoding="utf-8") as f:
-        return json.load(f)
+    return get_faq_state().data
+
+def get_faq_index() -> FaqIndex:
+    return get_faq_state().index
 
-FAQ_DATA = load_faq()
+def get_faq_retriever():
+    return get_faq_state().retriever
 
-# Загрузка заказов
-def load_orders():
-    with open(BASE / "data" / "orders.json", "r", encoding="utf-8") as f:
-        return json.load(f)
+FAQ_TOP_K = 3
+FAQ_MIN_SCORE = 0.3
 
-ORDERS_DATA = load_orders()
+# Хранилище заказов: SQLite, если задан ORDERS_DB, иначе data/orders.json в памяти
+@lazy
+def get_order_store() -> OrderStore:
+    load_env()
+    return open_order_store(BASE / "data" / "orders.json")
 
 # Загрузка few-shot примеров
-def load_few_shots():
+def read_few_shots():
     few_shots = []
     with open(BASE / "data" / "few_shots.jsonl", "r", encoding="utf-8") as f:
         for line in f:
@@ -57,18 +141,19 @@ def load_few_shots():
                 few_shots.append(json.loads(line.strip()))
     return few_shots
 
-FEW_SHOTS = load_few_shots()
+load_few_shots = lazy(read_few_shots)
 
 # Создание системного промпта из стилевого гайда
-def create_system_prompt():
-    system_prompt = f"""Вы - {STYLE['tone']['persona']} ассистент интернет-магазина {STYLE['brand']}.
+def create_system_prompt(style: Optional[dict] = None):
+    style = style or load_style_guide()
+    system_prompt = f"""Вы - {style['tone']['persona']} ассистент интернет-магазина {style['brand']}.
     
 Правила ответа:
-1. Максимум {STYLE['tone']['sentences_max']} предложения в ответе
-2. Используйте пункты, если это уместно: {STYLE['tone']['bullets']}
-3. Избегайте: {', '.join(STYLE['tone']['avoid'])}
-4. Обязательно включайте: {', '.join(STYLE['tone']['must_include'])}
-5. Если нет точной информации, используйте: "{STYLE['fallback']['no_data']}"
+1. Максимум {style['tone']['sentences_max']} предложения в ответе
+2. Используйте пункты, если это уместно: {style['tone']['bullets']}
+3. Избегайте: {', '.join(style['tone']['avoid'])}
+4. Обязательно включайте: {', '.join(style['tone']['must_include'])}
+5. Если нет точной информации, используйте: "{style['fallback']['no_data']}"
 
 Формат ответа:
 Верните JSON объект с тремя полями:
@@ -78,86 +163,408 @@ def create_system_prompt():
     
     return system_prompt
 
-# Создание шаблона промпта
-def create_prompt_template():
-    system_prompt = create_system_prompt()
-    
-    # Добавляем few-shot примеры (только первые 2 для сокращения длины)
+# Постоянная часть промпта: системные правила и few-shot примеры (только первые 2 для сокращения длины)
+def create_prompt_prefix(style: Optional[dict] = None, few_shots: Optional[List[dict]] = None) -> str:
     few_shot_text = "\n\nПримеры:\n"
-    for i, shot in enumerate(FEW_SHOTS[:2]):
+    for shot in (few_shots or load_few_shots())[:2]:
         few_shot_text += f"Пользователь: {shot['user']}\nАссистент: {shot['assistant']}\n\n"
+    return create_system_prompt(style) + few_shot_text
+
+HUMAN_TEMPLATE = "Текущий диалог:\n{history}\n\nКонтекст FAQ:\n{faq_context}\n\nКонтекст заказов:\n{order_context}\n\nПользователь: {input}\nАссистент:"
+
+# Создание шаблона промпта. Провайдер кэширует самый длинный общий префикс запросов, поэтому
+# всё постоянное (правила, примеры) идёт первым и байт в байт совпадает между запросами,
+# дальше история (между ходами она только дописывается), а контексты FAQ и заказов и вопрос - в конце.
+def create_prompt_template(style: Optional[dict] = None, few_shots: Optional[List[dict]] = None):
+    from langchain_core.prompts import ChatPromptTemplate
+    
+    # Фигурные скобки в примерах не должны восприниматься как переменные шаблона
+    prefix = create_prompt_prefix(style, few_shots).replace("{", "{{").replace("}", "}}")
     
-    # Создаем шаблон
     return ChatPromptTemplate.from_messages([
-        ("system", system_prompt),
-        ("human", few_shot_text + "\nКонтекст FAQ:\n{faq_context}\n\nКонтекст заказов:\n{order_context}\n\nТекущий диалог:\n{history}\n\nПользователь: {input}\nАссистент:")
+        ("system", prefix),
+        ("human", HUMAN_TEMPLATE)
     ])
 
 # Поиск ответа в FAQ
 def get_faq_answer(question: str) -> Optional[str]:
-    for item in FAQ_DATA:
-        if item["q"].lower() in question.lower() or question.lower() in item["q"].lower():
-            return item["a"]
-    return None
+    return get_faq_index().get_answer(question)
 
 # Получение статуса заказа
 def get_order_status(order_id: str) -> Optional[str]:
-    if order_id in ORDERS_DATA:
-        order = ORDERS_DATA[order_id]
-        if order["status"] == "in_transit":
-            return f"Заказ {order_id} находится в пути. Ожидаемая доставка через {order['eta_days']} дня(ей). Перевозчик: {order['carrier']}."
-        elif order["status"] == "delivered":
-            return f"Заказ {order_id} был доставлен {order['delivered_at']}."
-        elif order["status"] == "processing":
-            return f"Заказ {order_id} находится в обработке. {order['note']}."
-    return None
+    return format_order_status(order_id, get_order_store().get(order_id))
+
+# Статусы многих заказов одним обращением к хранилищу
+def get_order_statuses(order_ids: Iterable[str]) -> str:
+    order_ids = list(dict.fromkeys(order_ids))
+    orders = get_order_store().get_many(order_ids[:MAX_BULK_ORDERS])
+    return format_order_statuses(order_ids, orders)
 
 # Создание контекста FAQ
-def create_faq_context(question: str) -> str:
-    faq_answer = get_faq_answer(question)
+def format_faq_context(question: str, hits: List[Tuple[int, float]], faq: FaqState) -> str:
+    faq_answer = faq.index.get_answer(question)
     if faq_answer:
         return f"Ответ на похожий вопрос: {faq_answer}"
+    if hits:
+        lines = [f"- {faq.data[i]['q']} {faq.data[i]['a']}" for i, _ in hits]
+        return "Похожие вопросы из FAQ:\n" + "\n".join(lines)
     return "Нет подходящего ответа в FAQ"
 
+def create_faq_context(question: str) -> str:
+    faq = get_faq_state()
+    return format_faq_context(question, faq.retriever.search(question, FAQ_TOP_K, FAQ_MIN_SCORE), faq)
+
+# Пакетное создание контекстов FAQ (для прогонов оценки)
+def create_faq_contexts(questions: List[str]) -> List[str]:
+    faq = get_faq_state()
+    hits = faq.retriever.search_batch(questions, FAQ_TOP_K, FAQ_MIN_SCORE)
+    return [format_faq_context(q, h, faq) for q, h in zip(questions, hits)]
+
 # Создание контекста заказов
 def create_order_context(user_input: str) -> str:
-    # Проверяем, есть ли номер заказа в запросе
-    words = user_input.split()
-    for word in words:
-        if word.isdigit() and word in ORDERS_DATA:
-            return get_order_status(word)
+    # Номера заказов из запроса ("№12345,", "12345—" и т.п.) проверяются одним обращением к хранилищу
+    order_ids = extract_order_ids(user_input)[:MAX_BULK_ORDERS]
+    if not order_ids:
+        return ""
+    orders = get_order_store().get_many(order_ids)
     
-    # Если номер заказа не найден, возвращаем пустую строку
-    return ""
+    # Если ни один номер не найден, возвращаем пустую строку; заказы с неизвестным статусом пропускаются
+    statuses = (format_order_status(order_id, orders[order_id]) for order_id in order_ids if order_id in orders)
+    return "\n".join(status for status in statuses if status)
 
 # Инициализация модели
-llm = ChatOpenAI(
-    openai_api_key=os.getenv("OPENAI_API_KEY"),
-    model="gpt-4o-mini",
-    temperature=0.7,
-    max_tokens=2000
-)
+@lazy
+def get_llm():
+    from langchain_openai import ChatOpenAI
+    
+    load_env()
+    return ChatOpenAI(
+        openai_api_key=os.getenv("OPENAI_API_KEY"),
+        model=MODEL,
+        temperature=0.7,
+        max_tokens=2000,
+        # Расход токенов приходит и при потоковой генерации
+        stream_usage=True
+    )
+
+# Свёртка вытесненных из истории реплик в резюме (для ConversationMemory)
+def summarize_history(summary: str, turns: list) -> str:
+    response = get_llm().invoke([("system", SUMMARY_PROMPT), ("human", summary_request(summary, turns))])
+    return response.content
+
+# Учёт токенов вызовов LLM внутри блока with: словарь заполняется при выходе из блока.
+# cached_tokens - часть prompt_tokens, взятая провайдером из кэша префикса промпта.
+@lazy
+def get_usage_var():
+    # Хук регистрируется один раз: get_usage_metadata_callback добавлял бы новый на каждый запрос
+    from contextvars import ContextVar
+    from langchain_core.tracers.context import register_configure_hook
+    
+    var = ContextVar("brand_chain_usage", default=None)
+    register_configure_hook(var, inheritable=True)
+    return var
+
+@contextlib.contextmanager
+def track_usage():
+    from langchain_core.callbacks import UsageMetadataCallbackHandler
+    
+    usage = {}
+    callback = UsageMetadataCallbackHandler()
+    token = get_usage_var().set(callback)
+    try:
+        yield usage
+    finally:
+        get_usage_var().reset(token)
+    for meta in callback.usage_metadata.values():
+        usage["prompt_tokens"] = usage.get("prompt_tokens", 0) + meta.get("input_tokens", 0)
+        usage["completion_tokens"] = usage.get("completion_tokens", 0) + meta.get("output_tokens", 0)
+        usage["total_tokens"] = usage.get("total_tokens", 0) + meta.get("total_tokens", 0)
+        cached = (meta.get("input_token_details") or {}).get("cache_read", 0)
+        usage["cached_tokens"] = usage.get("cached_tokens", 0) + cached
+
+# Время этапов вызова цепочки для метрик: подготовка промпта (до запроса к модели),
+# ответ модели и разбор структурированного ответа (после ответа модели)
+@lazy
+def get_stage_var():
+    from contextvars import ContextVar
+    from langchain_core.callbacks import BaseCallbackHandler
+    from langchain_core.tracers.context import register_configure_hook
+    
+    class StageHandler(BaseCallbackHandler):
+        run_inline = True
+        
+        def __init__(self):
+            self.llm_started = self.llm_ended = None
+        
+        def on_chat_model_start(self, serialized, messages, **kwargs):
+            if self.llm_started is None:
+                self.llm_started = time.perf_counter()
+        
+        def on_llm_end(self, response, **kwargs):
+            self.llm_ended = time.perf_counter()
+    
+    var = ContextVar("brand_chain_stages", default=None)
+    register_configure_hook(var, inheritable=True)
+    return var, StageHandler
+
+@contextlib.contextmanager
+def track_stages():
+    """Замер вызова цепочки по этапам prompt, llm и parse (chain - если модель не вызывалась)"""
+    if not METRICS.enabled:
+        yield
+        return
+    var, handler_class = get_stage_var()
+    handler = handler_class()
+    token = var.set(handler)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        var.reset(token)
+    ended = time.perf_counter()
+    if handler.llm_started is None or handler.llm_ended is None:
+        METRICS.observe("chain", ended - started)
+        return
+    METRICS.observe("prompt", handler.llm_started - started)
+    METRICS.observe("llm", handler.llm_ended - handler.llm_started)
+    METRICS.observe("parse", ended - handler.llm_ended)
 
 # Создание цепочки
-def create_chain():
-    prompt = create_prompt_template()
-    return prompt | llm.with_structured_output(BrandResponse)
+def create_chain(style: Optional[dict] = None, few_shots: Optional[List[dict]] = None):
+    prompt = create_prompt_template(style, few_shots)
+    return prompt | get_llm().with_structured_output(BrandResponse)
 
-chain = create_chain()
+# Потоковая цепочка: тот же промпт, но ответ разбирается как JSON по мере поступления токенов,
+# поэтому поле answer приходит частями, пока tone и actions ещё генерируются
+def create_stream_chain(style: Optional[dict] = None, few_shots: Optional[List[dict]] = None):
+    prompt = create_prompt_template(style, few_shots)
+    schema = BrandResponse.model_json_schema()
+    return prompt | get_llm().with_structured_output(schema, method="json_schema")
 
-# Основная функция для получения ответа
-def ask(user_input: str, history: str = "") -> BrandResponse:
+# Версия промпта: хэш постоянной части и шаблона запроса (участвует в ключе кэша)
+def create_prompt_version(style: Optional[dict] = None, few_shots: Optional[List[dict]] = None) -> str:
+    raw = json.dumps([create_prompt_prefix(style, few_shots), HUMAN_TEMPLATE], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:12]
+
+# Цепочка и версия промпта всегда собраны из одних и тех же стилевого гайда и примеров
+class ChainState(NamedTuple):
+    chain: Any
+    prompt_version: str
+    stream_chain: Any = None
+
+def build_chain_state(style: Optional[dict] = None, few_shots: Optional[List[dict]] = None) -> ChainState:
+    return ChainState(
+        create_chain(style, few_shots),
+        create_prompt_version(style, few_shots),
+        create_stream_chain(style, few_shots)
+    )
+
+get_chain_state = lazy(build_chain_state)
+
+def get_chain():
+    return get_chain_state().chain
+
+def get_prompt_version() -> str:
+    return get_chain_state().prompt_version
+
+# Кэш ответов (размер, TTL и путь к файлу задаются через RESPONSE_CACHE_*)
+@lazy
+def get_response_cache() -> ResponseCache:
+    load_env()
+    return ResponseCache.from_env()
+
+# Прогрев для серверов: загрузить все ресурсы заранее, а не на первом запросе
+def warmup():
+    for init in (load_env, load_style_guide, get_faq_state, get_order_store, load_few_shots,
+                 get_llm, get_chain_state, get_response_cache):
+        init()
+
+# Загрузка в родительском процессе до fork (pre-fork сервер): всё из warmup(), кроме кэша ответов,
+# чьё соединение SQLite не переживает fork, и наблюдателя за файлами, чей поток в fork не копируется
+def preload():
+    for init in (load_env, load_style_guide, get_faq_state, get_order_store, load_few_shots,
+                 get_llm, get_chain_state):
+        init()
+
+# Горячая перезагрузка: новое состояние собирается в потоке наблюдателя и подменяется целиком,
+# запросы в работе продолжают пользоваться прежним снимком. Не загруженные ещё ресурсы
+# не трогаем - они прочитают свежий файл при первом обращении.
+def reload_faq():
+    if get_faq_state.loaded():
+        get_faq_state.set(read_faq_state())
+
+def reload_orders():
+    if not get_order_store.loaded():
+        return
+    old = get_order_store()
+    # База SQLite читается напрямую, orders.json её не меняет
+    if not old.uses_json_file:
+        return
+    get_order_store.set(open_order_store(BASE / "data" / "orders.json"))
+    old.close()
+
+def reload_chain():
+    style, few_shots = read_style_guide(), read_few_shots()
+    state = build_chain_state(style, few_shots) if get_chain_state.loaded() else None
+    with _INIT_LOCK:
+        load_style_guide.set(style)
+        load_few_shots.set(few_shots)
+        if state is not None:
+            get_chain_state.set(state)
+
+# Наблюдатель за файлами данных (интервал опроса HOT_RELOAD_INTERVAL секунд, 0 - выключено)
+@lazy
+def get_watcher() -> FileWatcher:
+    watcher = FileWatcher(float(os.getenv("HOT_RELOAD_INTERVAL", "2")))
+    watcher.watch(BASE / "data" / "faq.json", reload_faq)
+    watcher.watch(BASE / "data" / "orders.json", reload_orders)
+    watcher.watch(BASE / "data" / "style_guide.yaml", reload_chain)
+    watcher.watch(BASE / "data" / "few_shots.jsonl", reload_chain)
+    return watcher.start()
+
+# Совместимость со старыми именами модуля: STYLE, FAQ_DATA, chain и т.д. создаются при первом обращении
+_LAZY_ATTRS = {
+    "STYLE": load_style_guide,
+    "FAQ_DATA": load_faq,
+    "FAQ_INDEX": get_faq_index,
+    "FAQ_RETRIEVER": get_faq_retriever,
+    "ORDERS_DATA": get_order_store,
+    "FEW_SHOTS": load_few_shots,
+    "llm": get_llm,
+    "chain": get_chain,
+    "PROMPT_VERSION": get_prompt_version,
+    "RESPONSE_CACHE": get_response_cache,
+}
+
+def __getattr__(name):
+    if name in _LAZY_ATTRS:
+        return _LAZY_ATTRS[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Подготовка входа цепочки и ключа кэша
+def prepare_inputs(user_input: str, history: str, faq_context: Optional[str], state: ChainState):
     # Создаем контексты
-    faq_context = create_faq_context(user_input)
-    order_context = create_order_context(user_input)
+    if faq_context is None:
+        with span("faq"):
+            faq_context = create_faq_context(user_input)
+    with span("orders"):
+        order_context = create_order_context(user_input)
     
-    # Вызываем цепочку
-    response = chain.invoke({
+    inputs = {
         "faq_context": faq_context,
         "order_context": order_context,
         "history": history,
         "input": user_input
-    })
+    }
+    cache_key = make_cache_key(
+        user_input,
+        history=history,
+        faq_context=faq_context,
+        order_context=order_context,
+        model=get_llm().model_name,
+        temperature=get_llm().temperature,
+        prompt_version=state.prompt_version
+    )
+    return inputs, cache_key
+
+# Основная функция для получения ответа
+def ask(user_input: str, history: str = "", faq_context: Optional[str] = None) -> BrandResponse:
+    state = get_chain_state()
+    inputs, cache_key = prepare_inputs(user_input, history, faq_context, state)
+    
+    # Проверяем кэш ответов
+    with span("cache"):
+        cached = get_response_cache().get(cache_key)
+    if cached is not None:
+        return BrandResponse(**cached)
+    
+    # Вызываем цепочку
+    started = time.perf_counter()
+    with track_stages():
+        response = state.chain.invoke(inputs)
+    get_response_cache().set(cache_key, response.model_dump(), time.perf_counter() - started)
+    
+    return response
+
+# Асинхронный вариант ask() поверх chain.ainvoke
+async def aask(user_input: str, history: str = "", faq_context: Optional[str] = None) -> BrandResponse:
+    state = get_chain_state()
+    inputs, cache_key = prepare_inputs(user_input, history, faq_context, state)
+    
+    with span("cache"):
+        cached = get_response_cache().get(cache_key)
+    if cached is not None:
+        return BrandResponse(**cached)
+    
+    started = time.perf_counter()
+    with track_stages():
+        response = await state.chain.ainvoke(inputs)
+    get_response_cache().set(cache_key, response.model_dump(), time.perf_counter() - started)
+    
+    return response
+
+# Потоковый ответ: on_delta получает новые фрагменты поля answer, возвращается полный BrandResponse.
+# Ответ из кэша и цепочка без потоковой версии отдаются одним фрагментом.
+def answer_deltas(on_delta: Callable[[str], None]) -> Callable[[dict], None]:
+    sent = [0]
+    
+    def feed(partial: dict):
+        answer = partial.get("answer") if isinstance(partial, dict) else None
+        if isinstance(answer, str) and len(answer) > sent[0]:
+            on_delta(answer[sent[0]:])
+            sent[0] = len(answer)
+    
+    return feed
+
+def stream_ask(user_input: str, history: str = "", faq_context: Optional[str] = None,
+               on_delta: Callable[[str], None] = lambda text: None) -> BrandResponse:
+    state = get_chain_state()
+    inputs, cache_key = prepare_inputs(user_input, history, faq_context, state)
+    
+    with span("cache"):
+        cached = get_response_cache().get(cache_key)
+    if cached is not None:
+        response = BrandResponse(**cached)
+        on_delta(response.answer)
+        return response
+    
+    started = time.perf_counter()
+    with track_stages():
+        if state.stream_chain is None:
+            response = state.chain.invoke(inputs)
+            on_delta(response.answer)
+        else:
+            feed, partial = answer_deltas(on_delta), {}
+            for partial in state.stream_chain.stream(inputs):
+                feed(partial)
+            response = BrandResponse(**partial)
+    get_response_cache().set(cache_key, response.model_dump(), time.perf_counter() - started)
+    
+    return response
+
+async def astream_ask(user_input: str, history: str = "", faq_context: Optional[str] = None,
+                      on_delta: Callable[[str], None] = lambda text: None) -> BrandResponse:
+    state = get_chain_state()
+    inputs, cache_key = prepare_inputs(user_input, history, faq_context, state)
+    
+    with span("cache"):
+        cached = get_response_cache().get(cache_key)
+    if cached is not None:
+        response = BrandResponse(**cached)
+        on_delta(response.answer)
+        return response
+    
+    started = time.perf_counter()
+    with track_stages():
+        if state.stream_chain is None:
+            response = await state.chain.ainvoke(inputs)
+            on_delta(response.answer)
+        else:
+            feed, partial = answer_deltas(on_delta), {}
+            async for partial in state.stream_chain.astream(inputs):
+                feed(partial)
+            response = BrandResponse(**partial)
+    get_response_cache().set(cache_key, response.model_dump(), time.perf_counter() - started)
     
     return response
 
@@ -183,4 +590,4 @@ if __name__ == "__main__":
             print(f"Действия: {response.actions}")
         except Exception as e:
             print(f"Ошибка: {e}")
-        print("-" * 30)
\ No newline at end of file
+        print("-" * 30)
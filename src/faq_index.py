@@ -0,0 +1,109 @@
+import re
+import json
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+
+# Все варианты тире и дефиса приводятся к обычному дефису
+DASHES = str.maketrans({c: "-" for c in "‐‑‒–—―−"})
+PUNCT_RE = re.compile(r"[^\w\s-]+")
+LONE_DASH_RE = re.compile(r"(?<!\w)-+|-+(?!\w)")
+SPACES_RE = re.compile(r"\s+")
+
+# Длина символьных n-грамм в инвертированном индексе
+NGRAM = 3
+
+
+def normalize_text(text: str) -> str:
+    """Нормализация русского текста: регистр, ё/е, пунктуация, варианты тире"""
+    text = text.lower().replace("ё", "е").translate(DASHES)
+    text = PUNCT_RE.sub(" ", text)
+    text = LONE_DASH_RE.sub(" ", text)
+    return SPACES_RE.sub(" ", text).strip()
+
+
+def ngrams(text: str) -> Set[str]:
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+class FaqIndex:
+    """
+    Предрассчитанный индекс FAQ с теми же правилами совпадения, что и линейный поиск:
+    вопрос из FAQ содержится в сообщении или сообщение содержится в вопросе из FAQ.
+    При нескольких совпадениях возвращается первая по порядку запись.
+    """
+
+    def __init__(self, items: Iterable[Dict[str, str]]):
+        self.items: List[Dict[str, str]] = list(items)
+        self.questions: List[str] = [normalize_text(item["q"]) for item in self.items]
+
+        # n-грамма -> номера вопросов, в которых она встречается
+        self.postings: Dict[str, List[int]] = defaultdict(list)
+        question_grams = [ngrams(q) for q in self.questions]
+        for i, grams in enumerate(question_grams):
+            for gram in grams:
+                self.postings[gram].append(i)
+
+        # Каждый вопрос регистрируется под своей самой редкой n-граммой:
+        # если вопрос целиком входит в сообщение, эта n-грамма там тоже есть
+        self.keys: Dict[str, List[int]] = defaultdict(list)
+        self.short: List[int] = []
+        # Подстрока короче n-граммы -> первый вопрос, в котором она встречается
+        self.fragments: Dict[str, int] = {}
+        for i, q in enumerate(self.questions):
+            for fragment in {q[j:j + size] for size in range(1, NGRAM) for j in range(len(q) - size + 1)}:
+                self.fragments.setdefault(fragment, i)
+            grams = question_grams[i]
+            if grams:
+                key = min(grams, key=lambda g: (len(self.postings[g]), g))
+                self.keys[key].append(i)
+            elif q:
+                self.short.append(i)
+
+    @classmethod
+    def from_file(cls, path) -> "FaqIndex":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def _questions_in_message(self, message: str, grams: Set[str]) -> Iterable[int]:
+        for gram in grams:
+            for i in self.keys.get(gram, ()):
+                if self.questions[i] in message:
+                    yield i
+        for i in self.short:
+            if self.questions[i] in message:
+                yield i
+
+    def _message_in_questions(self, message: str, grams: Set[str]) -> Optional[int]:
+        if not grams:
+            return self.fragments.get(message)
+        lists = []
+        for gram in grams:
+            posting = self.postings.get(gram)
+            if not posting:
+                return None
+            lists.append(posting)
+        # Списки упорядочены по номеру записи, поэтому первая проверенная запись
+        # самого короткого списка и есть первое совпадение
+        for i in min(lists, key=len):
+            if message in self.questions[i]:
+                return i
+        return None
+
+    def lookup(self, question: str) -> Optional[Dict[str, str]]:
+        """Поиск записи FAQ по сообщению пользователя"""
+        message = normalize_text(question)
+        if not message:
+            return None
+        grams = ngrams(message)
+        best = min(self._questions_in_message(message, grams), default=None)
+        other = self._message_in_questions(message, grams)
+        if best is None or (other is not None and other < best):
+            best = other
+        return None if best is None else self.items[best]
+
+    def get_answer(self, question: str) -> Optional[str]:
+        item = self.lookup(question)
+        return item["a"] if item else None
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+TF-IDF индекс по символьным n-граммам для поиска похожих вопросов в FAQ.
+
+Матрица хранится в разреженном формате CSC (массивы NumPy) и сохраняется на диск,
+при загрузке массивы отображаются в память (mmap), поэтому старт быстрый.
+
+Сборка индекса офлайн:
+    python src/faq_retrieval.py build
+Проверка запросов:
+    python src/faq_retrieval.py query "Можно ускорить доставку?" "Где мой чек?"
+"""
+
+import os
+import sys
+import json
+import hashlib
+import pathlib
+from collections import Counter
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+try:
+    from .faq_index import normalize_text
+except ImportError:
+    from faq_index import normalize_text
+
+BASE = pathlib.Path(__file__).parent.parent.resolve()
+FAQ_PATH = BASE / "data" / "faq.json"
+INDEX_DIR = BASE / "data" / "faq_retrieval"
+
+# Диапазон длин символьных n-грамм
+NGRAM_RANGE = (3, 5)
+# Предел размера матрицы близостей (пачка запросов x вопросы FAQ) на один шаг
+BATCH_BUDGET = 1 << 24
+ARRAYS = ("data", "rows", "indptr", "vocab", "idf")
+
+
+def char_ngrams(text: str) -> List[str]:
+    text = f" {normalize_text(text)} "
+    lo, hi = NGRAM_RANGE
+    return [text[i:i + n] for n in range(lo, hi + 1) for i in range(len(text) - n + 1)]
+
+
+def file_digest(path) -> str:
+    return hashlib.sha256(pathlib.Path(path).read_bytes()).hexdigest()
+
+
+class FaqRetriever:
+    """Top-k поиск по косинусной близости TF-IDF векторов вопросов FAQ"""
+
+    def __init__(self, arrays: Dict[str, np.ndarray], meta: Dict):
+        # Матрица вопросов хранится по столбцам (CSC): для каждой n-граммы из словаря
+        # indptr задаёт отрезок в rows/data с номерами вопросов и весами
+        self.data = arrays["data"]
+        self.rows = arrays["rows"]
+        self.indptr = arrays["indptr"]
+        self.vocab = arrays["vocab"]
+        self.idf = arrays["idf"]
+        self.meta = meta
+        self.n_rows = meta["n_rows"]
+
+    @classmethod
+    def build(cls, questions: Sequence[str], source_digest: str = "") -> "FaqRetriever":
+        docs = [Counter(char_ngrams(q)) for q in questions]
+        vocab = np.array(sorted({g for doc in docs for g in doc}), dtype=str)
+        df = Counter(g for doc in docs for g in doc)
+        n = len(docs)
+        idf = np.log((1 + n) / (1 + np.array([df[g] for g in vocab], dtype=np.float64))) + 1
+
+        data, cols, rows = [], [], []
+        for row, doc in enumerate(docs):
+            if not doc:
+                continue
+            grams = list(doc)
+            doc_cols = np.searchsorted(vocab, grams)
+            weights = (1 + np.log(np.array([doc[g] for g in grams], dtype=np.float64))) * idf[doc_cols]
+            data.append(weights / np.linalg.norm(weights))
+            cols.append(doc_cols)
+            rows.append(np.full(len(doc_cols), row))
+
+        if data:
+            data, cols, rows = np.concatenate(data), np.concatenate(cols), np.concatenate(rows)
+        else:
+            data, cols, rows = np.zeros(0), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        order = np.argsort(cols, kind="stable")
+        indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cols, minlength=len(vocab)), out=indptr[1:])
+
+        arrays = {
+            "data": data[order].astype(np.float32),
+            "rows": rows[order].astype(np.int32),
+            "indptr": indptr,
+            "vocab": vocab,
+            "idf": idf.astype(np.float32),
+        }
+        meta = {"n_rows": n, "ngram_range": list(NGRAM_RANGE), "source_sha256": source_digest}
+        return cls(arrays, meta)
+
+    @classmethod
+    def build_from_faq(cls, faq_path=FAQ_PATH) -> "FaqRetriever":
+        with open(faq_path, "r", encoding="utf-8") as f:
+            faq = json.load(f)
+        return cls.build([item["q"] for item in faq], file_digest(faq_path))
+
+    def save(self, index_dir=INDEX_DIR):
+        index_dir = pathlib.Path(index_dir)
+        index_dir.mkdir(parents=True, exist_ok=True)
+        # Файлы подменяются через os.replace: уже открытые через mmap копии остаются целыми
+        for name in ARRAYS:
+            tmp_path = index_dir / f"{name}.npy.tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, getattr(self, name))
+            os.replace(tmp_path, index_dir / f"{name}.npy")
+        tmp_path = index_dir / "meta.json.tmp"
+        tmp_path.write_text(json.dumps(self.meta, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp_path, index_dir / "meta.json")
+
+    @classmethod
+    def load(cls, index_dir=INDEX_DIR) -> "FaqRetriever":
+        index_dir = pathlib.Path(index_dir)
+        meta = json.loads((index_dir / "meta.json").read_text(encoding="utf-8"))
+        arrays = {name: np.load(index_dir / f"{name}.npy", mmap_mode="r") for name in ARRAYS}
+        return cls(arrays, meta)
+
+    @classmethod
+    def for_questions(cls, questions: Sequence[str], digest: str, index_dir=INDEX_DIR) -> "FaqRetriever":
+        """Индекс с диска, если он собран для этой же версии FAQ, иначе сборка и сохранение"""
+        try:
+            retriever = cls.load(index_dir)
+            meta = retriever.meta
+            if meta.get("source_sha256") == digest and meta.get("ngram_range") == list(NGRAM_RANGE):
+                return retriever
+        except (OSError, ValueError, KeyError):
+            pass
+        retriever = cls.build(questions, digest)
+        try:
+            retriever.save(index_dir)
+        except OSError:
+            pass
+        return retriever
+
+    @classmethod
+    def load_or_build(cls, faq_path=FAQ_PATH, index_dir=INDEX_DIR) -> "FaqRetriever":
+        """Загрузка индекса с диска; если он устарел или отсутствует - пересборка и сохранение"""
+        raw = pathlib.Path(faq_path).read_bytes()
+        questions = [item["q"] for item in json.loads(raw)]
+        return cls.for_questions(questions, hashlib.sha256(raw).hexdigest(), index_dir)
+
+    def _query_terms(self, questions: Sequence[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Разреженные векторы запросов: номер запроса, столбец словаря, вес"""
+        qids, cols, weights = [], [], []
+        if not len(self.vocab):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        for qi, question in enumerate(questions):
+            doc = Counter(char_ngrams(question))
+            if not doc:
+                continue
+            grams = np.array(list(doc), dtype=str)
+            found = np.minimum(np.searchsorted(self.vocab, grams), len(self.vocab) - 1)
+            known = self.vocab[found] == grams
+            if not known.any():
+                continue
+            found = found[known]
+            tf = np.array([doc[g] for g in grams[known]], dtype=np.float32)
+            w = (1 + np.log(tf)) * self.idf[found]
+            qids.append(np.full(len(found), qi))
+            cols.append(found)
+            weights.append(w / np.linalg.norm(w))
+        if not qids:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        return np.concatenate(qids), np.concatenate(cols), np.concatenate(weights)
+
+    def scores(self, questions: Sequence[str]) -> np.ndarray:
+        """Косинусная близость запросов ко всем вопросам FAQ (B x N)"""
+        out = np.zeros((len(questions), self.n_rows), dtype=np.float32)
+        chunk = max(1, BATCH_BUDGET // max(self.n_rows, 1))
+        for start in range(0, len(questions), chunk):
+            batch = questions[start:start + chunk]
+            qids, cols, weights = self._query_terms(batch)
+            if not len(cols):
+                continue
+            # Произведение матрицы вопросов на пачку разреженных запросов за одну операцию:
+            # разворачиваем столбцы всех n-грамм запросов и суммируем вклады через bincount
+            begins = self.indptr[cols]
+            counts = self.indptr[cols + 1] - begins
+            term = np.repeat(np.arange(len(cols)), counts)
+            pos = begins[term] + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            flat = qids[term] * self.n_rows + self.rows[pos]
+            contrib = weights[term] * self.data[pos]
+            out[start:start + len(batch)] = np.bincount(
+                flat, weights=contrib, minlength=len(batch) * self.n_rows
+            ).reshape(len(batch), self.n_rows)
+        return out
+
+    def search_batch(self, questions: Sequence[str], k: int = 3, min_score: float = 0.0) -> List[List[Tuple[int, float]]]:
+        """
+        Top-k для пачки запросов: список пар (номер записи FAQ, близость) с близостью
+        не ниже min_score; записи без общих с запросом признаков (близость 0) не возвращаются
+        """
+        if not self.n_rows:
+            return [[] for _ in questions]
+        scores = self.scores(questions)
+        k = min(k, self.n_rows)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for qi, cols in enumerate(top):
+            order = cols[np.argsort(-scores[qi, cols], kind="stable")]
+            results.append([(int(i), float(scores[qi, i])) for i in order
+                            if scores[qi, i] >= min_score and scores[qi, i] > 0])
+        return results
+
+    def search(self, question: str, k: int = 3, min_score: float = 0.0) -> List[Tuple[int, float]]:
+        return self.search_batch([question], k, min_score)[0]
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ("build", "query"):
+        print("Использование: python src/faq_retrieval.py build | query <вопрос> [<вопрос> ...]")
+        return
+
+    if sys.argv[1] == "build":
+        retriever = FaqRetriever.build_from_faq(FAQ_PATH)
+        retriever.save(INDEX_DIR)
+        print(f"Индекс сохранён: {INDEX_DIR} ({retriever.n_rows} вопросов, {len(retriever.vocab)} n-грамм)")
+        return
+
+    with open(FAQ_PATH, "r", encoding="utf-8") as f:
+        faq = json.load(f)
+    retriever = FaqRetriever.load_or_build(FAQ_PATH, INDEX_DIR)
+    questions = sys.argv[2:]
+    for question, hits in zip(questions, retriever.search_batch(questions)):
+        print(f"\nВопрос: {question}")
+        for i, score in hits:
+            print(f"  {score:.3f}  {faq[i]['q']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import os
+import time
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class FileWatcher:
+    """
+    Фоновое отслеживание изменений файлов по mtime и размеру.
+    При изменении вызывается callback (в потоке наблюдателя), а слушатели получают
+    событие с длительностью перезагрузки. Если callback упал, событие содержит ошибку,
+    а прежнее состояние остаётся в работе - callback должен подменять данные только целиком.
+    """
+
+    def __init__(self, interval: float = 2.0):
+        self.interval = interval
+        self.files: Dict[str, Tuple[Callable[[], None], Optional[Tuple[int, int]]]] = {}
+        self.listeners: List[Callable[[dict], None]] = []
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _signature(path: str) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def watch(self, path, callback: Callable[[], None]):
+        path = str(path)
+        with self.lock:
+            self.files[path] = (callback, self._signature(path))
+
+    def add_listener(self, listener: Callable[[dict], None]):
+        with self.lock:
+            self.listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[dict], None]):
+        with self.lock:
+            if listener in self.listeners:
+                self.listeners.remove(listener)
+
+    def check(self) -> List[dict]:
+        """Один проход проверки: перезагрузить изменившиеся файлы и вернуть события"""
+        events = []
+        with self.lock:
+            files = list(self.files.items())
+        for path, (callback, seen) in files:
+            current = self._signature(path)
+            if current is None or current == seen:
+                continue
+            started = time.perf_counter()
+            error = None
+            try:
+                callback()
+            except Exception as e:
+                error = str(e)
+            with self.lock:
+                self.files[path] = (callback, current)
+                listeners = list(self.listeners)
+            event = {
+                "event": "reload",
+                "file": path,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                "error": error,
+            }
+            events.append(event)
+            for listener in listeners:
+                try:
+                    listener(event)
+                except Exception:
+                    pass
+        return events
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self.check()
+
+    def start(self) -> "FileWatcher":
+        if self.thread is None and self.interval > 0:
+            self.thread = threading.Thread(target=self._run, name="file-watcher", daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
@@ -0,0 +1,128 @@
+import os
+import asyncio
+import threading
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+# Клиент LLM для скриптов: одна модель ChatOpenAI на набор настроек и общий пул HTTP-соединений
+# на процесс, поэтому повторные вызовы не платят за создание клиента, TCP- и TLS-рукопожатие.
+# Таймаут и повторы с экспоненциальной задержкой и джиттером настраиваются через LLM_*.
+
+_LOCK = threading.Lock()
+_http_clients: Dict[tuple, tuple] = {}
+_llms: Dict[tuple, Any] = {}
+
+
+class LLMSettings(NamedTuple):
+    model: str = "gpt-4o-mini"
+    temperature: float = 0.7
+    timeout: float = 30.0
+    max_retries: int = 3
+    backoff_initial: float = 0.5
+    backoff_max: float = 8.0
+    pool_size: int = 20
+    base_url: Optional[str] = None
+
+    @classmethod
+    def from_env(cls, **overrides) -> "LLMSettings":
+        """Настройки из окружения: OPENAI_API_MODEL, OPENAI_BASE_URL и LLM_TIMEOUT, LLM_MAX_RETRIES,
+        LLM_BACKOFF_INITIAL, LLM_BACKOFF_MAX, LLM_POOL_SIZE; overrides - явные значения поверх"""
+        settings = cls(
+            model=os.getenv("OPENAI_API_MODEL", "gpt-4o-mini"),
+            timeout=float(os.getenv("LLM_TIMEOUT", "30")),
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", "3")),
+            backoff_initial=float(os.getenv("LLM_BACKOFF_INITIAL", "0.5")),
+            backoff_max=float(os.getenv("LLM_BACKOFF_MAX", "8")),
+            pool_size=int(os.getenv("LLM_POOL_SIZE", "20")),
+            base_url=os.getenv("OPENAI_BASE_URL") or None,
+        )
+        return settings._replace(**overrides)
+
+
+def retryable_errors() -> Tuple[type, ...]:
+    """Ошибки, после которых запрос стоит повторить: таймаут, обрыв соединения, 429 и 5xx"""
+    import openai
+
+    return (openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+
+
+def get_http_clients(settings: LLMSettings) -> tuple:
+    """
+    Общие для процесса синхронный и асинхронный httpx-клиенты (пулы соединений с keep-alive),
+    по паре на каждое сочетание pool_size и timeout
+    """
+    import httpx
+
+    key = (settings.pool_size, settings.timeout)
+    with _LOCK:
+        clients = _http_clients.get(key)
+        if clients is None:
+            limits = httpx.Limits(max_connections=settings.pool_size, max_keepalive_connections=settings.pool_size)
+            timeout = httpx.Timeout(settings.timeout)
+            clients = _http_clients[key] = (httpx.Client(limits=limits, timeout=timeout),
+                                            httpx.AsyncClient(limits=limits, timeout=timeout))
+        return clients
+
+
+def get_llm(settings: Optional[LLMSettings] = None):
+    """ChatOpenAI для этих настроек: создаётся один раз, повторы делает with_retries()"""
+    from langchain_openai import ChatOpenAI
+
+    settings = settings or LLMSettings.from_env()
+    key = (settings.model, settings.temperature, settings.timeout, settings.pool_size, settings.base_url)
+    llm = _llms.get(key)
+    if llm is None:
+        http_client, http_async_client = get_http_clients(settings)
+        with _LOCK:
+            llm = _llms.get(key)
+            if llm is None:
+                llm = _llms[key] = ChatOpenAI(
+                    model=settings.model,
+                    temperature=settings.temperature,
+                    timeout=settings.timeout,
+                    base_url=settings.base_url,
+                    # Повторы SDK отключены, чтобы не умножались на наши
+                    max_retries=0,
+                    http_client=http_client,
+                    http_async_client=http_async_client,
+                )
+    return llm
+
+
+def with_retries(runnable, settings: Optional[LLMSettings] = None):
+    """Повторы runnable на временных ошибках: задержка растёт от backoff_initial до backoff_max со случайным джиттером"""
+    settings = settings or LLMSettings.from_env()
+    if settings.max_retries <= 0:
+        return runnable
+    return runnable.with_retry(
+        retry_if_exception_type=retryable_errors(),
+        wait_exponential_jitter=True,
+        exponential_jitter_params={"initial": settings.backoff_initial, "max": settings.backoff_max},
+        stop_after_attempt=settings.max_retries + 1,
+    )
+
+
+def close_async_client(client):
+    """Закрыть httpx.AsyncClient из синхронного кода (в работающем цикле событий - задачей)"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    if loop is not None:
+        loop.create_task(client.aclose())
+        return
+    try:
+        asyncio.run(client.aclose())
+    except RuntimeError:
+        # Соединения остались от уже закрытого цикла событий: закрывать их негде
+        pass
+
+
+def reset():
+    """Закрыть пулы соединений и забыть созданные модели (для тестов и бенчмарков)"""
+    with _LOCK:
+        _llms.clear()
+        clients = list(_http_clients.values())
+        _http_clients.clear()
+    for sync_client, async_client in clients:
+        sync_client.close()
+        close_async_client(async_client)
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Офлайн-пересчёт простых проверок стиля (rule_checks) по всей истории логов
+logs/session_*.jsonl - для отслеживания дрейфа голоса бренда по дням.
+
+Логи читаются генератором кусками по --chunk-mb, куски разбираются в пуле процессов,
+в работе одновременно не больше 2 кусков на процесс - память не зависит от объёма логов.
+
+Запуск из корня проекта:
+    python src/log_rescore.py [--logs logs] [--workers 4] [--out reports/style_drift.json]
+"""
+
+import os
+import json
+import glob
+import argparse
+import pathlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List
+
+try:
+    from .style_rules import rule_violations, violations_score
+except ImportError:
+    from style_rules import rule_violations, violations_score
+
+BASE = pathlib.Path(__file__).parent.parent.resolve()
+OUT_FILE = BASE / "reports" / "style_drift.json"
+# Поля агрегата за день
+FIELDS = ("answers", "rule_score_sum", "emoji", "shout", "too_long")
+INVALID = "invalid"
+
+
+def iter_chunks(paths: List[str], chunk_bytes: int) -> Iterator[List[bytes]]:
+    """Строки логов пачками примерно по chunk_bytes; строки без ответа бота отбрасываются сразу"""
+    chunk, size = [], 0
+    for path in paths:
+        with open(path, "rb") as f:
+            for line in f:
+                if b'"bot_response"' not in line:
+                    continue
+                chunk.append(line)
+                size += len(line)
+                if size >= chunk_bytes:
+                    yield chunk
+                    chunk, size = [], 0
+    if chunk:
+        yield chunk
+
+
+def score_chunk(lines: List[bytes]) -> Dict[str, list]:
+    """Агрегаты по дням для одной пачки строк (выполняется в процессе пула)"""
+    days: Dict[str, list] = {}
+    for line in lines:
+        try:
+            entry = json.loads(line)
+            text = entry["bot_response"]
+            day = entry["timestamp"][:10]
+            if not isinstance(text, str):
+                raise TypeError(type(text).__name__)
+        except (ValueError, KeyError, TypeError):
+            # Битые строки считаются в отдельном ключе, их число - в первом поле
+            day, text = INVALID, None
+        stats = days.get(day)
+        if stats is None:
+            stats = days[day] = [0] * len(FIELDS)
+        stats[0] += 1
+        if text is None:
+            continue
+        # Проверки выполняются один раз: из них и балл, и счётчики нарушений
+        emoji, shout, too_long = rule_violations(text)
+        stats[1] += violations_score(emoji, shout, too_long)
+        stats[2] += emoji
+        stats[3] += shout
+        stats[4] += too_long
+    return days
+
+
+def merge(total: Dict[str, list], part: Dict[str, list]):
+    for day, stats in part.items():
+        acc = total.setdefault(day, [0] * len(FIELDS))
+        for i, value in enumerate(stats):
+            acc[i] += value
+
+
+def map_bounded(fn: Callable, items: Iterable, workers: int) -> Iterator:
+    """
+    Результаты fn(item) в пуле процессов по порядку items; в работе не больше 2 * workers
+    заданий, поэтому items читаются лениво и не копятся в очереди пула
+    """
+    if workers <= 1:
+        yield from map(fn, items)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = deque()
+        for item in items:
+            in_flight.append(pool.submit(fn, item))
+            if len(in_flight) >= 2 * workers:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+def rescore(paths: List[str], workers: int = os.cpu_count() or 1, chunk_bytes: int = 4 << 20) -> Dict[str, list]:
+    """Агрегаты по дням для всех файлов"""
+    total: Dict[str, list] = {}
+    for part in map_bounded(score_chunk, iter_chunks(paths, chunk_bytes), workers):
+        merge(total, part)
+    return total
+
+
+def make_report(total: Dict[str, list]) -> dict:
+    days = []
+    for day in sorted(d for d in total if d != INVALID):
+        answers, score_sum, emoji, shout, too_long = total[day]
+        days.append({
+            "date": day,
+            "answers": answers,
+            "mean_rule_score": round(score_sum / answers, 2),
+            "emoji_rate": round(emoji / answers, 4),
+            "shout_rate": round(shout / answers, 4),
+            "too_long_rate": round(too_long / answers, 4),
+        })
+    answers = sum(d["answers"] for d in days)
+    return {
+        "answers": answers,
+        "invalid_lines": total[INVALID][0] if INVALID in total else 0,
+        "mean_rule_score": round(sum(total[d["date"]][1] for d in days) / answers, 2) if answers else 0,
+        "days": days,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пересчёт rule_checks по логам сессий с агрегатами по дням")
+    parser.add_argument("--logs", default=str(BASE / "logs"), help="Каталог с логами session_*.jsonl")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Число процессов")
+    parser.add_argument("--chunk-mb", type=float, default=4, help="Размер пачки строк, МБ")
+    parser.add_argument("--out", default=str(OUT_FILE), help="Файл отчёта")
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.logs, "session_*.jsonl")))
+    total = rescore(paths, args.workers, int(args.chunk_mb * (1 << 20)))
+    report = make_report(total)
+
+    out = pathlib.Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"Файлов: {len(paths)}, ответов: {report['answers']}, дней: {len(report['days'])}, "
+          f"средний rule_score: {report['mean_rule_score']} -> {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import os
+import threading
+from collections import deque
+from typing import Callable, Deque, List, NamedTuple, Optional
+
+# Служебные токены на каждое сообщение в формате чата OpenAI
+TOKENS_PER_MESSAGE = 4
+# Кодировка gpt-4o / gpt-4o-mini
+ENCODING = "o200k_base"
+# Грубая оценка без токенизатора: символов на токен для русского текста
+CHARS_PER_TOKEN = 3
+
+_ENCODING_LOCK = threading.Lock()
+_encoding = []
+
+
+def get_encoding():
+    """Токенизатор tiktoken (загружается один раз); None, если недоступен - тогда токены оцениваются по длине"""
+    if not _encoding:
+        with _ENCODING_LOCK:
+            if not _encoding:
+                try:
+                    import tiktoken
+                    _encoding.append(tiktoken.get_encoding(ENCODING))
+                except Exception as e:
+                    print(f"Токенизатор {ENCODING} недоступен ({type(e).__name__}), токены считаются приблизительно")
+                    _encoding.append(None)
+    return _encoding[0]
+
+
+def count_tokens(text: str) -> int:
+    encoding = get_encoding()
+    if encoding is None:
+        return len(text) // CHARS_PER_TOKEN + 1
+    return len(encoding.encode(text))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Последние max_tokens токенов текста (в резюме важнее свежие реплики)"""
+    encoding = get_encoding()
+    if encoding is None:
+        return text[-max_tokens * CHARS_PER_TOKEN:]
+    tokens = encoding.encode(text)
+    return text if len(tokens) <= max_tokens else encoding.decode(tokens[-max_tokens:])
+
+
+class Turn(NamedTuple):
+    user: str
+    assistant: str
+    tokens: int
+    text: str
+
+
+SUMMARY_PROMPT = (
+    "Обнови краткое резюме диалога клиента с ассистентом интернет-магазина. "
+    "Сохрани номера заказов, суть вопросов и то, что уже было обещано клиенту. "
+    "Не больше трёх предложений, без вступлений."
+)
+
+
+def summary_request(summary: str, turns: List[Turn]) -> str:
+    """Текст запроса к LLM для свёртки реплик в резюме (вместе с SUMMARY_PROMPT)"""
+    dialog = "".join(turn.text for turn in turns)
+    return f"Текущее резюме: {summary or 'нет'}\n\nНовые реплики:\n{dialog}"
+
+
+def extractive_summary(summary: str, turns: List[Turn]) -> str:
+    """Резюме без LLM: вопросы клиента из вытесненных реплик"""
+    questions = "; ".join(turn.user for turn in turns)
+    return f"{summary}; {questions}" if summary else f"Клиент ранее спрашивал: {questions}"
+
+
+class ConversationMemory:
+    """
+    История диалога с бюджетом токенов. Реплики хранятся в deque вместе с числом токенов
+    и готовым текстом, поэтому история не переформатируется на каждом ходу.
+    Когда история вместе с резюме превышает max_tokens, старые реплики вытесняются
+    до 3/4 бюджета и одним вызовом summarizer(резюме, реплики) сворачиваются в резюме
+    (не больше summary_tokens). Если summarizer не задан или упал, резюме собирается из вопросов клиента.
+    """
+
+    SUMMARY_PREFIX = "Краткое содержание предыдущего диалога: "
+
+    def __init__(self, max_tokens: int = 1000, summary_tokens: int = 200, max_turns: int = 50,
+                 summarizer: Optional[Callable[[str, List[Turn]], str]] = None):
+        self.max_tokens = max_tokens
+        # Резюме не больше четверти бюджета, иначе после свёртки на реплики почти не останется места
+        self.summary_tokens = min(summary_tokens, max_tokens // 4)
+        self.max_turns = max_turns
+        self.summarizer = summarizer
+        self.turns: Deque[Turn] = deque()
+        self.turn_tokens = 0
+        self.summary = ""
+        self.summary_size = 0
+        self._text: Optional[str] = None
+        self._messages: Optional[List[dict]] = None
+
+    @classmethod
+    def from_env(cls, summarizer=None, prefix: str = "HISTORY") -> "ConversationMemory":
+        """Настройка из переменных окружения: <prefix>_MAX_TOKENS, <prefix>_SUMMARY_TOKENS, <prefix>_MAX_TURNS"""
+        return cls(
+            max_tokens=int(os.getenv(f"{prefix}_MAX_TOKENS", "1000")),
+            summary_tokens=int(os.getenv(f"{prefix}_SUMMARY_TOKENS", "200")),
+            max_turns=int(os.getenv(f"{prefix}_MAX_TURNS", "50")),
+            summarizer=summarizer,
+        )
+
+    def __len__(self) -> int:
+        return len(self.turns)
+
+    @property
+    def tokens(self) -> int:
+        return self.turn_tokens + self.summary_size
+
+    def add(self, user: str, assistant: str):
+        text = f"Пользователь: {user}\nАссистент: {assistant}\n"
+        tokens = count_tokens(user) + count_tokens(assistant) + 2 * TOKENS_PER_MESSAGE
+        turn = Turn(user, assistant, tokens, text)
+        self.turns.append(turn)
+        self.turn_tokens += tokens
+        if self.tokens > self.max_tokens or len(self.turns) > self.max_turns:
+            self.compact()
+            return
+        # Без вытеснения готовый текст и сообщения просто дополняются
+        if self._text is not None:
+            self._text += text
+        if self._messages is not None:
+            self._messages.extend(self.turn_messages(turn))
+
+    def compact(self):
+        """Вытеснить старые реплики до 3/4 бюджета и свернуть их в резюме"""
+        target = self.max_tokens * 3 // 4
+        evicted = []
+        # Последняя реплика остаётся всегда
+        while len(self.turns) > 1 and (self.tokens > target or len(self.turns) > self.max_turns):
+            turn = self.turns.popleft()
+            self.turn_tokens -= turn.tokens
+            evicted.append(turn)
+        if evicted:
+            self.fold(evicted)
+        self._text = self._messages = None
+
+    def fold(self, evicted: List[Turn]):
+        summary = None
+        if self.summarizer is not None:
+            try:
+                summary = self.summarizer(self.summary, evicted)
+            except Exception:
+                summary = None
+        if not summary:
+            summary = extractive_summary(self.summary, evicted)
+        self.summary = truncate_tokens(summary.strip(), self.summary_tokens)
+        self.summary_size = count_tokens(self.SUMMARY_PREFIX + self.summary) + TOKENS_PER_MESSAGE
+
+    @staticmethod
+    def turn_messages(turn: Turn) -> List[dict]:
+        return [{"role": "user", "content": turn.user}, {"role": "assistant", "content": turn.assistant}]
+
+    def messages(self) -> List[dict]:
+        """История в формате сообщений чата; резюме идёт системным сообщением"""
+        if self._messages is None:
+            messages = []
+            if self.summary:
+                messages.append({"role": "system", "content": self.SUMMARY_PREFIX + self.summary})
+            for turn in self.turns:
+                messages.extend(self.turn_messages(turn))
+            self._messages = messages
+        return list(self._messages)
+
+    def render(self) -> str:
+        """История текстом для промпта цепочки"""
+        if self._text is None:
+            head = f"{self.SUMMARY_PREFIX}{self.summary}\n" if self.summary else ""
+            self._text = head + "".join(turn.text for turn in self.turns)
+        return self._text
+
+    def clear(self):
+        self.turns.clear()
+        self.turn_tokens = 0
+        self.summary = ""
+        self.summary_size = 0
+        self._text = self._messages = None
@@ -0,0 +1,157 @@
+import os
+import time
+import bisect
+import threading
+from typing import Dict, List, Optional
+
+# Границы корзин гистограмм, секунды (как у Prometheus, le - "не больше")
+BOUNDS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+          0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+METRIC_NAME = "bot_stage_seconds"
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "count", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BOUNDS) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(BOUNDS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        """Оценка квантиля: верхняя граница корзины (для последней корзины - максимум)"""
+        rank, seen = q * self.count, 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min(BOUNDS[i], self.max) if i < len(BOUNDS) else self.max
+        return self.max
+
+
+class _Span:
+    __slots__ = ("metrics", "stage", "started")
+
+    def __init__(self, metrics: "Metrics", stage: str):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.stage, time.perf_counter() - self.started)
+        return False
+
+
+class _NoSpan:
+    """Пустой span для выключенных метрик: один и тот же объект, ничего не замеряет"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NO_SPAN = _NoSpan()
+
+
+class Metrics:
+    """
+    Время этапов обработки реплики (FAQ, заказы, промпт, LLM, разбор ответа, запись лога)
+    в гистограммах процесса. Этап замеряется блоком `with metrics.span("faq"):`
+    или готовой длительностью через observe(). Выключенные метрики (METRICS=0)
+    возвращают пустой span - цена замера сводится к вызову метода.
+    """
+
+    def __init__(self, enabled: bool = True, log_interval: float = 60.0):
+        self.enabled = enabled
+        self.log_interval = log_interval
+        self.lock = threading.Lock()
+        self.stages: Dict[str, Histogram] = {}
+        self.next_log = time.monotonic() + log_interval
+
+    @classmethod
+    def from_env(cls) -> "Metrics":
+        return cls(
+            enabled=os.getenv("METRICS", "1") != "0",
+            log_interval=float(os.getenv("METRICS_LOG_INTERVAL", "60")),
+        )
+
+    def span(self, stage: str):
+        if not self.enabled:
+            return NO_SPAN
+        return _Span(self, stage)
+
+    def observe(self, stage: str, seconds: float):
+        if not self.enabled:
+            return
+        with self.lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = Histogram()
+            histogram.observe(seconds)
+
+    def due(self) -> bool:
+        """Пора ли писать сводку в лог сессии (не чаще раза в log_interval секунд)"""
+        if not self.enabled or self.log_interval <= 0:
+            return False
+        now = time.monotonic()
+        with self.lock:
+            if now < self.next_log:
+                return False
+            self.next_log = now + self.log_interval
+            return True
+
+    def summary(self) -> Dict[str, dict]:
+        """Сводка по этапам с начала работы процесса, миллисекунды"""
+        with self.lock:
+            return {
+                stage: {
+                    "count": h.count,
+                    "mean_ms": round(h.total / h.count * 1000, 3),
+                    "p50_ms": round(h.quantile(0.5) * 1000, 3),
+                    "p95_ms": round(h.quantile(0.95) * 1000, 3),
+                    "max_ms": round(h.max * 1000, 3),
+                }
+                for stage, h in sorted(self.stages.items())
+            }
+
+    def render(self, labels: Optional[Dict[str, str]] = None) -> str:
+        """Гистограммы в текстовом формате Prometheus"""
+        extra = "".join(f',{k}="{v}"' for k, v in (labels or {}).items())
+        lines: List[str] = [
+            f"# HELP {METRIC_NAME} Время этапов обработки реплики",
+            f"# TYPE {METRIC_NAME} histogram",
+        ]
+        with self.lock:
+            for stage, h in sorted(self.stages.items()):
+                cumulative = 0
+                for bound, count in zip(BOUNDS + ("+Inf",), h.counts):
+                    cumulative += count
+                    lines.append(f'{METRIC_NAME}_bucket{{stage="{stage}"{extra},le="{bound}"}} {cumulative}')
+                lines.append(f'{METRIC_NAME}_sum{{stage="{stage}"{extra}}} {h.total:.6f}')
+                lines.append(f'{METRIC_NAME}_count{{stage="{stage}"{extra}}} {h.count}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self.lock:
+            self.stages.clear()
+
+
+# Общие метрики процесса (бот, цепочка, запись логов и сервер пишут в одно место)
+METRICS = Metrics.from_env()
+
+
+def span(stage: str):
+    return METRICS.span(stage)
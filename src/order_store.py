@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Хранилища заказов с общим интерфейсом: словарь из orders.json (как раньше)
+и индексированная база SQLite для больших объёмов.
+
+Импорт orders.json в SQLite:
+    python src/order_store.py import data/orders.json data/orders.sqlite
+"""
+
+import os
+import re
+import sys
+import json
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Номер заказа - группа из 4+ цифр, в том числе внутри "№12345—", "#12345," или "(12345)"
+ORDER_ID_RE = re.compile(r"(?<!\d)\d{4,}(?!\d)")
+# Сколько номеров обрабатывается за один запрос /orders
+MAX_BULK_ORDERS = 200
+
+
+class OrderStore(ABC):
+    """Общий интерфейс: store[order_id], order_id in store, store.get(order_id)"""
+
+    # Данные берутся из orders.json: при его изменении хранилище нужно открыть заново
+    uses_json_file = True
+
+    @abstractmethod
+    def get(self, order_id: str) -> Optional[dict]:
+        ...
+
+    def get_many(self, order_ids: Iterable[str]) -> Dict[str, dict]:
+        found = {}
+        for order_id in order_ids:
+            order = self.get(order_id)
+            if order is not None:
+                found[order_id] = order
+        return found
+
+    def __contains__(self, order_id) -> bool:
+        return self.get(order_id) is not None
+
+    def __getitem__(self, order_id: str) -> dict:
+        order = self.get(order_id)
+        if order is None:
+            raise KeyError(order_id)
+        return order
+
+    def close(self):
+        """Освободить ресурсы; вызывается, когда хранилище подменено новым"""
+
+
+class JsonOrderStore(OrderStore):
+    """Все заказы в памяти процесса (формат data/orders.json)"""
+
+    def __init__(self, orders: Dict[str, dict]):
+        self.orders = orders
+
+    @classmethod
+    def from_file(cls, path) -> "JsonOrderStore":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def get(self, order_id: str) -> Optional[dict]:
+        return self.orders.get(order_id)
+
+    def __contains__(self, order_id) -> bool:
+        return order_id in self.orders
+
+
+class SqliteOrderStore(OrderStore):
+    """
+    Заказы в SQLite с первичным ключом по номеру заказа.
+    У каждого потока своё соединение; SQL-тексты постоянные, поэтому sqlite3
+    берёт подготовленные выражения из кэша соединения. Новые заказы видны без перезапуска.
+    """
+
+    uses_json_file = False
+    GET_SQL = "SELECT data FROM orders WHERE order_id = ?"
+    # Ограничение SQLite на число параметров в одном запросе
+    MAX_PARAMS = 900
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.local = threading.local()
+        # Соединения всех потоков, чтобы close() закрыл их все
+        self.conns: List[sqlite3.Connection] = []
+        self.lock = threading.Lock()
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"База заказов не найдена: {self.path}")
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            # Соединением пользуется только свой поток; check_same_thread снят, чтобы close() мог его закрыть
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, cached_statements=256,
+                                   check_same_thread=False)
+            self.local.conn = conn
+            with self.lock:
+                self.conns.append(conn)
+        return conn
+
+    def get(self, order_id: str) -> Optional[dict]:
+        row = self.conn.execute(self.GET_SQL, (order_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_many(self, order_ids: Iterable[str]) -> Dict[str, dict]:
+        ids = list(dict.fromkeys(order_ids))
+        found = {}
+        for start in range(0, len(ids), self.MAX_PARAMS):
+            chunk = ids[start:start + self.MAX_PARAMS]
+            sql = f"SELECT order_id, data FROM orders WHERE order_id IN ({','.join('?' * len(chunk))})"
+            for order_id, data in self.conn.execute(sql, chunk):
+                found[order_id] = json.loads(data)
+        return found
+
+    def close(self):
+        """Закрыть соединения всех потоков"""
+        with self.lock:
+            conns, self.conns = self.conns, []
+        for conn in conns:
+            conn.close()
+        self.local = threading.local()
+
+
+def extract_order_ids(text: str) -> List[str]:
+    """Номера заказов из текста без повторов, в порядке появления"""
+    return list(dict.fromkeys(ORDER_ID_RE.findall(text)))
+
+
+def format_order_status(order_id: str, order: Optional[dict]) -> Optional[str]:
+    if order is not None:
+        if order["status"] == "in_transit":
+            return f"Заказ {order_id} находится в пути. Ожидаемая доставка через {order['eta_days']} дня(ей). Перевозчик: {order['carrier']}."
+        elif order["status"] == "delivered":
+            return f"Заказ {order_id} был доставлен {order['delivered_at']}."
+        elif order["status"] == "processing":
+            return f"Заказ {order_id} находится в обработке. {order['note']}."
+    return None
+
+
+def format_order_statuses(order_ids: List[str], orders: Dict[str, dict]) -> str:
+    """Статусы списка заказов одним сообщением (orders - результат get_many)"""
+    shown = order_ids[:MAX_BULK_ORDERS]
+    # Заказ с неизвестным статусом (например, cancelled) считается не найденным
+    statuses = [format_order_status(order_id, orders.get(order_id)) for order_id in shown]
+    lines = [f"Статусы заказов (найдено {sum(status is not None for status in statuses)} из {len(shown)}):"]
+    for order_id, status in zip(shown, statuses):
+        lines.append(f"- {status or f'Заказ {order_id} не найден.'}")
+    if len(order_ids) > len(shown):
+        lines.append(f"Показаны первые {len(shown)} номеров из {len(order_ids)}, остальные отправьте отдельным запросом.")
+    return "\n".join(lines)
+
+
+def create_orders_db(db_path) -> sqlite3.Connection:
+    conn = sqlite3.connect(str(db_path))
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS orders ("
+        "order_id TEXT PRIMARY KEY, status TEXT NOT NULL, data TEXT NOT NULL) WITHOUT ROWID"
+    )
+    return conn
+
+
+def import_orders(orders: Iterable[Tuple[str, dict]], db_path, batch_size: int = 50_000) -> int:
+    """Массовая загрузка пар (номер заказа, заказ) в SQLite; существующие заказы обновляются"""
+    conn = create_orders_db(db_path)
+    total = 0
+    batch = []
+    try:
+        for order_id, order in orders:
+            batch.append((str(order_id), order["status"], json.dumps(order, ensure_ascii=False)))
+            if len(batch) >= batch_size:
+                conn.executemany("INSERT OR REPLACE INTO orders VALUES (?, ?, ?)", batch)
+                conn.commit()
+                total += len(batch)
+                batch.clear()
+        if batch:
+            conn.executemany("INSERT OR REPLACE INTO orders VALUES (?, ?, ?)", batch)
+            conn.commit()
+            total += len(batch)
+    finally:
+        conn.close()
+    return total
+
+
+def iter_orders_json(path) -> Iterator[Tuple[str, dict]]:
+    """Заказы из файла в формате data/orders.json"""
+    with open(path, "r", encoding="utf-8") as f:
+        yield from json.load(f).items()
+
+
+def open_order_store(json_path, db_path: Optional[str] = None) -> OrderStore:
+    """SQLite, если задан путь к базе (аргумент или ORDERS_DB), иначе словарь из JSON"""
+    db_path = db_path or os.getenv("ORDERS_DB")
+    if db_path:
+        return SqliteOrderStore(db_path)
+    return JsonOrderStore.from_file(json_path)
+
+
+def main():
+    if len(sys.argv) != 4 or sys.argv[1] != "import":
+        print("Использование: python src/order_store.py import <orders.json> <orders.sqlite>")
+        return
+    total = import_orders(iter_orders_json(sys.argv[2]), sys.argv[3])
+    print(f"Импортировано заказов: {total} -> {sys.argv[3]}")
+
+
+if __name__ == "__main__":
+    main()
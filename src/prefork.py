@@ -0,0 +1,166 @@
+import gc
+import os
+import sys
+import time
+import signal
+import multiprocessing
+import multiprocessing.connection
+from typing import Callable, Dict, Optional
+
+# Pre-fork: данные только для чтения загружаются в родителе один раз, процессы-обработчики
+# получают их через fork и делят страницы памяти, пока не изменят их (копирование при записи).
+# Родитель следит за обработчиками, перезапускает упавшие и печатает их память.
+
+MEMORY_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+# Процесс, проживший меньше MIN_UPTIME секунд, считается упавшим при старте: перезапуск с растущей задержкой
+MIN_UPTIME = 5.0
+MAX_RESTART_DELAY = 30.0
+
+
+def freeze():
+    """
+    Перенести все созданные объекты в постоянное поколение GC перед fork: сборщик
+    в обработчиках их не обходит и не пачкает их страницы своими заголовками
+    """
+    gc.collect()
+    gc.freeze()
+
+
+def memory_usage(pid: int) -> Dict[str, float]:
+    """
+    Память процесса в МБ: rss, pss (доля общих страниц поровну между процессами),
+    shared и private (Linux, /proc/<pid>/smaps_rollup); без /proc - пустой словарь
+    """
+    values = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+            for line in f:
+                name, _, rest = line.partition(":")
+                if name in MEMORY_FIELDS:
+                    values[name] = int(rest.split()[0]) / 1024
+    except (OSError, ValueError, IndexError):
+        try:
+            with open(f"/proc/{pid}/statm", "r") as f:
+                return {"rss": round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)}
+        except (OSError, ValueError, IndexError):
+            return {}
+    return {
+        "rss": round(values.get("Rss", 0), 1),
+        "pss": round(values.get("Pss", 0), 1),
+        "shared": round(values.get("Shared_Clean", 0) + values.get("Shared_Dirty", 0), 1),
+        "private": round(values.get("Private_Clean", 0) + values.get("Private_Dirty", 0), 1),
+    }
+
+
+def format_memory(usage: Dict[str, float]) -> str:
+    return ", ".join(f"{name} {value:.1f} МБ" for name, value in usage.items()) or "нет данных"
+
+
+class Supervisor:
+    """
+    Родительский процесс pre-fork: запускает workers обработчиков target(номер) через fork,
+    перезапускает завершившиеся (упавшие при старте - с растущей задержкой) и каждые
+    memory_interval секунд печатает их память. SIGINT/SIGTERM останавливают всех.
+    on_spawn(номер) вызывается в родителе перед запуском обработчика, on_exit(номер) -
+    после его завершения (например, чтобы закрыть и заново открыть его сокет).
+    """
+
+    def __init__(self, target: Callable[[int], None], workers: int, memory_interval: float = 60,
+                 on_spawn: Optional[Callable[[int], None]] = None, on_exit: Optional[Callable[[int], None]] = None):
+        self.target = target
+        self.workers = workers
+        self.memory_interval = memory_interval
+        self.on_spawn = on_spawn
+        self.on_exit = on_exit
+        self.ctx = multiprocessing.get_context("fork")
+        self.processes: Dict[int, multiprocessing.Process] = {}
+        self.started: Dict[int, float] = {}
+        self.failures: Dict[int, int] = {}
+        self.restart_at: Dict[int, float] = {}
+        self.restarts = 0
+        self.stopping = False
+
+    def _run(self, worker: int):
+        # Сигналы родителя обработчику не нужны: свои обработчики ставит target
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, signal.SIG_DFL)
+        self.target(worker)
+
+    def spawn(self, worker: int):
+        if self.on_spawn is not None:
+            self.on_spawn(worker)
+        process = self.ctx.Process(target=self._run, args=(worker,), name=f"worker-{worker}")
+        process.start()
+        self.processes[worker] = process
+        self.started[worker] = time.monotonic()
+
+    def reap(self, worker: int, process: multiprocessing.Process):
+        """Обработчик завершился: запланировать перезапуск"""
+        process.join()
+        del self.processes[worker]
+        if self.on_exit is not None:
+            self.on_exit(worker)
+        uptime = time.monotonic() - self.started[worker]
+        self.failures[worker] = self.failures.get(worker, 0) + 1 if uptime < MIN_UPTIME else 0
+        delay = min(2 ** self.failures[worker] - 1, MAX_RESTART_DELAY)
+        print(f"Обработчик w{worker} (pid {process.pid}) завершился с кодом {process.exitcode} "
+              f"через {uptime:.1f} с, перезапуск через {delay:.0f} с", file=sys.stderr, flush=True)
+        self.restart_at[worker] = time.monotonic() + delay
+
+    def memory_report(self) -> str:
+        parent = memory_usage(os.getpid())
+        lines = [f"  родитель pid {os.getpid()}: {format_memory(parent)}"]
+        total = parent.get("pss", 0)
+        for worker, process in sorted(self.processes.items()):
+            usage = memory_usage(process.pid)
+            total += usage.get("pss", 0)
+            lines.append(f"  w{worker} pid {process.pid}: {format_memory(usage)}")
+        lines.append(f"  всего pss {total:.1f} МБ, перезапусков {self.restarts}")
+        return "\n".join(lines)
+
+    def stop(self, timeout: float = 10):
+        self.stopping = True
+        for process in self.processes.values():
+            if process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + timeout
+        for process in self.processes.values():
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                process.kill()
+                process.join()
+
+    def run(self):
+        def request_stop(signum, frame):
+            self.stopping = True
+
+        previous = {sig: signal.signal(sig, request_stop) for sig in (signal.SIGINT, signal.SIGTERM)}
+        try:
+            for worker in range(self.workers):
+                self.spawn(worker)
+            next_report = time.monotonic() + self.memory_interval
+            while not self.stopping:
+                timeout = 1.0
+                if self.restart_at:
+                    timeout = min(timeout, max(min(self.restart_at.values()) - time.monotonic(), 0))
+                sentinels = {process.sentinel: worker for worker, process in self.processes.items()}
+                ready = multiprocessing.connection.wait(list(sentinels), timeout)
+                # При остановке обработчики завершаются сами (Ctrl+C приходит всей группе процессов)
+                if self.stopping:
+                    break
+                for sentinel in ready:
+                    worker = sentinels[sentinel]
+                    self.reap(worker, self.processes[worker])
+                now = time.monotonic()
+                for worker, due in list(self.restart_at.items()):
+                    if due <= now:
+                        del self.restart_at[worker]
+                        self.restarts += 1
+                        self.spawn(worker)
+                if self.memory_interval > 0 and now >= next_report:
+                    print("Память обработчиков:\n" + self.memory_report(), flush=True)
+                    next_report = now + self.memory_interval
+        finally:
+            self.stop()
+            for sig, handler in previous.items():
+                signal.signal(sig, handler)
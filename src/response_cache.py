@@ -0,0 +1,137 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+try:
+    from .faq_index import normalize_text
+except ImportError:
+    from faq_index import normalize_text
+
+
+def make_cache_key(user_input: str, **parts: Any) -> str:
+    """
+    Ключ кэша: нормализованный запрос плюс всё, что влияет на ответ модели
+    (окно истории, модель, температура, версия промпта, контексты).
+    """
+    payload = {"input": normalize_text(user_input), **parts}
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    LRU-кэш ответов LLM с TTL на запись и необязательным хранилищем на диске (SQLite).
+    Значения должны сериализоваться в JSON.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 3600, path: Optional[str] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.latency_saved = 0.0
+        self.db = None
+        if path and max_size > 0:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT, expires_at REAL, latency REAL, used_at REAL)"
+            )
+            self.db.execute("CREATE INDEX IF NOT EXISTS responses_used_at ON responses (used_at)")
+            self.db.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),))
+            self.db.commit()
+
+    @classmethod
+    def from_env(cls, prefix: str = "RESPONSE_CACHE") -> "ResponseCache":
+        """Настройка из переменных окружения: <prefix>_SIZE, <prefix>_TTL, <prefix>_PATH"""
+        return cls(
+            max_size=int(os.getenv(f"{prefix}_SIZE", "1024")),
+            ttl=float(os.getenv(f"{prefix}_TTL", "3600")),
+            path=os.getenv(f"{prefix}_PATH") or None,
+        )
+
+    def _load_from_disk(self, key: str, now: float) -> Optional[tuple]:
+        row = self.db.execute(
+            "SELECT value, expires_at, latency FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[1] < now:
+            self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.db.commit()
+            return None
+        self.db.execute("UPDATE responses SET used_at = ? WHERE key = ?", (now, key))
+        self.db.commit()
+        return json.loads(row[0]), row[1], row[2]
+
+    def get(self, key: str) -> Optional[Any]:
+        """Значение из кэша или None; промах и попадание учитываются в счётчиках"""
+        if self.max_size <= 0:
+            return None
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[1] < now:
+                del self.entries[key]
+                entry = None
+            if entry is None and self.db is not None:
+                entry = self._load_from_disk(key, now)
+                if entry is not None:
+                    self._put(key, entry)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            self.latency_saved += entry[2]
+            return entry[0]
+
+    def _put(self, key: str, entry: tuple):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def set(self, key: str, value: Any, latency: float = 0.0):
+        """Сохранение значения; latency - время исходного вызова, которое сэкономит попадание"""
+        if self.max_size <= 0:
+            return
+        now = time.time()
+        entry = (value, now + self.ttl, latency)
+        with self.lock:
+            self._put(key, entry)
+            if self.db is not None:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False), entry[1], latency, now),
+                )
+                # Ограничиваем размер хранилища на диске тем же лимитом, вытесняя давно неиспользуемые
+                self.db.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_size,),
+                )
+                self.db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "latency_saved_s": round(self.latency_saved, 3),
+                "size": len(self.entries),
+            }
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
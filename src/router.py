@@ -0,0 +1,151 @@
+import os
+import re
+import threading
+from collections import Counter
+from typing import NamedTuple, Optional
+
+try:
+    from .faq_index import normalize_text
+    from .order_store import extract_order_ids
+    from .brand_chain import BrandResponse, get_faq_state, get_order_status, get_order_statuses, load_style_guide
+except ImportError:
+    from faq_index import normalize_text
+    from order_store import extract_order_ids
+    from brand_chain import BrandResponse, get_faq_state, get_order_status, get_order_statuses, load_style_guide
+
+# Приветствие и прощание: сообщение только из этих слов и хотя бы с одним опорным словом,
+# иначе "день", "до" или "всего" сами по себе считались бы приветствием или прощанием
+GREETING_WORDS = {"привет", "здравствуйте", "здравствуй", "добрый", "доброе", "день", "вечер", "утро",
+                  "hello", "hi", "hey", "салют"}
+GREETING_ANCHORS = {"привет", "здравствуйте", "здравствуй", "добрый", "доброе", "hello", "hi", "hey", "салют"}
+FAREWELL_WORDS = {"спасибо", "благодарю", "большое", "пока", "до", "свидания", "всего", "доброго",
+                  "хорошего", "дня", "bye", "thanks"}
+FAREWELL_ANCHORS = {"спасибо", "благодарю", "пока", "свидания", "доброго", "хорошего", "bye", "thanks"}
+# Слова про статус заказа и слова, при которых вопрос уже не про статус (возврат, отмена и т.п.)
+STATUS_RE = re.compile(r"статус|где|когда|отслед|трек|что с|доставлен|в пути")
+NOT_STATUS_RE = re.compile(r"возврат|верну|отмен|измен|адрес|оплат|сломан|брак|жалоб")
+MAX_STATUS_WORDS = 8
+# Ответ FAQ без LLM: каждое слово сообщения длиннее двух букв должно совпасть с каким-то словом
+# вопроса FAQ по первым STEM_LEN буквам. Символьные n-граммы близки и у "сколько стоит доставка"
+# с "сколько идёт доставка", а различаются они как раз словом, от которого зависит ответ.
+STEM_LEN = 5
+# Номер, явно названный номером заказа: "заказ 12345", "заказа №12345", "№ 12345", "#12345"
+ORDER_MARKER_RE = re.compile(r"(?:заказ\w*|№|#)\s*(?:номер\s*)?[№#]?\s*(\d{4,})(?!\d)")
+
+TONE = "да, шаблонный ответ в тоне бренда"
+TEMPLATES = {
+    "greeting": "Здравствуйте, это {brand}. Помогу со статусом заказа, доставкой, возвратом и оплатой. Чем могу помочь?",
+    "farewell": "Спасибо за обращение. Если появятся вопросы — пишите, будем рады помочь.",
+    "order_not_found": "Не нашёл заказ {order_id}. Проверьте, пожалуйста, номер — он есть в письме с подтверждением заказа.",
+}
+
+
+class Route(NamedTuple):
+    intent: str
+    response: BrandResponse
+
+
+class Router:
+    """
+    Маршрутизация перед цепочкой: приветствие, прощание, статус заказов и уверенное
+    совпадение с FAQ отвечаются шаблонами без вызова LLM. Всё неоднозначное (вопрос о заказе
+    не про статус, частичное совпадение с FAQ) возвращает None и идёт в LLM.
+    Шаблоны берутся из раздела templates стилевого гайда.
+    """
+
+    def __init__(self, faq_threshold: float = 0.8, faq_coverage: float = 0.75):
+        # Близость к вопросу FAQ и доля сообщения, которую этот вопрос покрывает
+        self.faq_threshold = faq_threshold
+        self.faq_coverage = faq_coverage
+        self.lock = threading.Lock()
+        self.intents = Counter()
+        self.total = 0
+        self.llm_calls = 0
+        self.llm_time = 0.0
+        self.saved = 0.0
+
+    @classmethod
+    def from_env(cls) -> "Router":
+        return cls(faq_threshold=float(os.getenv("ROUTER_FAQ_THRESHOLD", "0.8")))
+
+    @staticmethod
+    def template(name: str, **values) -> str:
+        templates = load_style_guide().get("templates") or {}
+        return (templates.get(name) or TEMPLATES[name]).format(brand=load_style_guide()["brand"], **values)
+
+    def match_small_talk(self, words) -> Optional[Route]:
+        if set(words) <= GREETING_WORDS and GREETING_ANCHORS.intersection(words):
+            return Route("greeting", BrandResponse(answer=self.template("greeting"), tone=TONE, actions=[]))
+        if set(words) <= FAREWELL_WORDS and FAREWELL_ANCHORS.intersection(words):
+            return Route("farewell", BrandResponse(answer=self.template("farewell"), tone=TONE, actions=[]))
+        return None
+
+    def match_order(self, user_input: str, message: str, words) -> Optional[Route]:
+        order_ids = extract_order_ids(message)
+        other_words = [w for w in words if w not in order_ids]
+        if not order_ids or len(other_words) > MAX_STATUS_WORDS or NOT_STATUS_RE.search(message):
+            return None
+        # Только номера или номера со словами про статус: "заказ 12345" без них может быть
+        # жалобой или правкой заказа ("в заказе 12345 не хватает товара") - это решает LLM
+        if other_words and not STATUS_RE.search(message):
+            return None
+        # Число рядом с другими словами может быть годом или телефоном ("распродажа 2025"):
+        # без явной пометки "заказ"/"№" отвечаем шаблоном только по найденному заказу
+        marked = not other_words or bool(ORDER_MARKER_RE.search(user_input.lower()))
+        if len(order_ids) > 1:
+            if not marked:
+                return None
+            return Route("order_statuses", BrandResponse(answer=get_order_statuses(order_ids), tone=TONE, actions=[]))
+        order_id = order_ids[0]
+        status = get_order_status(order_id)
+        if status:
+            return Route("order_status", BrandResponse(answer=status, tone=TONE, actions=[]))
+        if not marked:
+            return None
+        answer = self.template("order_not_found", order_id=order_id)
+        return Route("order_not_found", BrandResponse(
+            answer=answer, tone=TONE, actions=["Проверьте номер заказа", "Отправьте номер ещё раз"]
+        ))
+
+    def match_faq(self, message: str) -> Optional[Route]:
+        faq = get_faq_state()
+        hits = faq.retriever.search(message, k=1, min_score=self.faq_threshold)
+        if not hits:
+            return None
+        item = faq.data[hits[0][0]]
+        question = normalize_text(item["q"])
+        if len(question) < self.faq_coverage * len(message):
+            return None
+        stems = {word[:STEM_LEN] for word in question.split()}
+        if any(word[:STEM_LEN] not in stems for word in message.split() if len(word) > 2):
+            return None
+        return Route("faq", BrandResponse(answer=item["a"], tone=TONE, actions=[]))
+
+    def route(self, user_input: str) -> Optional[Route]:
+        message = normalize_text(user_input)
+        words = message.split()
+        return self.match_small_talk(words) or self.match_order(user_input, message, words) or self.match_faq(message)
+
+    def record(self, route: Optional[Route], elapsed: float):
+        """Учёт хода: elapsed - время маршрутизатора (если ответил он) или вызова цепочки"""
+        with self.lock:
+            self.total += 1
+            if route is None:
+                self.llm_calls += 1
+                self.llm_time += elapsed
+                return
+            self.intents[route.intent] += 1
+            # Экономия оценивается по среднему времени ответа цепочки на момент хода
+            if self.llm_calls:
+                self.saved += max(self.llm_time / self.llm_calls - elapsed, 0.0)
+
+    def stats(self) -> dict:
+        with self.lock:
+            routed = sum(self.intents.values())
+            return {
+                "routed": routed,
+                "total": self.total,
+                "hit_rate": round(routed / self.total, 3) if self.total else 0.0,
+                "intents": dict(self.intents),
+                "latency_saved_s": round(self.saved, 3),
+            }
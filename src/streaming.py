@@ -0,0 +1,30 @@
+import time
+from typing import Callable, Optional
+
+
+class StreamTimer:
+    """
+    Обёртка над on_delta для потоковых ответов: пропускает фрагменты дальше
+    и замеряет время до первого фрагмента (TTFT) и полное время ответа.
+    """
+
+    def __init__(self, on_delta: Optional[Callable[[str], None]] = None):
+        self.on_delta = on_delta
+        self.started = time.perf_counter()
+        self.first: Optional[float] = None
+
+    def __call__(self, text: str):
+        if not text:
+            return
+        if self.first is None:
+            self.first = time.perf_counter()
+        if self.on_delta is not None:
+            self.on_delta(text)
+
+    def timing(self) -> dict:
+        now = time.perf_counter()
+        first = self.first if self.first is not None else now
+        return {
+            "ttft_ms": round((first - self.started) * 1000, 1),
+            "latency_ms": round((now - self.started) * 1000, 1),
+        }
@@ -1,90 +1,695 @@
 import os
+import sys
 import json
+import math
+import time
+import uuid
+import hashlib
 import pathlib
-import re
-import statistics
-from typing import List
-from dotenv import load_dotenv
+import asyncio
+import argparse
+from collections import Counter
+from typing import Dict, List, Optional, Tuple, Union
 from pydantic import BaseModel, Field
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
-from brand_chain import ask, STYLE, BASE
+from brand_chain import (
+    ask, aask, create_faq_contexts, get_llm, get_response_cache, lazy, load_env, load_style_guide, track_usage, warmup, BASE,
+)
+from response_cache import ResponseCache, make_cache_key
+from usage_report import estimate_cost, load_prices
+# Простые проверки до LLM
+from style_rules import rule_checks
 
-load_dotenv(BASE / ".env", override=True)
 REPORTS = BASE / "reports"
 REPORTS.mkdir(exist_ok=True)
+REPORT_FILE = REPORTS / "style_eval.json"
+# Результаты пишутся сюда по мере готовности, итоговый JSON собирается из этого файла
+RESULTS_FILE = REPORTS / "style_eval.jsonl"
+# Изменения баллов относительно прошлого отчёта
+DIFF_FILE = REPORTS / "style_eval_diff.json"
+# Ответы и оценки между запусками: ключ - хэш всего, от чего они зависят, поэтому
+# пересчитываются только промпты, для которых что-то изменилось
+DEFAULT_CACHE_PATH = "data/style_eval_cache.sqlite"
 
-# Простые проверки до LLM
-def rule_checks(text: str) -> int:
-    score = 100
-    # 1) Без эмодзи
-    if re.search(r"[\U0001F300-\U0001FAFF]", text):
-        score -= 20
-    # 2) Без крика!!!
-    if "!!!" in text:
-        score -= 10
-    # 3) Длина
-    if len(text) > 600:
-        score -= 10
-    return max(score, 0)
+# Этапы обработки промпта: генерация ответа и его оценка; по каждому в отчёте время и токены
+STAGES = ("gen", "grade")
+PERCENTILES = (50, 95, 99)
+TOKEN_FIELDS = ("prompt_tokens", "completion_tokens", "cached_tokens")
 
 # LLM-оценка
 class Grade(BaseModel):
     score: int = Field(..., ge=0, le=100)
     notes: str
 
-LLM = ChatOpenAI(model=os.getenv("OPENAI_MODEL","gpt-4o-mini"), temperature=0)
+# Пакетная оценка: несколько ответов в одном запросе, оценки привязаны к номерам ответов
+class ItemGrade(Grade):
+    id: int
+
+class BatchGrade(BaseModel):
+    grades: List[ItemGrade]
+
+# Ответов в одном запросе на оценку; 1 - каждый ответ отдельным запросом
+GRADE_BATCH_SIZE = int(os.getenv("GRADE_BATCH_SIZE", "1"))
+# Сколько неполная пачка ждёт новых ответов в асинхронном режиме, секунды
+GRADE_LINGER = 1.0
+
+# Модель-оценщик и промпт создаются при первой оценке, а не при импорте
+@lazy
+def get_grade_llm():
+    from langchain_openai import ChatOpenAI
+    
+    load_env()
+    return ChatOpenAI(model=os.getenv("OPENAI_MODEL","gpt-4o-mini"), temperature=0)
+
+GRADE_HUMAN_TEMPLATE = "Ответ ассистента:\n{answer}\n\nДай целочисленный score 0..100 и краткие заметки почему."
+BATCH_GRADE_HUMAN_TEMPLATE = (
+    "Ответы ассистента, у каждого свой id:\n\n{answers}\n\n"
+    "Оцени каждый ответ отдельно, независимо от остальных: для каждого id дай "
+    "целочисленный score 0..100 и краткие заметки почему. Ровно одна оценка на каждый id."
+)
 
-GRADE_PROMPT = ChatPromptTemplate.from_messages([
-    ("system", f"Ты — строгий ревьюер соответствия голосу бренда {STYLE['brand']}"),
-    ("system", f"Тон: {STYLE['tone']['persona']}. Избегай: {', '.join(STYLE['tone']['avoid'])}. "
-               f"Обязательно: {', '.join(STYLE['tone']['must_include'])}."),
-    ("human", "Ответ ассистента:\n{answer}\n\nДай целочисленный score 0..100 и краткие заметки почему.")
-])
+def grade_system_messages() -> List[Tuple[str, str]]:
+    """Общие системные сообщения одиночной и пакетной оценки"""
+    style = load_style_guide()
+    return [
+        ("system", f"Ты — строгий ревьюер соответствия голосу бренда {style['brand']}"),
+        ("system", f"Тон: {style['tone']['persona']}. Избегай: {', '.join(style['tone']['avoid'])}. "
+                   f"Обязательно: {', '.join(style['tone']['must_include'])}."),
+    ]
+
+@lazy
+def get_grade_prompt():
+    from langchain_core.prompts import ChatPromptTemplate
+    
+    return ChatPromptTemplate.from_messages(grade_system_messages() + [
+        ("human", GRADE_HUMAN_TEMPLATE)
+    ])
+
+@lazy
+def get_batch_grade_prompt():
+    from langchain_core.prompts import ChatPromptTemplate
+    
+    return ChatPromptTemplate.from_messages(grade_system_messages() + [
+        ("human", BATCH_GRADE_HUMAN_TEMPLATE)
+    ])
+
+@lazy
+def get_grader():
+    return get_grade_prompt() | get_grade_llm().with_structured_output(Grade)
+
+@lazy
+def get_batch_grader():
+    return get_batch_grade_prompt() | get_grade_llm().with_structured_output(BatchGrade)
+
+# Версия оценщика: хэш системных сообщений, шаблонов запроса и модели (участвует в ключе кэша оценок)
+@lazy
+def get_grade_version() -> str:
+    llm = get_grade_llm()
+    raw = json.dumps([grade_system_messages(), GRADE_HUMAN_TEMPLATE, BATCH_GRADE_HUMAN_TEMPLATE,
+                      llm.model_name, llm.temperature], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:12]
+
+def open_eval_cache() -> ResponseCache:
+    """Кэш ответов и оценок между запусками: STYLE_EVAL_CACHE_PATH, STYLE_EVAL_CACHE_SIZE, STYLE_EVAL_CACHE_TTL"""
+    load_env()
+    return ResponseCache(
+        max_size=int(os.getenv("STYLE_EVAL_CACHE_SIZE", "10000")),
+        ttl=float(os.getenv("STYLE_EVAL_CACHE_TTL", str(30 * 24 * 3600))),
+        path=os.getenv("STYLE_EVAL_CACHE_PATH", str(BASE / DEFAULT_CACHE_PATH)) or None,
+    )
+
+# Оценка зависит только от текста ответа и версии оценщика; текст не нормализуется,
+# потому что регистр и знаки препинания влияют на балл
+def grade_key(text: str) -> str:
+    return make_cache_key("", answer=text, grade_version=get_grade_version())
+
+def cached_grade(text: str) -> Optional[Grade]:
+    value = get_response_cache().get(grade_key(text))
+    return Grade(**value) if value is not None else None
+
+def store_grade(text: str, g: Grade, latency: float = 0.0):
+    get_response_cache().set(grade_key(text), g.model_dump(), latency)
 
 def llm_grade(text: str) -> Grade:
-    parser = LLM.with_structured_output(Grade)
-    return (GRADE_PROMPT | parser).invoke({"answer": text})
+    return get_grader().invoke({"answer": text})
+
+async def allm_grade(text: str) -> Grade:
+    return await get_grader().ainvoke({"answer": text})
 
-def eval_batch(prompts: List[str]) -> dict:
-    results = []
-    for p in prompts:
+def format_answers(texts: List[str]) -> str:
+    return "\n\n".join(f"[id={i}]\n{text}" for i, text in enumerate(texts, 1))
+
+def check_batch(result: BatchGrade, size: int) -> List[Grade]:
+    """Оценки в порядке ответов; ValueError, если id пропущены, повторяются или лишние"""
+    by_id: Dict[int, Grade] = {}
+    for g in result.grades:
+        if g.id in by_id or not 1 <= g.id <= size:
+            raise ValueError(f"неверный id оценки: {g.id}")
+        by_id[g.id] = Grade(score=g.score, notes=g.notes)
+    if len(by_id) != size:
+        raise ValueError(f"оценок {len(by_id)} из {size}")
+    return [by_id[i] for i in range(1, size + 1)]
+
+def llm_grade_batch(texts: List[str]) -> List[Union[Grade, Exception]]:
+    """
+    Оценка нескольких ответов одним запросом. Если запрос упал или оценки не сходятся
+    с ответами, пачка делится пополам и каждая половина оценивается заново; одиночный
+    ответ оценивается через llm_grade, и его ошибка возвращается на месте оценки
+    """
+    if len(texts) <= 1:
         try:
-            reply = ask(p)
-            rule = rule_checks(reply.answer)
-            g = llm_grade(reply.answer)
-            final = int(0.4 * rule + 0.6 * g.score)
-            results.append({
-                "prompt": p,
-                "answer": reply.answer,
-                "actions": reply.actions,
-                "tone_model": reply.tone,
-                "rule_score": rule,
-                "llm_score": g.score,
-                "final": final,
-                "notes": g.notes
-            })
+            return [llm_grade(text) for text in texts]
         except Exception as e:
-            print(f"Ошибка при обработке запроса '{p}': {e}")
-            results.append({
-                "prompt": p,
-                "error": str(e),
-                "final": 0
-            })
-    
-    # Фильтруем результаты без ошибок для вычисления среднего
-    valid_results = [r for r in results if "error" not in r]
-    if valid_results:
-        mean_final = round(statistics.mean(r["final"] for r in valid_results), 2)
-    else:
-        mean_final = 0
-    
-    out = {"mean_final": mean_final, "items": results}
-    (REPORTS / "style_eval.json").write_text(json.dumps(out, ensure_ascii=False, indent=2), encoding="utf-8")
-    return out
+            return [e]
+    try:
+        return check_batch(get_batch_grader().invoke({"answers": format_answers(texts)}), len(texts))
+    except Exception as e:
+        print(f"Пачка из {len(texts)} ответов не оценена ({str(e) or type(e).__name__}), делим пополам")
+    mid = len(texts) // 2
+    return llm_grade_batch(texts[:mid]) + llm_grade_batch(texts[mid:])
 
-if __name__ == "__main__":
+async def allm_grade_batch(texts: List[str], timeout: Optional[float] = None) -> List[Union[Grade, Exception]]:
+    """Асинхронная llm_grade_batch: timeout - на каждый запрос, половины пачки оцениваются параллельно"""
+    if len(texts) <= 1:
+        try:
+            return [await asyncio.wait_for(allm_grade(text), timeout) for text in texts]
+        except Exception as e:
+            return [e]
+    try:
+        result = await asyncio.wait_for(get_batch_grader().ainvoke({"answers": format_answers(texts)}), timeout)
+        return check_batch(result, len(texts))
+    except Exception as e:
+        print(f"Пачка из {len(texts)} ответов не оценена ({str(e) or type(e).__name__}), делим пополам")
+    mid = len(texts) // 2
+    first, second = await asyncio.gather(allm_grade_batch(texts[:mid], timeout), allm_grade_batch(texts[mid:], timeout))
+    return first + second
+
+def call_stats(started: float, usage: dict, cached: bool = False, share: int = 1) -> dict:
+    """
+    Время и токены одного этапа: cached - результат взят из кэша без вызова модели,
+    share - на сколько ответов делится запрос (токены пачки делятся поровну). У пачки
+    есть batch - id запроса, по которому в сводке он считается одним вызовом с одним временем
+    """
+    stats = {"latency_ms": round((time.perf_counter() - started) * 1000, 1), "cached": cached}
+    if share > 1:
+        stats.update(batch=uuid.uuid4().hex[:12], batch_size=share)
+    for field in TOKEN_FIELDS:
+        stats[field] = round(usage.get(field, 0) / share)
+    return stats
+
+def item_latency(stats: dict) -> float:
+    """Время запроса в секундах, приходящееся на один ответ пачки (для кэша оценок)"""
+    return stats["latency_ms"] / 1000 / stats.get("batch_size", 1)
+
+def grade_answers(texts: List[str]) -> List[Tuple[Union[Grade, Exception], dict]]:
+    """Оценки из кэша, остальные - через llm_grade_batch; новые оценки сохраняются в кэш"""
+    results: List[Optional[tuple]] = []
+    for text in texts:
+        started = time.perf_counter()
+        g = cached_grade(text)
+        results.append((g, call_stats(started, {}, cached=True)) if g is not None else None)
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        started = time.perf_counter()
+        with track_usage() as usage:
+            fresh = llm_grade_batch([texts[i] for i in missing])
+        stats = call_stats(started, usage, share=len(missing))
+        for i, g in zip(missing, fresh):
+            results[i] = (g, stats)
+            if not isinstance(g, Exception):
+                store_grade(texts[i], g, item_latency(stats))
+    return results
+
+class GradeBatcher:
+    """
+    Сборщик ответов в пачки для allm_grade_batch в асинхронном режиме. Пачка уходит
+    на оценку, когда набралось batch_size ответов, когда новых ответов больше не будет
+    или через linger секунд после первого ответа неполной пачки.
+    """
+    
+    def __init__(self, total: int, batch_size: int, slots: asyncio.Semaphore,
+                 timeout: Optional[float] = None, linger: float = GRADE_LINGER):
+        self.remaining = total
+        self.batch_size = max(batch_size, 1)
+        self.slots = slots
+        self.timeout = timeout
+        self.linger = linger
+        self.pending: List[Tuple[str, asyncio.Future]] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.tasks = set()
+    
+    async def grade(self, text: str) -> Tuple[Grade, dict]:
+        """Оценка ответа и call_stats его пачки"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((text, future))
+        self.remaining -= 1
+        if len(self.pending) >= self.batch_size or self.remaining <= 0:
+            self.flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.linger, self.flush)
+        return await future
+    
+    def skip(self):
+        """Ответа для оценки не будет (ошибка генерации)"""
+        self.remaining -= 1
+        if self.remaining <= 0:
+            self.flush()
+    
+    def flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.pending = self.pending, []
+        if batch:
+            task = asyncio.ensure_future(self._grade(batch))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+    
+    async def _grade(self, batch: List[Tuple[str, asyncio.Future]]):
+        try:
+            async with self.slots:
+                started = time.perf_counter()
+                with track_usage() as usage:
+                    grades = await allm_grade_batch([text for text, _ in batch], self.timeout)
+            stats = call_stats(started, usage, share=len(batch))
+        except Exception as e:
+            grades = [e] * len(batch)
+        for (_, future), g in zip(batch, grades):
+            if future.done():
+                continue
+            if isinstance(g, Exception):
+                future.set_exception(g)
+            else:
+                future.set_result((g, stats))
+
+# Цены моделей для оценки стоимости ($ за 1M токенов, см. usage_report.PRICES)
+get_prices = lazy(lambda: load_prices(None))
+
+def stage_cost(model: str, stats: dict) -> Optional[float]:
+    return estimate_cost(model, Counter({field: stats[field] for field in TOKEN_FIELDS}), get_prices())
+
+def make_item(p: str, reply, g: Grade, gen: Optional[dict] = None, grade: Optional[dict] = None) -> dict:
+    """Элемент отчёта; gen и grade - call_stats генерации и оценки"""
+    rule = rule_checks(reply.answer)
+    final = int(0.4 * rule + 0.6 * g.score)
+    item = {
+        "prompt": p,
+        "answer": reply.answer,
+        "actions": reply.actions,
+        "tone_model": reply.tone,
+        "rule_score": rule,
+        "llm_score": g.score,
+        "final": final,
+        "notes": g.notes
+    }
+    if gen is not None and grade is not None:
+        costs = [stage_cost(get_llm().model_name, gen), stage_cost(get_grade_llm().model_name, grade)]
+        item.update(gen=gen, grade=grade, cost_usd=None if None in costs else round(sum(costs), 6))
+    return item
+
+def make_error_item(p: str, e: Exception) -> dict:
+    print(f"Ошибка при обработке запроса '{p}': {e}")
+    return {
+        "prompt": p,
+        "error": str(e) or type(e).__name__,
+        "final": 0
+    }
+
+class ResultStream:
+    """
+    Потоковая запись результатов в JSONL: каждая строка сбрасывается на диск сразу.
+    Результаты выпускаются в порядке промптов - готовые раньше времени ждут в буфере.
+    Среднее mean_final и сводка времени, токенов и стоимости по этапам считаются на лету,
+    включая результаты прошлого запуска при resume.
+    """
+    
+    def __init__(self, path: pathlib.Path = RESULTS_FILE, resume: bool = False):
+        self.path = path
+        self.done: Counter = Counter()
+        self.count = 0
+        self.valid = 0
+        self.final_sum = 0
+        # Время вызовов модели (без ответов из кэша), токены, число вызовов и попаданий в кэш по этапам
+        self.latencies: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+        self.tokens: Dict[str, Counter] = {stage: Counter() for stage in STAGES}
+        self.cost = 0.0
+        # Пачки оценки, уже учтённые как вызов
+        self.batches = set()
+        if resume and path.exists():
+            self._load(path)
+        self.file = open(path, "a" if resume else "w", encoding="utf-8")
+        self.buffer: Dict[int, dict] = {}
+        self.next_pos = 0
+    
+    def _load(self, path: pathlib.Path):
+        """
+        Результаты прошлого запуска. Недописанная последняя строка (запуск прервался
+        посреди записи) отбрасывается, и файл обрезается до последней целой строки
+        """
+        end = 0
+        with open(path, "rb") as f:
+            lines = f.readlines()
+        for n, line in enumerate(lines):
+            try:
+                item = json.loads(line) if line.strip() else None
+                if item is not None and not line.endswith(b"\n"):
+                    raise ValueError("строка не дописана")
+            except ValueError as e:
+                if n < len(lines) - 1:
+                    raise ValueError(f"{path}: битая строка {n + 1}: {e}") from e
+                print(f"{path}: последняя строка не дописана и отброшена")
+                with open(path, "r+b") as f:
+                    f.truncate(end)
+                return
+            end += len(line)
+            if item is not None:
+                self.done[item["prompt"]] += 1
+                self._account(item)
+    
+    def _account(self, item: dict):
+        self.count += 1
+        if "error" not in item:
+            self.valid += 1
+            self.final_sum += item["final"]
+            for stage in STAGES:
+                stats = item.get(stage)
+                if stats is None:
+                    continue
+                tokens = self.tokens[stage]
+                if stats["cached"]:
+                    tokens["cached_calls"] += 1
+                    continue
+                tokens.update({field: stats[field] for field in TOKEN_FIELDS})
+                # Ответы одной пачки - один вызов: время запроса учитывается один раз
+                batch = stats.get("batch")
+                if batch is not None:
+                    if batch in self.batches:
+                        continue
+                    self.batches.add(batch)
+                tokens["calls"] += 1
+                self.latencies[stage].append(stats["latency_ms"])
+            self.cost += item.get("cost_usd") or 0
+    
+    @property
+    def mean_final(self) -> float:
+        return round(self.final_sum / self.valid, 2) if self.valid else 0
+    
+    @property
+    def summary(self) -> dict:
+        """Перцентили времени вызовов и токены по этапам; средние токены - на вызов модели"""
+        result = {}
+        for stage in STAGES:
+            latencies, tokens = self.latencies[stage], self.tokens[stage]
+            calls = tokens["calls"]
+            latency = {f"p{p}": percentile(latencies, p) for p in PERCENTILES}
+            latency["total"] = round(sum(latencies), 1)
+            result[stage] = {
+                "calls": calls,
+                "cached": tokens["cached_calls"],
+                "latency_ms": latency,
+                **{field: tokens[field] for field in TOKEN_FIELDS},
+                "prompt_tokens_mean": round(tokens["prompt_tokens"] / calls, 1) if calls else None,
+                "completion_tokens_mean": round(tokens["completion_tokens"] / calls, 1) if calls else None,
+            }
+        result["cost_usd"] = round(self.cost, 6)
+        return result
+    
+    def pending(self, prompts: List[str]) -> List[str]:
+        """Промпты, которых ещё нет в файле результатов"""
+        seen = Counter()
+        todo = []
+        for p in prompts:
+            seen[p] += 1
+            if seen[p] > self.done[p]:
+                todo.append(p)
+        return todo
+    
+    def add(self, pos: int, item: dict):
+        """Добавление результата для pos-го промпта из pending()"""
+        self.buffer[pos] = item
+        while self.next_pos in self.buffer:
+            ready = self.buffer.pop(self.next_pos)
+            self.file.write(json.dumps(ready, ensure_ascii=False) + "\n")
+            self.file.flush()
+            self._account(ready)
+            self.next_pos += 1
+            print(f"[{self.count}] final={ready['final']} mean_final={self.mean_final}")
+    
+    def close(self):
+        self.file.close()
+
+def write_report(stream: ResultStream, report_path: pathlib.Path = REPORT_FILE) -> dict:
+    """Сборка итогового отчёта из JSONL за один потоковый проход (формат как у json.dumps(indent=2))"""
+    tmp_path = report_path.with_suffix(".json.tmp")
+    with open(stream.path, "r", encoding="utf-8") as src, open(tmp_path, "w", encoding="utf-8") as out:
+        summary = json.dumps(stream.summary, ensure_ascii=False, indent=2).replace("\n", "\n  ")
+        out.write('{\n  "mean_final": ' + json.dumps(stream.mean_final) + ',\n  "summary": ' + summary + ',\n  "items": [')
+        first = True
+        for line in src:
+            if not line.strip():
+                continue
+            item = json.dumps(json.loads(line), ensure_ascii=False, indent=2)
+            out.write(("\n" if first else ",\n") + "\n".join("    " + l for l in item.splitlines()))
+            first = False
+        out.write("]\n}" if first else "\n  ]\n}")
+    os.replace(tmp_path, report_path)
+    return {"mean_final": stream.mean_final, "count": stream.count, "summary": stream.summary}
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """Перцентиль по ближайшему рангу"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(math.ceil(p / 100 * len(ordered)) - 1, 0)]
+
+def load_report(report_path: pathlib.Path = REPORT_FILE) -> Optional[dict]:
+    try:
+        return json.loads(report_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+def diff_reports(old: dict, new: dict) -> dict:
+    """
+    Изменения баллов по промптам между прошлым и новым отчётом. Повторы одного промпта
+    сопоставляются по порядку; в items попадают только изменившиеся, новые и удалённые.
+    """
+    def keyed(report: dict) -> Dict[Tuple[str, int], dict]:
+        seen, items = Counter(), {}
+        for item in report.get("items", []):
+            items[(item["prompt"], seen[item["prompt"]])] = item
+            seen[item["prompt"]] += 1
+        return items
+    
+    before, after = keyed(old), keyed(new)
+    counts, items = Counter(), []
+    for key in list(after) + [key for key in before if key not in after]:
+        a, b = before.get(key), after.get(key)
+        if a is None:
+            status = "new"
+        elif b is None:
+            status = "removed"
+        else:
+            same = all(a.get(field) == b.get(field) for field in ("final", "rule_score", "llm_score", "error"))
+            status = "same" if same else "changed"
+        counts[status] += 1
+        if status == "same":
+            continue
+        entry = {"prompt": key[0], "status": status}
+        for field in ("final", "rule_score", "llm_score"):
+            entry[field] = [(a or {}).get(field), (b or {}).get(field)]
+        if a is not None and b is not None:
+            entry["delta"] = b["final"] - a["final"]
+        items.append(entry)
+    items.sort(key=lambda entry: -abs(entry.get("delta", 0)))
+    return {
+        "previous_mean_final": old.get("mean_final"),
+        "mean_final": new.get("mean_final"),
+        "delta": round(new.get("mean_final", 0) - (old.get("mean_final") or 0), 2),
+        **{status: counts[status] for status in ("same", "changed", "new", "removed")},
+        "items": items,
+    }
+
+def warmup_eval():
+    """Цепочка и оценщики создаются до первого замера, чтобы его время не включало инициализацию"""
+    warmup()
+    for init in (get_grader, get_batch_grader, get_grade_version):
+        init()
+
+def eval_batch(prompts: List[str], resume: bool = False, batch_size: int = GRADE_BATCH_SIZE) -> dict:
+    """Ответы генерируются по очереди, оценка - пачками по batch_size ответов"""
+    warmup_eval()
+    stream = ResultStream(RESULTS_FILE, resume)
+    batch_size = max(batch_size, 1)
+    try:
+        todo = stream.pending(prompts)
+        faq_contexts = create_faq_contexts(todo)
+        for start in range(0, len(todo), batch_size):
+            replies = {}
+            for pos in range(start, min(start + batch_size, len(todo))):
+                try:
+                    started = time.perf_counter()
+                    with track_usage() as usage:
+                        reply = ask(todo[pos], faq_context=faq_contexts[pos])
+                    # Без usage модель не вызывалась - ответ из кэша
+                    replies[pos] = reply, call_stats(started, usage, cached=not usage)
+                except Exception as e:
+                    stream.add(pos, make_error_item(todo[pos], e))
+            grades = grade_answers([reply.answer for reply, _ in replies.values()])
+            for (pos, (reply, gen)), (g, grade) in zip(replies.items(), grades):
+                if isinstance(g, Exception):
+                    stream.add(pos, make_error_item(todo[pos], g))
+                else:
+                    stream.add(pos, make_item(todo[pos], reply, g, gen, grade))
+    finally:
+        stream.close()
+    
+    return write_report(stream, REPORT_FILE)
+
+async def aeval_batch(prompts: List[str], concurrency: int = 8, timeout: float = 60, resume: bool = False,
+                      batch_size: int = GRADE_BATCH_SIZE) -> dict:
+    """
+    Асинхронная оценка: генерация и оценка идут через отдельные семафоры,
+    поэтому оценка ответа i выполняется параллельно с генерацией ответа i+1.
+    Готовые ответы собираются в пачки по batch_size для оценки одним запросом.
+    Порядок элементов отчёта совпадает с порядком промптов.
+    """
+    warmup_eval()
+    stream = ResultStream(RESULTS_FILE, resume)
+    answer_slots = asyncio.Semaphore(concurrency)
+    grade_slots = asyncio.Semaphore(concurrency)
+    
+    async def run_one(pos: int, p: str, faq_context: str):
+        try:
+            async with answer_slots:
+                started = time.perf_counter()
+                with track_usage() as usage:
+                    reply = await asyncio.wait_for(aask(p, faq_context=faq_context), timeout)
+            gen = call_stats(started, usage, cached=not usage)
+        except Exception as e:
+            batcher.skip()
+            stream.add(pos, make_error_item(p, e))
+            return
+        try:
+            started = time.perf_counter()
+            g = cached_grade(reply.answer)
+            if g is not None:
+                grade = call_stats(started, {}, cached=True)
+                batcher.skip()
+            else:
+                g, grade = await batcher.grade(reply.answer)
+                store_grade(reply.answer, g, item_latency(grade))
+            stream.add(pos, make_item(p, reply, g, gen, grade))
+        except Exception as e:
+            stream.add(pos, make_error_item(p, e))
+    
+    try:
+        todo = stream.pending(prompts)
+        batcher = GradeBatcher(len(todo), batch_size, grade_slots, timeout)
+        faq_contexts = create_faq_contexts(todo)
+        await asyncio.gather(*(run_one(pos, p, c) for pos, (p, c) in enumerate(zip(todo, faq_contexts))))
+    finally:
+        stream.close()
+    
+    return write_report(stream, REPORT_FILE)
+
+# Что проверяет --baseline: перцентили времени вызова модели и средние токены на вызов
+GATE_LATENCY = ("p50", "p95")
+GATE_TOKENS = ("prompt_tokens_mean", "completion_tokens_mean")
+
+def compare_summary(summary: dict, baseline: dict, latency_threshold: float, token_threshold: float) -> List[str]:
+    """Сравнение сводки с прошлым отчётом; возвращает показатели, выросшие больше порога"""
+    regressions = []
+    for stage in STAGES:
+        new, old = summary.get(stage) or {}, baseline.get(stage) or {}
+        checks = [(f"latency_ms.{p}", (new.get("latency_ms") or {}).get(p), (old.get("latency_ms") or {}).get(p),
+                   latency_threshold) for p in GATE_LATENCY]
+        checks += [(field, new.get(field), old.get(field), token_threshold) for field in GATE_TOKENS]
+        for name, value, base, threshold in checks:
+            # Нет вызовов модели на этапе (всё из кэша) - сравнивать нечего
+            if value is None or not base:
+                continue
+            ratio = value / base
+            mark = ""
+            if ratio > threshold:
+                mark = "  <- регрессия"
+                regressions.append(f"{stage}.{name}")
+            print(f"  {stage:<6} {name:<24} {base:>10} -> {value:>10}  x{ratio:.2f}{mark}")
+    return regressions
+
+def format_summary(summary: dict) -> str:
+    lines = []
+    for stage in STAGES:
+        stats = summary[stage]
+        latency = stats["latency_ms"]
+        lines.append(
+            f"  {stage:<6} вызовов {stats['calls']} (из кэша {stats['cached']}), "
+            + ", ".join(f"{p} {latency[p] if latency[p] is not None else '-'} мс" for p in latency if p != "total")
+            + f", токены {stats['prompt_tokens']} + {stats['completion_tokens']}"
+        )
+    lines.append(f"  стоимость ${summary['cost_usd']}")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Автооценка стиля ответов бота")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="Асинхронный режим с параллельными запросами к LLM")
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="Максимум одновременных запросов на каждом этапе (генерация, оценка)")
+    parser.add_argument("--timeout", type=float, default=60,
+                        help="Таймаут одного запроса к LLM в секундах (асинхронный режим)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Продолжить прерванный прогон: пропустить промпты, уже записанные в style_eval.jsonl")
+    parser.add_argument("--grade-batch-size", type=int, default=GRADE_BATCH_SIZE,
+                        help="Ответов в одном запросе на оценку (GRADE_BATCH_SIZE, по умолчанию 1 - по одному)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Пересчитать все ответы и оценки, не читая и не пополняя кэш между запусками")
+    parser.add_argument("--prices", help="JSON с ценами моделей, $ за 1M токенов (как в usage_report.py)")
+    parser.add_argument("--baseline", help="Прошлый отчёт style_eval.json: выход с кодом 1 при регрессии времени или токенов")
+    parser.add_argument("--latency-threshold", type=float, default=1.25,
+                        help="Рост p50/p95 времени вызова, который считается регрессией")
+    parser.add_argument("--token-threshold", type=float, default=1.1,
+                        help="Рост средних токенов на вызов, который считается регрессией")
+    args = parser.parse_args()
+    
+    baseline = None
+    if args.baseline:
+        baseline = (load_report(pathlib.Path(args.baseline)) or {}).get("summary")
+        if baseline is None:
+            parser.error(f"в {args.baseline} нет сводки summary")
+    if args.prices:
+        get_prices.set(load_prices(args.prices))
     eval_prompts = (BASE / "data/eval_prompts.txt").read_text(encoding="utf-8").strip().splitlines()
-    report = eval_batch(eval_prompts)
+    previous = load_report(REPORT_FILE)
+    cache = ResponseCache(max_size=0) if args.no_cache else open_eval_cache()
+    get_response_cache.set(cache)
+    try:
+        if args.use_async:
+            report = asyncio.run(aeval_batch(eval_prompts, args.concurrency, args.timeout, args.resume,
+                                             args.grade_batch_size))
+        else:
+            report = eval_batch(eval_prompts, args.resume, args.grade_batch_size)
+    finally:
+        cache.close()
     print("Средний балл:", report["mean_final"])
-    print("Отчёт:", REPORTS / "style_eval.json")
\ No newline at end of file
+    print(format_summary(report["summary"]))
+    print("Отчёт:", REPORT_FILE)
+    
+    if previous is not None:
+        diff = diff_reports(previous, load_report(REPORT_FILE) or {})
+        DIFF_FILE.write_text(json.dumps(diff, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"Относительно прошлого отчёта: mean_final {diff['previous_mean_final']} -> {diff['mean_final']} "
+              f"({diff['delta']:+}), изменилось {diff['changed']}, новых {diff['new']}, удалено {diff['removed']}")
+        for entry in diff["items"]:
+            old, new = entry["final"]
+            print(f"  {entry['status']:<8} final {old} -> {new}  {entry['prompt']}")
+        print("Изменения:", DIFF_FILE)
+    
+    if baseline is not None:
+        print(f"Сравнение с {args.baseline} (порог времени {args.latency_threshold}x, токенов {args.token_threshold}x):")
+        regressions = compare_summary(report["summary"], baseline, args.latency_threshold, args.token_threshold)
+        if regressions:
+            print(f"Регрессий: {len(regressions)} ({', '.join(regressions)})")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
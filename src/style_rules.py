@@ -0,0 +1,34 @@
+import re
+from typing import Tuple
+
+# Простые проверки голоса бренда без LLM; шаблоны компилируются один раз при импорте
+EMOJI_RE = re.compile(r"[\U0001F300-\U0001FAFF]")
+SHOUT = "!!!"
+MAX_LENGTH = 600
+EMOJI_PENALTY = 20
+SHOUT_PENALTY = 10
+LENGTH_PENALTY = 10
+
+
+def rule_violations(text: str) -> Tuple[bool, bool, bool]:
+    """Нарушения: (эмодзи, крик!!!, слишком длинный ответ)"""
+    return EMOJI_RE.search(text) is not None, SHOUT in text, len(text) > MAX_LENGTH
+
+
+def violations_score(emoji: bool, shout: bool, too_long: bool) -> int:
+    """Балл 0..100 по результату rule_violations"""
+    score = 100
+    # 1) Без эмодзи
+    if emoji:
+        score -= EMOJI_PENALTY
+    # 2) Без крика!!!
+    if shout:
+        score -= SHOUT_PENALTY
+    # 3) Длина
+    if too_long:
+        score -= LENGTH_PENALTY
+    return max(score, 0)
+
+
+def rule_checks(text: str) -> int:
+    return violations_score(*rule_violations(text))
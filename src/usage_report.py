@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Аналитика расхода по логам сессий logs/session_*.jsonl: токены, оценка стоимости,
+число реплик на сессию, доля ответов без LLM (FAQ, шаблоны, кэш) и перцентили задержки
+по каждой паре модель + версия промпта.
+
+Файлы читаются построчно в пуле процессов; задержки копятся в логарифмических корзинах
+(погрешность перцентиля до 5%), поэтому память не зависит от объёма логов.
+
+Запуск из корня проекта:
+    python src/usage_report.py [--logs logs] [--workers 4] [--prices prices.json] [--out reports/usage_report.json]
+"""
+
+import os
+import json
+import glob
+import math
+import argparse
+import pathlib
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+try:
+    from .log_rescore import map_bounded
+except ImportError:
+    from log_rescore import map_bounded
+
+BASE = pathlib.Path(__file__).parent.parent.resolve()
+OUT_FILE = BASE / "reports" / "usage_report.json"
+
+# Цены, $ за 1M токенов: вход, вход из кэша префикса, выход
+PRICES = {
+    "gpt-4o-mini": {"input": 0.15, "cached_input": 0.075, "output": 0.60},
+    "gpt-4o": {"input": 2.50, "cached_input": 1.25, "output": 10.00},
+}
+# Шаг корзин задержки: соседние границы отличаются на 5%
+BUCKET_BASE = 1.05
+PERCENTILES = (50, 90, 95, 99)
+SOURCES = ("llm", "cache", "faq", "template", "command", "error")
+TOKEN_FIELDS = ("prompt_tokens", "completion_tokens", "cached_tokens", "total_tokens")
+ERROR_PREFIXES = ("Ошибка:", "Извините, произошла ошибка", "Извините, ответ занимает")
+
+
+def classify(entry: dict, usage: dict) -> str:
+    """Кто ответил: модель, кэш ответов, FAQ, шаблон маршрутизатора, команда или ошибка"""
+    if str(entry.get("bot_response", "")).startswith(ERROR_PREFIXES):
+        return "error"
+    route = usage.get("route")
+    if route:
+        return "faq" if route == "faq" else "template"
+    if "prompt_tokens" in usage:
+        return "llm"
+    # Ответ цепочки без расхода токенов и cache_hit бота на OpenAI - из кэша ответов
+    if usage.get("cache_hit") or "structured_response" in usage:
+        return "cache"
+    # Без usage бот на OpenAI отвечает на команды и по FAQ
+    return "command" if str(entry.get("user_message", "")).startswith("/") else "faq"
+
+
+def bucket(ms: float) -> int:
+    return math.ceil(math.log(ms, BUCKET_BASE)) if ms > 1 else 0
+
+
+def percentiles(histogram: Counter, points=PERCENTILES) -> Dict[str, Optional[float]]:
+    """Перцентили по корзинам; значение - верхняя граница корзины"""
+    total = sum(histogram.values())
+    result = {f"p{p}": None for p in points}
+    if not total:
+        return result
+    items = sorted(histogram.items())
+    for p in points:
+        rank, seen = math.ceil(total * p / 100), 0
+        for key, count in items:
+            seen += count
+            if seen >= rank:
+                result[f"p{p}"] = round(BUCKET_BASE ** key, 1)
+                break
+    return result
+
+
+def new_group() -> dict:
+    return {
+        "turns": 0,
+        "sessions": 0,
+        "sources": Counter(),
+        "tokens": Counter(),
+        "latency": Counter(),
+        "ttft": Counter(),
+        "session_turns": Counter(),
+    }
+
+
+def scan_file(path: str) -> Dict[Tuple[str, str], dict]:
+    """Агрегаты одного файла по (модель, версия промпта); выполняется в процессе пула"""
+    groups: Dict[Tuple[str, str], dict] = {}
+    # Сессия сервера - session_id, сессия консольного бота - весь файл
+    sessions = Counter()
+    with open(path, "rb") as f:
+        for line in f:
+            if b'"bot_response"' not in line:
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            usage = entry.get("usage") or {}
+            key = (
+                entry.get("model") or usage.get("model") or "unknown",
+                entry.get("prompt_version") or "-",
+            )
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = new_group()
+            group["turns"] += 1
+            group["sources"][classify(entry, usage)] += 1
+            for field in TOKEN_FIELDS:
+                group["tokens"][field] += usage.get(field) or 0
+            timing = entry.get("timing") or {}
+            if timing.get("latency_ms") is not None:
+                group["latency"][bucket(timing["latency_ms"])] += 1
+            if timing.get("ttft_ms") is not None:
+                group["ttft"][bucket(timing["ttft_ms"])] += 1
+            sessions[(key, entry.get("session_id"))] += 1
+    for (key, _), turns in sessions.items():
+        groups[key]["sessions"] += 1
+        groups[key]["session_turns"][turns] += 1
+    return groups
+
+
+def merge(total: Dict[Tuple[str, str], dict], part: Dict[Tuple[str, str], dict]):
+    for key, stats in part.items():
+        acc = total.get(key)
+        if acc is None:
+            total[key] = stats
+            continue
+        for name, value in stats.items():
+            acc[name] += value
+
+
+def load_prices(path: Optional[str]) -> dict:
+    """Цены по умолчанию, дополненные JSON-файлом {"модель": {"input": ..., "cached_input": ..., "output": ...}}"""
+    prices = {model: dict(price) for model, price in PRICES.items()}
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            prices.update(json.load(f))
+    return prices
+
+
+def estimate_cost(model: str, tokens: Counter, prices: dict) -> Optional[float]:
+    price = prices.get(model)
+    if price is None:
+        return None
+    cached = tokens["cached_tokens"]
+    cost = ((tokens["prompt_tokens"] - cached) * price["input"]
+            + cached * price.get("cached_input", price["input"])
+            + tokens["completion_tokens"] * price["output"])
+    return round(cost / 1_000_000, 6)
+
+
+def make_report(total: Dict[Tuple[str, str], dict], prices: dict, files: int) -> dict:
+    groups = []
+    for (model, prompt_version), stats in sorted(total.items(), key=lambda item: -item[1]["turns"]):
+        turns = stats["turns"]
+        groups.append({
+            "model": model,
+            "prompt_version": prompt_version,
+            "turns": turns,
+            "sessions": stats["sessions"],
+            "turns_per_session": {
+                "mean": round(turns / stats["sessions"], 2) if stats["sessions"] else 0,
+                **percentiles(stats["session_turns"], (50, 90)),
+            },
+            "sources": {source: stats["sources"][source] for source in SOURCES},
+            "llm_share": round(stats["sources"]["llm"] / turns, 4) if turns else 0,
+            "faq_share": round(stats["sources"]["faq"] / turns, 4) if turns else 0,
+            "tokens": {field: stats["tokens"][field] for field in TOKEN_FIELDS},
+            "cost_usd": estimate_cost(model, stats["tokens"], prices),
+            "latency_ms": percentiles(stats["latency"]),
+            "ttft_ms": percentiles(stats["ttft"]),
+        })
+    return {
+        "files": files,
+        "turns": sum(g["turns"] for g in groups),
+        "sessions": sum(g["sessions"] for g in groups),
+        "total_tokens": sum(g["tokens"]["total_tokens"] for g in groups),
+        "cost_usd": round(sum(g["cost_usd"] or 0 for g in groups), 6),
+        "unpriced_models": sorted({g["model"] for g in groups if g["cost_usd"] is None}),
+        "groups": groups,
+    }
+
+
+def format_table(report: dict) -> str:
+    header = (f"{'model':<14} {'prompt':<14} {'turns':>8} {'sess':>7} {'t/sess':>6} {'llm%':>6} "
+              f"{'faq%':>6} {'tokens':>12} {'cost $':>10} {'p50 ms':>8} {'p95 ms':>8}")
+    lines = [header, "-" * len(header)]
+
+    def number(value, spec):
+        return "-" if value is None else format(value, spec)
+
+    for g in report["groups"]:
+        lines.append(
+            f"{g['model'][:14]:<14} {g['prompt_version'][:14]:<14} {g['turns']:>8} {g['sessions']:>7} "
+            f"{g['turns_per_session']['mean']:>6.1f} {g['llm_share'] * 100:>6.1f} {g['faq_share'] * 100:>6.1f} "
+            f"{g['tokens']['total_tokens']:>12} {number(g['cost_usd'], '>10.4f')} "
+            f"{number(g['latency_ms']['p50'], '>8.0f')} {number(g['latency_ms']['p95'], '>8.0f')}"
+        )
+    lines.append(f"Итого: файлов {report['files']}, реплик {report['turns']}, сессий {report['sessions']}, "
+                 f"токенов {report['total_tokens']}, стоимость ${report['cost_usd']:.4f}")
+    if report["unpriced_models"]:
+        lines.append(f"Нет цены для моделей: {', '.join(report['unpriced_models'])} (см. --prices)")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Расход токенов, стоимость и задержки по логам сессий")
+    parser.add_argument("--logs", default=str(BASE / "logs"), help="Каталог с логами session_*.jsonl")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Число процессов")
+    parser.add_argument("--prices", help="JSON-файл с ценами моделей, $ за 1M токенов")
+    parser.add_argument("--out", default=str(OUT_FILE), help="Файл отчёта")
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.logs, "session_*.jsonl")))
+    total: Dict[Tuple[str, str], dict] = {}
+    for part in map_bounded(scan_file, paths, args.workers):
+        merge(total, part)
+    report = make_report(total, load_prices(args.prices), len(paths))
+
+    out = pathlib.Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(format_table(report))
+    print(f"Отчёт: {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import pathlib
+import contextlib
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, TextIO
+
+try:
+    from .faq_index import normalize_text
+    from .response_cache import ResponseCache, make_cache_key
+    from .llm_client import LLMSettings
+except ImportError:
+    from faq_index import normalize_text
+    from response_cache import ResponseCache, make_cache_key
+    from llm_client import LLMSettings
+
+# Пакетный режим скриптов погоды: города из файла или stdin, без повторов, параллельно
+# не больше concurrency запросов к модели; результаты в порядке ввода (JSONL) и в кэше
+# с TTL на диске, поэтому повторное обновление в пределах TTL не вызывает модель.
+BASE = pathlib.Path(__file__).parent.parent.resolve()
+# Путь от корня проекта, а не от текущего каталога: кэш один при запуске из любого места
+DEFAULT_CACHE_PATH = BASE / "data" / "weather_cache.sqlite"
+
+
+def open_weather_cache(ttl: Optional[float] = None) -> ResponseCache:
+    """Кэш результатов по городам: WEATHER_CACHE_TTL (секунды), WEATHER_CACHE_SIZE, WEATHER_CACHE_PATH"""
+    return ResponseCache(
+        max_size=int(os.getenv("WEATHER_CACHE_SIZE", "4096")),
+        ttl=ttl if ttl is not None else float(os.getenv("WEATHER_CACHE_TTL", "600")),
+        path=os.getenv("WEATHER_CACHE_PATH", str(DEFAULT_CACHE_PATH)) or None,
+    )
+
+
+def read_cities(lines: Iterable[str]) -> List[str]:
+    """Города по одному в строке; пустые строки и строки с # пропускаются"""
+    cities = []
+    for line in lines:
+        city = " ".join(line.split())
+        if city and not city.startswith("#"):
+            cities.append(city)
+    return cities
+
+
+def unique_cities(cities: Iterable[str]) -> List[str]:
+    """Без повторов с точностью до регистра, ё/е, пробелов и вариантов дефиса; порядок - по первому вхождению"""
+    seen, result = set(), []
+    for city in cities:
+        key = normalize_text(city)
+        if key and key not in seen:
+            seen.add(key)
+            result.append(city)
+    return result
+
+
+async def fetch_weather(cities: List[str], fetch: Callable[[str], Awaitable[str]], cache: ResponseCache,
+                        concurrency: int = 8, **key_parts):
+    """
+    Результаты по городам в порядке cities: каждый город запрашивается в своей задаче,
+    одновременно не больше concurrency запросов; ответы без ошибки попадают в кэш
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(city: str) -> dict:
+        key = make_cache_key(city, **key_parts)
+        cached = cache.get(key)
+        if cached is not None:
+            return {"query": city, **cached, "cached": True}
+        async with semaphore:
+            started = time.perf_counter()
+            result = json.loads(await fetch(city))
+        if "error" not in result:
+            cache.set(key, result, time.perf_counter() - started)
+        return {"query": city, **result, "cached": False}
+
+    tasks = [asyncio.create_task(one(city)) for city in cities]
+    try:
+        for task in tasks:
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def run_batch(cities: List[str], output: TextIO, fetch: Callable[[str], Awaitable[str]],
+                    cache: ResponseCache, concurrency: int = 8, **key_parts) -> Dict[str, int]:
+    """Записать результаты строками JSONL по мере готовности префикса; возвращает счётчики"""
+    counts = {"cities": len(cities), "cached": 0, "errors": 0}
+    async for result in fetch_weather(cities, fetch, cache, concurrency, **key_parts):
+        counts["cached"] += result["cached"]
+        counts["errors"] += "error" in result
+        output.write(json.dumps(result, ensure_ascii=False) + "\n")
+        output.flush()
+    return counts
+
+
+def add_batch_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--batch", metavar="FILE", help="Файл со списком городов, по одному в строке (- - stdin)")
+    parser.add_argument("--output", default="-", help="Файл JSONL с результатами (по умолчанию stdout)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Одновременных запросов к модели")
+    parser.add_argument("--ttl", type=float, help="Время жизни результата в кэше, секунды (WEATHER_CACHE_TTL)")
+
+
+def batch_main(args: argparse.Namespace, fetch: Callable[[str], Awaitable[str]], source: str):
+    """Пакетный режим скрипта source: города из args.batch, результаты в args.output"""
+    with contextlib.ExitStack() as stack:
+        lines = sys.stdin if args.batch == "-" else stack.enter_context(open(args.batch, encoding="utf-8"))
+        cities = unique_cities(read_cities(lines))
+        output = sys.stdout if args.output == "-" else stack.enter_context(open(args.output, "w", encoding="utf-8"))
+        cache = open_weather_cache(args.ttl)
+        stack.callback(cache.close)
+
+        started = time.perf_counter()
+        counts = asyncio.run(run_batch(
+            cities, output, fetch, cache, max(args.concurrency, 1),
+            source=source, model=LLMSettings.from_env().model,
+        ))
+    print(f"Городов: {counts['cities']}, из кэша: {counts['cached']}, ошибок: {counts['errors']}, "
+          f"время: {time.perf_counter() - started:.1f} с", file=sys.stderr)
@@ -0,0 +1,8 @@
+import pathlib
+
+ROOT = pathlib.Path(__file__).parent.parent
+
+
+def test_faq_index_copy_matches_shared_module():
+    # Бот в ecom-bot-repo самодостаточен и держит копию FaqIndex: она меняется вместе с src/faq_index.py
+    assert (ROOT / "ecom-bot-repo" / "faq_index.py").read_bytes() == (ROOT / "src" / "faq_index.py").read_bytes()
@@ -0,0 +1,17 @@
+import sys
+import pathlib
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent / "src"))
+
+import llm_client
+
+
+def test_http_clients_per_pool_settings():
+    settings = llm_client.LLMSettings()
+    first = llm_client.get_http_clients(settings)
+    assert llm_client.get_http_clients(settings) is first
+    other = llm_client.get_http_clients(settings._replace(pool_size=5, timeout=5.0))
+    assert other is not first
+
+    llm_client.reset()
+    assert all(client.is_closed for client in first + other)
@@ -0,0 +1,65 @@
+import sys
+import json
+import pathlib
+import importlib.util
+
+import pytest
+
+ROOT = pathlib.Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+import log_writer
+
+
+def load_copy(path: pathlib.Path, name: str):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# У бота в ecom-bot-repo своя копия модуля: проверки выполняются для обеих
+@pytest.fixture(params=["src", "ecom-bot-repo"])
+def module(request):
+    if request.param == "src":
+        return log_writer
+    return load_copy(ROOT / "ecom-bot-repo" / "log_writer.py", "ecom_log_writer")
+
+
+def read_lines(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_unserializable_entry_fails_in_caller(module, tmp_path):
+    writer = module.LogWriter(str(tmp_path / "log.jsonl"))
+    with pytest.raises(TypeError):
+        writer.write({"bad": object()})
+    writer.write({"n": 1})
+    writer.close()
+    assert read_lines(tmp_path / "log.jsonl") == [{"n": 1}]
+
+
+def test_write_error_keeps_thread_alive(module, tmp_path, capsys):
+    # Каталог вместо файла: открыть лог на запись не получится
+    path = tmp_path / "log.jsonl"
+    path.mkdir()
+    writer = module.LogWriter(str(path))
+    writer.write({"n": 1})
+    writer.flush()
+    assert writer.thread.is_alive() and writer.dropped == 1
+    assert "не записано 1 строк" in capsys.readouterr().err
+
+    path.rmdir()
+    writer.write({"n": 2})
+    writer.close()
+    assert read_lines(path) == [{"n": 2}]
+
+
+def test_flush_and_close_without_thread(module, tmp_path):
+    writer = module.LogWriter(str(tmp_path / "log.jsonl"))
+    writer.queue.put(module._STOP)
+    writer.thread.join()
+    writer.flush()
+    writer.write({"n": 1})
+    writer.close()
+    assert read_lines(tmp_path / "log.jsonl") == [{"n": 1}]
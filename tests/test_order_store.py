@@ -0,0 +1,64 @@
+import sys
+import sqlite3
+import pathlib
+import threading
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent / "src"))
+
+import brand_chain
+from order_store import JsonOrderStore, SqliteOrderStore, format_order_statuses, import_orders
+
+ORDERS = {
+    "12345": {"status": "cancelled"},
+    "98765": {"status": "delivered", "delivered_at": "2025-08-10"},
+}
+
+
+def test_statuses_count_only_known_statuses():
+    text = format_order_statuses(["12345", "98765", "11111"], ORDERS)
+    assert text.splitlines()[0] == "Статусы заказов (найдено 1 из 3):"
+    assert "- Заказ 12345 не найден." in text
+
+
+def test_order_context_skips_unknown_status():
+    brand_chain.get_order_store.set(JsonOrderStore(ORDERS))
+    try:
+        assert brand_chain.create_order_context("Где заказы 12345 и 98765?") == "Заказ 98765 был доставлен 2025-08-10."
+        assert brand_chain.create_order_context("Где заказ 12345?") == ""
+    finally:
+        brand_chain.get_order_store.reset()
+
+
+def test_sqlite_close_closes_connections_of_all_threads(tmp_path):
+    import_orders(ORDERS.items(), tmp_path / "orders.sqlite")
+    store = SqliteOrderStore(tmp_path / "orders.sqlite")
+    thread = threading.Thread(target=store.get, args=("98765",))
+    thread.start()
+    thread.join()
+    assert store.get("98765")["status"] == "delivered"
+    conns = list(store.conns)
+    assert len(conns) == 2
+
+    store.close()
+    for conn in conns:
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+
+
+def test_reload_orders_swaps_json_store_and_keeps_sqlite(tmp_path):
+    import_orders(ORDERS.items(), tmp_path / "orders.sqlite")
+    sqlite_store = SqliteOrderStore(tmp_path / "orders.sqlite")
+    try:
+        brand_chain.get_order_store.set(sqlite_store)
+        brand_chain.reload_orders()
+        assert brand_chain.get_order_store() is sqlite_store
+
+        json_store = JsonOrderStore(ORDERS)
+        brand_chain.get_order_store.set(json_store)
+        brand_chain.reload_orders()
+        assert brand_chain.get_order_store() is not json_store
+    finally:
+        sqlite_store.close()
+        brand_chain.get_order_store.reset()
@@ -0,0 +1,98 @@
+import sys
+import json
+import pathlib
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent / "src"))
+
+import brand_chain
+from faq_index import FaqIndex
+from faq_retrieval import FAQ_PATH, FaqRetriever
+from order_store import JsonOrderStore
+from router import Router
+
+ORDERS = {
+    "12345": {"status": "in_transit", "eta_days": 2, "carrier": "ShoplyExpress"},
+    "98765": {"status": "delivered", "delivered_at": "2025-08-10"},
+}
+
+
+@pytest.fixture
+def router():
+    brand_chain.get_order_store.set(JsonOrderStore(ORDERS))
+    brand_chain.load_style_guide.set({"brand": "Shoply"})
+    router = Router()
+    # FAQ не проверяется: всё, что не шаблон заказа или приветствия, уходит дальше
+    router.match_faq = lambda message: None
+    yield router
+    brand_chain.get_order_store.reset()
+    brand_chain.load_style_guide.reset()
+
+
+def intent(router, message):
+    route = router.route(message)
+    return route.intent if route else None
+
+
+@pytest.mark.parametrize("message", [
+    "Когда будет распродажа 2025?",
+    "Где ввести промокод 2024?",
+    "Где мой заказ? мой телефон 89161234567",
+    "Где заказ? телефоны 89161234567 и 89161234568",
+    "В заказе 12345 не хватает товара",
+    "Можно добавить товар в заказ 12345?",
+    "Заказ 12345 пришёл не тот размер",
+])
+def test_number_without_order_marker_goes_to_llm(router, message):
+    assert intent(router, message) is None
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("Где заказ 11111?", "order_not_found"),
+    ("Статус №11111", "order_not_found"),
+    ("Что с заказом номер 11111", "order_not_found"),
+    ("11111", "order_not_found"),
+    ("Где мой заказ 12345?", "order_status"),
+    ("Когда приедет 12345?", "order_status"),
+    ("12345 98765", "order_statuses"),
+    ("Статус заказов 12345, 11111", "order_statuses"),
+])
+def test_order_routes(router, message, expected):
+    assert intent(router, message) == expected
+
+
+@pytest.mark.parametrize("message", ["день", "до", "всего", "Добрый день, где заказ?"])
+def test_filler_words_are_not_small_talk(router, message):
+    assert intent(router, message) is None
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("Привет!", "greeting"),
+    ("Добрый день", "greeting"),
+    ("Спасибо большое", "farewell"),
+    ("До свидания", "farewell"),
+    ("Всего доброго", "farewell"),
+])
+def test_small_talk(router, message, expected):
+    assert intent(router, message) == expected
+
+
+@pytest.fixture
+def faq_router():
+    # Настоящий data/faq.json, индекс собирается в памяти
+    data = json.loads(FAQ_PATH.read_text(encoding="utf-8"))
+    retriever = FaqRetriever.build([item["q"] for item in data])
+    brand_chain.get_faq_state.set(brand_chain.FaqState(data, FaqIndex(data), retriever))
+    yield Router()
+    brand_chain.get_faq_state.reset()
+
+
+@pytest.mark.parametrize("message", ["Сколько идёт доставка?", "сколько идет доставка", "Как оформить возврат?"])
+def test_faq_answer(faq_router, message):
+    assert intent(faq_router, message) == "faq"
+
+
+@pytest.mark.parametrize("message", ["Сколько стоит доставка?", "Как оформить возврат товара?"])
+def test_faq_near_miss_goes_to_llm(faq_router, message):
+    assert intent(faq_router, message) is None
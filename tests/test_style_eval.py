@@ -0,0 +1,40 @@
+import sys
+import json
+import time
+import pathlib
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent / "src"))
+
+import style_eval
+
+
+def test_batch_counts_as_one_call(tmp_path):
+    started = time.perf_counter() - 1.0
+    grade = style_eval.call_stats(started, {"prompt_tokens": 800, "completion_tokens": 80}, share=8)
+    stream = style_eval.ResultStream(tmp_path / "results.jsonl")
+    for _ in range(8):
+        stream._account({"final": 50, "grade": grade})
+    stream.close()
+
+    summary = stream.summary["grade"]
+    assert summary["calls"] == 1
+    assert summary["latency_ms"]["total"] == grade["latency_ms"]
+    assert summary["prompt_tokens"] == 800 and summary["prompt_tokens_mean"] == 800
+    assert style_eval.item_latency(grade) == grade["latency_ms"] / 1000 / 8
+
+
+def test_single_grade_has_no_batch():
+    stats = style_eval.call_stats(time.perf_counter(), {"prompt_tokens": 100})
+    assert "batch" not in stats and stats["prompt_tokens"] == 100
+
+
+def test_resume_drops_truncated_last_line(tmp_path):
+    path = tmp_path / "results.jsonl"
+    complete = json.dumps({"prompt": "a", "final": 80}, ensure_ascii=False) + "\n"
+    path.write_text(complete + '{"prompt": "b", "fin', encoding="utf-8")
+
+    stream = style_eval.ResultStream(path, resume=True)
+    assert stream.count == 1 and stream.pending(["a", "b"]) == ["b"]
+    stream.add(0, {"prompt": "b", "final": 60})
+    stream.close()
+    assert [json.loads(line)["prompt"] for line in path.read_text(encoding="utf-8").splitlines()] == ["a", "b"]
@@ -4,15 +4,16 @@
 Использует LangChain и Pydantic для структурированного вывода.
 """
 
-import os
-import sys
 import json
+import argparse
+import functools
 from typing import Optional
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import PydanticOutputParser
 from pydantic import BaseModel, Field
+from src.llm_client import get_llm, with_retries
+from src.weather_batch import add_batch_arguments, batch_main
 
 # Загрузка переменных окружения
 load_dotenv()
@@ -23,6 +24,26 @@ class WeatherInfo(BaseModel):
     temperature: float = Field(..., description="Температура в градусах Цельсия")
     condition: str = Field(..., description="Условия погоды (например, солнечно, дождливо, облачно)")
 
+@functools.lru_cache(maxsize=1)
+def get_weather_chain():
+    """
+    Цепочка промпт -> модель -> парсер собирается один раз на процесс.
+    Модель берётся из общего клиента с пулом соединений, таймаутом и повторами (LLM_*).
+    """
+    # Создание парсера Pydantic
+    parser = PydanticOutputParser(pydantic_object=WeatherInfo)
+    format_instructions = parser.get_format_instructions()
+    
+    # Создание шаблона промпта
+    prompt = PromptTemplate(
+        template="Получи информацию о погоде для города {city}.\n{format_instructions}",
+        input_variables=["city"],
+        partial_variables={"format_instructions": format_instructions}
+    )
+    
+    # Создание цепочки
+    return with_retries(prompt | get_llm() | parser)
+
 def get_weather_info(city: str) -> str:
     """
     Получает информацию о погоде для заданного города и возвращает её в формате JSON.
@@ -34,26 +55,30 @@ def get_weather_info(city: str) -> str:
         str: JSON-строка с информацией о погоде или ошибкой
     """
     try:
-        # Инициализация модели
-        model = os.getenv("OPENAI_API_MODEL", "gpt-4o-mini")
-        llm = ChatOpenAI(model=model, temperature=0.7)
-        
-        # Создание парсера Pydantic
-        parser = PydanticOutputParser(pydantic_object=WeatherInfo)
-        format_instructions = parser.get_format_instructions()
+        # Вызов цепочки
+        result = get_weather_chain().invoke({"city": city})
         
-        # Создание шаблона промпта
-        prompt = PromptTemplate(
-            template="Получи информацию о погоде для города {city}.\n{format_instructions}",
-            input_variables=["city"],
-            partial_variables={"format_instructions": format_instructions}
-        )
+        # Возврат результата в формате JSON
+        return result.model_dump_json()
         
-        # Создание цепочки
-        chain = prompt | llm | parser
+    except Exception as e:
+        # Возврат ошибки в формате JSON
+        error_response = {"error": f"Ошибка при получении информации о погоде: {str(e)}"}
+        return json.dumps(error_response, ensure_ascii=False)
+
+async def aget_weather_info(city: str) -> str:
+    """
+    Асинхронный вариант get_weather_info для пакетного режима.
+    
+    Args:
+        city (str): Название города
         
+    Returns:
+        str: JSON-строка с информацией о погоде или ошибкой
+    """
+    try:
         # Вызов цепочки
-        result = chain.invoke({"city": city})
+        result = await get_weather_chain().ainvoke({"city": city})
         
         # Возврат результата в формате JSON
         return result.model_dump_json()
@@ -68,8 +93,18 @@ def main():
     Основная функция скрипта.
     """
     # Проверка аргументов командной строки
-    if len(sys.argv) > 1:
-        city = sys.argv[1]
+    parser = argparse.ArgumentParser(description="Информация о погоде в формате JSON")
+    parser.add_argument("city", nargs="*", help="Название города")
+    add_batch_arguments(parser)
+    args = parser.parse_args()
+    
+    # Пакетный режим: список городов из файла или stdin
+    if args.batch:
+        batch_main(args, aget_weather_info, "weather_api_script")
+        return
+    
+    if args.city:
+        city = " ".join(args.city)
     else:
         # Если аргумент не передан, запрашиваем у пользователя
         city = input("Введите название города: ").strip()
@@ -4,13 +4,14 @@
 Использует метод with_structured_output() для структурированного вывода.
 """
 
-import os
-import sys
 import json
+import argparse
+import functools
 from typing import Optional
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
 from pydantic import BaseModel, Field
+from src.llm_client import get_llm, with_retries
+from src.weather_batch import add_batch_arguments, batch_main
 
 # Загрузка переменных окружения
 load_dotenv()
@@ -21,6 +22,14 @@ class WeatherInfo(BaseModel):
     temperature: float = Field(..., description="Температура в градусах Цельсия")
     condition: str = Field(..., description="Условия погоды (например, солнечно, дождливо, облачно)")
 
+@functools.lru_cache(maxsize=1)
+def get_structured_llm():
+    """
+    Модель со структурированным выводом создаётся один раз на процесс.
+    Клиент общий: пул соединений, таймаут и повторы настраиваются через LLM_*.
+    """
+    return with_retries(get_llm().with_structured_output(WeatherInfo))
+
 def get_weather_info(city: str) -> str:
     """
     Получает информацию о погоде для заданного города и возвращает её в формате JSON.
@@ -32,16 +41,32 @@ def get_weather_info(city: str) -> str:
         str: JSON-строка с информацией о погоде или ошибкой
     """
     try:
-        # Инициализация модели
-        model = os.getenv("OPENAI_API_MODEL", "gpt-4o-mini")
-        llm = ChatOpenAI(model=model, temperature=0.7)
+        # Вызов модели
+        prompt = f"Получи информацию о погоде для города {city}."
+        result = get_structured_llm().invoke(prompt)
+        
+        # Возврат результата в формате JSON
+        return result.model_dump_json()
         
-        # Создание структурированной модели
-        structured_llm = llm.with_structured_output(WeatherInfo)
+    except Exception as e:
+        # Возврат ошибки в формате JSON
+        error_response = {"error": f"Ошибка при получении информации о погоде: {str(e)}"}
+        return json.dumps(error_response, ensure_ascii=False)
+
+async def aget_weather_info(city: str) -> str:
+    """
+    Асинхронный вариант get_weather_info для пакетного режима.
+    
+    Args:
+        city (str): Название города
         
+    Returns:
+        str: JSON-строка с информацией о погоде или ошибкой
+    """
+    try:
         # Вызов модели
         prompt = f"Получи информацию о погоде для города {city}."
-        result = structured_llm.invoke(prompt)
+        result = await get_structured_llm().ainvoke(prompt)
         
         # Возврат результата в формате JSON
         return result.model_dump_json()
@@ -56,8 +81,18 @@ def main():
     Основная функция скрипта.
     """
     # Проверка аргументов командной строки
-    if len(sys.argv) > 1:
-        city = sys.argv[1]
+    parser = argparse.ArgumentParser(description="Информация о погоде в формате JSON")
+    parser.add_argument("city", nargs="*", help="Название города")
+    add_batch_arguments(parser)
+    args = parser.parse_args()
+    
+    # Пакетный режим: список городов из файла или stdin
+    if args.batch:
+        batch_main(args, aget_weather_info, "weather_api_script_v2")
+        return
+    
+    if args.city:
+        city = " ".join(args.city)
     else:
         # Если аргумент не передан, запрашиваем у пользователя
         city = input("Введите название города: ").strip()